@@ -0,0 +1,145 @@
+"""Precompressed copies of shiftcodes.json and a manifest describing them.
+
+Alongside the JSON the writer produces ``.gz``, ``.br`` and ``.zst``
+copies. Brotli and zstandard are in requirements.txt; where they aren't
+installed only the ``.gz`` copy is written. Compression is deterministic
+(no timestamps or file names in the gzip header, fixed levels), so
+unchanged codes give byte-identical artifacts. The manifest records the
+SHA-256 and size of every artifact, letting mirrors and the local HTTP
+endpoint serve the precompressed bytes as they are and clients verify
+downloads or skip unchanged ones.
+"""
+import gzip
+import hashlib
+import io
+import json
+from os import path
+
+from common import _L
+from shiftfile import atomic_write
+
+MANIFEST_NAME = "manifest.json"
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+ZSTD_LEVEL = 19
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    # mtime=0 and an empty file name keep the output byte-for-byte reproducible
+    with gzip.GzipFile(
+        filename="", mode="wb", fileobj=buf, compresslevel=GZIP_LEVEL, mtime=0
+    ) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def _brotli(data):
+    import brotli
+
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def _zstd(data):
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+# (Content-Encoding, file suffix, compressor, module it needs or None)
+ENCODINGS = [
+    ("gzip", ".gz", _gzip, None),
+    ("br", ".br", _brotli, "brotli"),
+    ("zstd", ".zst", _zstd, "zstandard"),
+]
+
+
+def available_encodings():
+    """The ENCODINGS whose compressor can be imported here."""
+    encodings = []
+    for encoding, suffix, compress, module in ENCODINGS:
+        if module:
+            try:
+                __import__(module)
+            except ModuleNotFoundError:
+                _L.debug("%s is not installed; not writing %s artifacts", module, suffix)
+                continue
+        encodings.append((encoding, suffix, compress))
+    return encodings
+
+
+def describe(data, encoding=None):
+    entry = {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    if encoding:
+        entry["encoding"] = encoding
+    return entry
+
+
+def manifest_path(filepath):
+    return path.join(path.dirname(filepath), MANIFEST_NAME)
+
+
+def load_manifest(filepath):
+    """The manifest next to ``filepath`` ({} if there isn't a readable one)."""
+    try:
+        with open(manifest_path(filepath), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _up_to_date(manifest, filepath, source_entry, encodings):
+    name = path.basename(filepath)
+    if manifest.get(name) != source_entry:
+        return False
+    for _, suffix, _ in encodings:
+        entry = manifest.get(name + suffix)
+        artifact = filepath + suffix
+        if entry is None or not path.exists(artifact):
+            return False
+        if path.getsize(artifact) != entry["size"]:
+            return False
+    return True
+
+
+def write_artifacts(filepath):
+    """Write the compressed copies of ``filepath`` and update the manifest.
+
+    Returns the manifest. Nothing is rewritten if ``filepath`` is unchanged
+    since the artifacts were last written.
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+    name = path.basename(filepath)
+    source_entry = describe(data)
+    encodings = available_encodings()
+    manifest = load_manifest(filepath)
+    if _up_to_date(manifest, filepath, source_entry, encodings):
+        _L.debug("Artifacts for %s are up to date", name)
+        return manifest
+
+    # drop entries for this file's old artifacts, keep any other files' entries
+    manifest = {
+        key: value
+        for key, value in manifest.items()
+        if key != name and not key.startswith(name + ".")
+    }
+    manifest[name] = source_entry
+    for encoding, suffix, compress in encodings:
+        compressed = compress(data)
+        atomic_write(filepath + suffix, compressed)
+        manifest[name + suffix] = describe(compressed, encoding)
+        _L.debug(
+            "Wrote %s%s: %d bytes (%.0f%% of %d)",
+            name,
+            suffix,
+            len(compressed),
+            100.0 * len(compressed) / max(len(data), 1),
+            len(data),
+        )
+    atomic_write(
+        manifest_path(filepath),
+        json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+    )
+    return manifest
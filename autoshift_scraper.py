@@ -1,19 +1,90 @@
-import requests
-from bs4 import BeautifulSoup
-import json, base64
+import json
 import re
-from datetime import datetime, timezone
+from concurrent.futures import wait
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
 from os import path, makedirs
 from pathlib import Path
-
-try:
-    from github import Github
-except ModuleNotFoundError:
-    Github = None
+from time import perf_counter
 
 from common import _L, DEBUG, DIRNAME, INFO
+from artifacts import write_artifacts
+from budget import (
+    DEFAULT_RUN_DEADLINE,
+    DEFAULT_SOURCE_BUDGET,
+    CircuitBreakers,
+    RunDeadline,
+)
+from candidates import CandidateCollector
+from diagnostics import DiagnosticsSink
+from extraction import (
+    canonical_field,
+    extract_table_rows,
+    finish_row,
+    normalize_code,
+    scan_codes,
+)
+from fetcher import USER_AGENT, fetch, fetch_robots, set_rate_limiter
+import inbox
+from history import CodeHistory, SeenIndex
+from jsliteral import Call, html_text, iter_array_records
+from lastmod import LastmodTracker, url_key
+from migrations import CURRENT_VERSION, migrate, needs_migration
+from notify import DEFAULT_WORKERS, Outbox, code_changes, load_subscribers
+from parse_pool import InlineExecutor, ParsePool
+from query import CodeStore
+from ratelimit import DEFAULT_INTERVAL, DEFAULT_JITTER, HostRateLimiter
+from records import CodeRecord, Summary, expand_records, summarize
+from selector_cache import (
+    SelectorCache,
+    learn_selectors,
+    needs_relearn,
+    select_regions,
+)
+from shiftfile import (
+    PreviousCodeIndex,
+    ShiftFileError,
+    load_previous_index,
+    canonicalize,
+    load_shiftfile,
+    write_json,
+    write_shiftfile,
+)
+from source_cache import DEFAULT_TTL, SourceCache
+from state import (
+    BREAKERS,
+    DIAGNOSTICS,
+    HISTORY,
+    LASTMOD,
+    OUTBOX,
+    SELECTORS,
+    SOURCES,
+    StateDir,
+    StateError,
+    export_state,
+    import_state,
+)
 
 SHIFTCODESJSONPATH = "data/shiftcodes.json"
+# volatile run details (generation time, new code count) when writing canonical output
+STATUSJSONPATH = "data/status.json"
+# GitHub REST API that shiftcodes.json is published through
+GITHUB_API = "https://api.github.com"
+
+
+# requests and bs4 are imported inside the functions that fetch and parse, so
+# modes that never touch the network (e.g. --dry-run-migrations) start fast.
+# They stay reachable as module attributes for callers (and tests) that patch them.
+def __getattr__(name):
+    if name == "requests":
+        import requests
+
+        return requests
+    if name == "BeautifulSoup":
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 webpages = [
     {
@@ -85,85 +156,62 @@ webpages = [
     },
 ]
 
+# Sitemaps giving the lastmod of each page on a host; pages on these hosts are
+# only fetched when their lastmod has changed since their last good parse
+SITEMAPS = {
+    "mentalmars.com": "https://mentalmars.com/post-sitemap.xml",
+}
+
 
 def remap_dict_keys(dict_keys):
     # Map a variety of possible table heading variations to a small set of
-    # canonical keys. This is intentionally fuzzy: many pages prefix the
-    # heading with the game name (e.g. 'Borderlands 4 SHiFT Code') or use
-    # slightly different wording like 'Expire Date'. Match case-insensitively
-    # using substring checks so we don't miss these variants.
+    # canonical keys (see extraction.canonical_field)
     mapped = {}
     for key, value in dict_keys.items():
         if key is None:
             continue
-        k = key.strip().lower()
-        # handle "expired" specifically before the more generic "expire" check
-        if "expired" in k:
-            new_key = "expired"
-        elif "shift code" in k or ("shift" in k and "code" in k):
-            new_key = "code"
-        elif "expire" in k:
-            new_key = "expires"
-        elif "reward" in k:
-            new_key = "reward"
-        else:
-            # preserve the original heading if it doesn't match any known
-            # canonical field — downstream code will either handle it or
-            # ignore it.
-            new_key = key
-        mapped[new_key] = value
+        mapped[canonical_field(key)] = value
     return mapped
 
 
 # convert headings to standard headings
 def cleanse_codes(codes):
-    clean_codes = []
-    for code in codes:
-
-        # standardise the table headings
-        clean_code = remap_dict_keys(code)
-
-        # Clean up text from expiry date
-        if "expires" in clean_code:
-            clean_code.update(
-                {"expires": clean_code.get("expires").replace("Expires: ", "")}
-            )
-        else:
-            clean_code.update({"expires": "Unknown"})
-
-        # Mark expired as expired
-        if "expired" in clean_code:
-            val = clean_code.get("expired")
-            # treat any value that is not exactly False, "false", "no", "0", or "" (case-insensitive) as True
-            clean_code.update(
-                {"expired": str(val).strip().lower() not in ["false", "no", "0", ""]}
-            )
-        else:
-            clean_code.update({"expired": False})
-
-        # convert expiries to dates
-        # TODO
-
-        clean_codes.append(clean_code)
+    return [finish_row(remap_dict_keys(code)) for code in codes]
 
-    return clean_codes
 
+def fetch_webpage(webpage, budget=None):
+    """Fetch a mentalmars page; returns (content, time it was scraped).
 
-def scrape_codes(webpage):
+    ``budget`` caps the seconds the fetch may take, waits and retries included.
+    """
     _L.info(
         "Requesting webpage for "
         + webpage.get("game")
         + ": "
         + webpage.get("sourceURL")
     )
-    r = requests.get(webpage.get("sourceURL"))
+    r = fetch(webpage.get("sourceURL"), budget=budget)
+    r.raise_for_status()
     # record the time we scraped the URL
     scrapedDateAndTime = datetime.now(timezone.utc)
     _L.info(" Collected at: " + str(scrapedDateAndTime))
-    # print(r.content)
+    return r.content, scrapedDateAndTime
+
+
+def scrape_codes(webpage):
+    content, scrapedDateAndTime = fetch_webpage(webpage)
+    return parse_mentalmars_page(content, webpage, scrapedDateAndTime)
+
+
+def parse_mentalmars_page(content, webpage, scrapedDateAndTime):
+    """Parse a fetched mentalmars page into its normalised code tables.
+
+    Runs in a parse worker, so it only returns plain dicts and lists.
+    """
+    from bs4 import BeautifulSoup
 
     soup = BeautifulSoup(
-        r.content, "html.parser"
+        content, "html.parser"
     )  # If this line causes an error, run 'pip install html5lib' or install html5lib
     # print(soup.prettify())
 
@@ -198,24 +246,11 @@ def scrape_codes(webpage):
             table_count += 1
             continue
 
-        table_html = figure.find(lambda tag: tag.name == "table")
-
-        table_header = []
-        code_table = []
+        table_html = figure.find("table")
 
-        # Convert the HTML table into a Python Dict:
-        # Tip from: https://stackoverflow.com/questions/11901846/beautifulsoup-a-dictionary-from-an-html-table
-        table_header = [header.text for header in table_html.find_all("th")]
-        table_header.append(
-            "expired"
-        )  # expired codes have a strikethrough ('s') tag and are found last
-        code_table = [
-            {
-                table_header[i]: cell.text
-                for i, cell in enumerate(row.find_all({"td", "s"}))
-            }
-            for row in table_html.find("tbody").find_all("tr")
-        ]
+        # Rows are read positionally against the table's headings; the
+        # heading-to-field mapping is compiled once per distinct header
+        code_table = extract_table_rows(table_html)
 
         # If we find more tables on the webpage than we were expecting, error
         if table_count + 1 > len(webpage.get("platform_ordered_tables")):
@@ -224,15 +259,12 @@ def scrape_codes(webpage):
             # Skip to the next table iteration
             continue
 
-        # Clean the results up
-        code_table = cleanse_codes(code_table)
         code_tables.append(
             {
                 "game": webpage.get("game"),
                 "platform": webpage.get("platform_ordered_tables")[table_count],
                 "sourceURL": webpage.get("sourceURL"),
                 "archived": scrapedDateAndTime,
-                "raw_table_html": str(table_html),
                 "codes": code_table,
             }
         )
@@ -248,33 +280,16 @@ def scrape_codes(webpage):
     return code_tables
 
 
-# Check to see if the new code existed in previous codes, and if so return the previous code's archive date.
-def getPreviousCodeArchived(new_code, new_game, previous_codes):
-    # Stupidly inefficient, but enough to keep previous dates
-    if previous_codes:
-        for previous_code in previous_codes[0].get("codes"):
-            #  print("COMPARING: " + new_code.get("code") + " with " + previous_code.get("code"))
-            if (new_code.get("code") == previous_code.get("code")) and (
-                new_game == previous_code.get("game")
-            ):
-                _L.debug(" Code already existed, reverting archived datestamp")
-                return previous_code.get("archived")
-    return None
-
-
-# Retrieve the previous full code entry (if any) so we can preserve fields like "expired"
-def getPreviousCodeEntry(new_code, new_game, previous_codes):
-    for previous_code in previous_codes[0].get("codes", []):
-        if (new_code.get("code") == previous_code.get("code")) and (
-            new_game == previous_code.get("game")
-        ):
-            return previous_code
-    return None
-
-
-# Restructure the normalised dictionary to the denormalised structure autoshift expects
-def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
-    autoshiftcodes = []
+# Build the compact CodeRecords for every valid code in the scraped tables
+def generateCodeRecords(
+    website_code_tables, previous_codes, include_expired, diagnostics=None
+):
+    # previous_codes is normally a SeenIndex over the code history (or the
+    # PreviousCodeIndex streamed from the last output), but an already loaded
+    # shiftcodes structure is accepted too
+    if isinstance(previous_codes, list):
+        previous_codes = PreviousCodeIndex.from_codes(previous_codes)
+    records = []
     newcodecount = 0
     for code_tables in website_code_tables:
         for code_table in code_tables:
@@ -284,20 +299,21 @@ def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
                 # match five groups of five alphanumeric characters separated by
                 # hyphens (e.g. AAAAA-BBBBB-CCCCC-DDDDD-EEEEE). Anything else
                 # should be excluded from the output.
-                raw_code = code.get("code")
-                if raw_code:
-                    raw_code = raw_code.strip().upper()
-                else:
-                    raw_code = None
-
-                code_pattern = re.compile(r"^[A-Z0-9]{5}(?:-[A-Z0-9]{5}){4}$")
-                if not raw_code or not code_pattern.fullmatch(raw_code):
+                if not normalize_code(code.get("code")):
                     _L.debug(
                         "Skipping non-matching shift code for %s on %s: %s",
                         code_table.get("game"),
                         code_table.get("platform"),
-                        raw_code,
+                        code.get("code"),
                     )
+                    if diagnostics is not None:
+                        diagnostics.record(
+                            code_table.get("sourceURL"),
+                            code,
+                            "invalid code",
+                            game=code_table.get("game"),
+                            platform=code_table.get("platform"),
+                        )
                     # skip rows that do not contain a valid code
                     continue
 
@@ -306,18 +322,17 @@ def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
                     continue
 
                 # Extract out the previous archived date if the key existed previously
-                archived = getPreviousCodeArchived(
-                    code, code_table.get("game"), previous_codes
+                archived = previous_codes.archived(
+                    code.get("code"), code_table.get("game")
                 )
+                if archived is not None:
+                    _L.debug(" Code already existed, reverting archived datestamp")
                 # Preserve previously-detected expired state when the new scraped row lacks a real expiry.
-                prev_entry = getPreviousCodeEntry(
-                    code, code_table.get("game"), previous_codes
-                )
                 # If previous entry explicitly marked expired, and new row has unknown/empty expires,
                 # keep expired=True instead of reverting to False.
-                if prev_entry and prev_entry.get("expired"):
+                if previous_codes.expired(code.get("code"), code_table.get("game")):
                     new_expires = (code.get("expires") or "").strip()
-                    if new_expires.lower() in ["", "unknown", "unknown"]:
+                    if new_expires.lower() in ["", "unknown"]:
                         code["expired"] = True
                 # end preserve logic
 
@@ -333,22 +348,16 @@ def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
                             code_table.get("platform"),
                             code,
                         )
-                        # write debugging info to a file for inspection
-                        try:
-                            debug_record = {
-                                "game": code_table.get("game"),
-                                "platform": code_table.get("platform"),
-                                "sourceURL": code_table.get("sourceURL"),
-                                "archived": str(code_table.get("archived")),
-                                "row": code,
-                            }
-                            makedirs(path.join(DIRNAME, "data"), exist_ok=True)
-                            fn = path.join(DIRNAME, "data", "debug_problem_rows.json")
-                            # append JSON objects one per line so it's easy to inspect
-                            with open(fn, "a") as df:
-                                df.write(json.dumps(debug_record, default=str) + "\n")
-                        except Exception as e:
-                            _L.error("Failed to write debug file: %s", e)
+                        # kept for inspection; written once per run at most
+                        if diagnostics is not None:
+                            diagnostics.record(
+                                code_table.get("sourceURL"),
+                                code,
+                                "missing fields",
+                                game=code_table.get("game"),
+                                platform=code_table.get("platform"),
+                                archived=str(code_table.get("archived")),
+                            )
                     # Use logger formatting (avoids concatenation when values may be None)
                     _L.info(
                         " Found new code: %s %s for %s on %s",
@@ -358,50 +367,40 @@ def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
                         code_table.get("platform"),
                     )
 
-                if code_table.get("platform") == "pc":
-                    autoshiftcodes.append(
-                        {
-                            "code": code.get("code"),
-                            "type": "shift",
-                            "game": code_table.get("game"),
-                            "platform": "steam",
-                            "reward": code.get("reward"),
-                            "archived": archived,
-                            "expires": code.get("expires"),
-                            "expired": code.get("expired"),
-                            "link": code_table.get("sourceURL"),
-                        }
-                    )
-                    autoshiftcodes.append(
-                        {
-                            "code": code.get("code"),
-                            "type": "shift",
-                            "game": code_table.get("game"),
-                            "platform": "epic",
-                            "reward": code.get("reward"),
-                            "archived": archived,
-                            "expires": code.get("expires"),
-                            "expired": code.get("expired"),
-                            "link": code_table.get("sourceURL"),
-                        }
-                    )
-                else:
-                    autoshiftcodes.append(
-                        {
-                            "code": code.get("code"),
-                            "type": "shift",
-                            "game": code_table.get("game"),
-                            "platform": code_table.get("platform"),
-                            "reward": code.get("reward"),
-                            "archived": archived,
-                            "expires": code.get("expires"),
-                            "expired": code.get("expired"),
-                            "link": code_table.get("sourceURL"),
-                        }
+                records.append(
+                    CodeRecord.create(
+                        code=code.get("code"),
+                        game=code_table.get("game"),
+                        platform=code_table.get("platform"),
+                        reward=code.get("reward"),
+                        archived=archived,
+                        expires=code.get("expires"),
+                        expired=code.get("expired"),
+                        link=code_table.get("sourceURL"),
                     )
+                )
 
-    # Add the metadata section:
+    return records, newcodecount
+
+
+# Restructure the normalised dictionary to the denormalised structure autoshift expects
+def generateAutoshiftJSON(
+    website_code_tables,
+    previous_codes,
+    include_expired,
+    stale_sources=None,
+    diagnostics=None,
+):
+    records, newcodecount = generateCodeRecords(
+        website_code_tables, previous_codes, include_expired, diagnostics
+    )
+    # Only now expand the compact records into autoshift's per-platform
+    # entries, summarising them for the metadata on the way
     generatedDateAndTime = datetime.now(timezone.utc)
+    summary = Summary(generatedDateAndTime)
+    autoshiftcodes = expand_records(records, summary)
+
+    # Add the metadata section:
     metadata = {
         "version": "2",
         "description": "GitHub Alternate Source for Shift Codes",
@@ -409,7 +408,11 @@ def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
         "permalink": "https://raw.githubusercontent.com/zarmstrong/autoshift-codes/main/shiftcodes.json",
         "generated": {"human": generatedDateAndTime},
         "newcodecount": newcodecount,
+        "summary": summary.as_meta(),
     }
+    if stale_sources:
+        # sources whose codes came from an earlier run's cached parse
+        metadata["stale"] = dict(sorted(stale_sources.items()))
 
     autoshift = [{"meta": metadata, "codes": autoshiftcodes}]
 
@@ -417,85 +420,45 @@ def generateAutoshiftJSON(website_code_tables, previous_codes, include_expired):
     # return json.dumps(autoshiftcodes,indent=2, default=str)
 
 
-def run_migrations_on_shiftfile(shiftfile_path, previous_codes):
+def run_migrations_on_shiftfile(shiftfile_path, previous_codes, dry_run=False):
     """Run migrations against the loaded shiftcodes structure.
 
+    All pending migrations are applied in memory and the result is written back
+    once, atomically. With dry_run the file is left untouched.
     Returns the (possibly modified) previous_codes structure and a boolean indicating if a migration was performed.
     """
     migration_performed = False
     if not previous_codes:
         return previous_codes, migration_performed
 
-    try:
-        meta = previous_codes[0].get("meta", {})
-    except Exception:
+    started = perf_counter()
+    applied = migrate(previous_codes)
+    if not applied:
+        _L.debug("Shiftcodes file already at version %d, no migrations needed", CURRENT_VERSION)
         return previous_codes, migration_performed
 
-    # If no version is set at all, initialise to version 1 and persist that
-    if "version" not in meta:
-        _L.info("Initial migration: setting shiftcodes file version to 1")
-        previous_codes[0].setdefault("meta", {})["version"] = "1"
-        try:
-            with open(shiftfile_path, "w") as f:
-                json.dump(previous_codes, f, indent=2, default=str)
-            _L.info("Wrote initial version=1 to %s", shiftfile_path)
-            migration_performed = True
-        except Exception as e:
-            _L.error("Failed to write initial-version shiftcodes file: %s", e)
-        meta = previous_codes[0].get("meta", {})
-
-    version = str(meta.get("version", "1"))
-    # Treat "0.1" as equivalent to "1"
-    if version == "0.1":
-        version = "1"
-        previous_codes[0]["meta"]["version"] = "1"
-        try:
-            with open(shiftfile_path, "w") as f:
-                json.dump(previous_codes, f, indent=2, default=str)
-            _L.info("Updated version 0.1 to 1 in %s", shiftfile_path)
-            migration_performed = True
-        except Exception as e:
-            _L.error("Failed to update version from 0.1 to 1: %s", e)
-
-    # if already >= 2 nothing to do
-    if version >= "2":
-        _L.debug("Shiftcodes file already at version %s, no migrations needed", version)
+    if dry_run:
+        _L.info(
+            "Dry run: %d migration(s) would update %s to version %s; not writing",
+            len(applied),
+            shiftfile_path,
+            previous_codes[0]["meta"]["version"],
+        )
         return previous_codes, migration_performed
 
-    # Migration: v1 -> v2
-    if version == "1":
-        _L.info("Running migration: v1 -> v2 on %s", shiftfile_path)
-        # Only allow codes that match the 5x5 pattern
-        pattern = re.compile(r"^[A-Z0-9]{5}(?:-[A-Z0-9]{5}){4}$")
-        codes = previous_codes[0].get("codes", [])
-        before_count = len(codes)
-        filtered = []
-        for c in codes:
-            code_val = c.get("code")
-            if code_val:
-                code_val = str(code_val).strip().upper()
-            if code_val and pattern.fullmatch(code_val):
-                # keep original entry but normalise stored code to upper/stripped
-                c["code"] = code_val
-                filtered.append(c)
-            else:
-                _L.debug("Migration: dropping invalid code entry: %s", c)
-
-        removed = before_count - len(filtered)
-        previous_codes[0]["codes"] = filtered
-        previous_codes[0].setdefault("meta", {})["version"] = "2"
-
-        # Persist the migrated file back to disk
-        try:
-            with open(shiftfile_path, "w") as f:
-                json.dump(previous_codes, f, indent=2, default=str)
-            _L.info(
-                "Migration complete: removed %d invalid codes, set version to 2",
-                removed,
-            )
-            migration_performed = True
-        except Exception as e:
-            _L.error("Failed to write migrated shiftcodes file: %s", e)
+    # Persist the migrated file back to disk
+    try:
+        write_shiftfile(shiftfile_path, previous_codes)
+        migration_performed = True
+        _L.info(
+            "Migration complete: %s now at version %s (%d step(s), %.3fs including write)",
+            shiftfile_path,
+            previous_codes[0]["meta"]["version"],
+            len(applied),
+            perf_counter() - started,
+        )
+    except Exception as e:
+        _L.error("Failed to write migrated shiftcodes file: %s", e)
 
     return previous_codes, migration_performed
 
@@ -515,7 +478,9 @@ def setup_argparser():
     parser.add_argument(
         "-v", "--verbose", dest="verbose", action="store_true", help="Verbose mode"
     )
-    # secret flag to allow official scraper to override the 2-hour minimum
+    # secret flag that used to let the official scraper override the 2-hour
+    # minimum; the per-host rate limiter has replaced that minimum, so it is
+    # accepted for compatibility only, with a deprecation warning
     parser.add_argument(
         "--officialscraper",
         dest="officialscraper",
@@ -537,356 +502,690 @@ def setup_argparser():
     parser.add_argument(
         "-t", "--token", default=None, help=("GitHub Authentication token to use ")
     )
+    parser.add_argument(
+        "--github-api",
+        dest="github_api",
+        default=GITHUB_API,
+        help="GitHub API base URL, e.g. for GitHub Enterprise or a local stand-in (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--request-interval",
+        dest="request_interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Minimum seconds between requests to the same site (a longer robots.txt Crawl-delay wins)",
+    )
+    parser.add_argument(
+        "--request-jitter",
+        dest="request_jitter",
+        type=float,
+        default=DEFAULT_JITTER,
+        help="Up to this many random extra seconds are added whenever a request has to wait",
+    )
+    parser.add_argument(
+        "--schedule-jitter",
+        dest="schedule_jitter",
+        type=int,
+        default=300,
+        help="Spread scheduled runs by up to this many seconds so scrapers don't all fire at once",
+    )
+    parser.add_argument(
+        "--dry-run-migrations",
+        dest="dry_run_migrations",
+        action="store_true",
+        help="Report the migrations shiftcodes.json needs (with timings) without writing it, then exit",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        dest="parse_workers",
+        type=int,
+        default=None,
+        help="Number of worker processes used to parse pages (default: one per CPU, 0 parses in-process)",
+    )
+    parser.add_argument(
+        "--run-deadline",
+        dest="run_deadline",
+        type=float,
+        default=DEFAULT_RUN_DEADLINE,
+        help=f"Seconds a whole run may take; sources not done by then are skipped (default: {DEFAULT_RUN_DEADLINE:.0f})",
+    )
+    parser.add_argument(
+        "--source-budget",
+        dest="source_budget",
+        type=float,
+        default=DEFAULT_SOURCE_BUDGET,
+        help=f"Seconds one source's fetch may take, retries included (default: {DEFAULT_SOURCE_BUDGET:.0f})",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        dest="cache_ttl",
+        type=float,
+        default=DEFAULT_TTL.total_seconds() / 3600,
+        help="Hours a source's last good result may stand in for it when it fails (default: %(default)g)",
+    )
+    parser.add_argument(
+        "--serve",
+        type=int,
+        metavar="PORT",
+        default=None,
+        help="Serve the codes over HTTP on this port (0 picks a free one) and keep running",
+    )
+    parser.add_argument(
+        "--serve-host",
+        dest="serve_host",
+        default="127.0.0.1",
+        help="Address the HTTP server listens on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--canonical",
+        action="store_true",
+        help=f"Write codes in a stable sorted order with the run's volatile details in {STATUSJSONPATH}",
+    )
+    parser.add_argument(
+        "--state-dir",
+        dest="state_dir",
+        default=None,
+        help="Directory for the state kept between runs: breakers, caches, history (default: data/)",
+    )
+    parser.add_argument(
+        "--state-bundle",
+        dest="state_bundle",
+        default=None,
+        help="Restore the state from this tarball at startup (if it exists) and save it there after every run",
+    )
+    parser.add_argument(
+        "--webhooks",
+        default=None,
+        metavar="FILE",
+        help="JSON list of webhook subscribers to notify of new and newly expired codes",
+    )
+    parser.add_argument(
+        "--webhook-workers",
+        dest="webhook_workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Webhook subscribers delivered to at once (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-preflight",
+        dest="no_preflight",
+        action="store_true",
+        help="Fetch every page instead of first checking sitemaps for pages that haven't changed",
+    )
+    parser.add_argument(
+        "--freshness",
+        type=float,
+        default=0,
+        help="Minutes after a successful scrape during which a source is not fetched again (default: 0, always fetch)",
+    )
     return parser
 
 
-def scrape_polygon_bl4_codes(existing_codes_set):
-    url = "https://www.polygon.com/borderlands-4-active-shift-codes-redeem/"
-    try:
-        _L.info("Requesting Polygon BL4 codes: " + url)
-        # add a simple user-agent to reduce chance of being blocked
-        r = requests.get(
-            url, timeout=15, headers={"User-Agent": "autoshift-scraper/1.0"}
+def collect_candidates(
+    rows, source, label, existing_codes_set, collector=None, diagnostics=None
+):
+    """Feed parsed rows from one source into a CandidateCollector.
+
+    Returns the rows whose codes were new to the collector and logs the
+    per-source counts. When no collector is shared between sources a private
+    one is used, so each parser can still be called on its own. Rows the
+    parser flagged with a ``problem`` and rows without a valid code go to
+    ``diagnostics``, if given.
+    """
+    if collector is None:
+        collector = CandidateCollector()
+    collector.existing.update(existing_codes_set)
+
+    new_codes = []
+    for row in rows:
+        if row.get("problem"):
+            # a code the parser found but couldn't use
+            if diagnostics is not None:
+                diagnostics.record(source, row, row["problem"])
+            continue
+        if collector.add(row, source):
+            new_codes.append(normalize_code(row.get("code")))
+        elif diagnostics is not None and not normalize_code(row.get("code")):
+            diagnostics.record(source, row, "invalid code")
+
+    stats = collector.stats(source)
+    # Report new codes and duplicate counts as standard info output
+    _L.info(
+        "%s: Found %d new candidate codes (parsed %d candidates, %d duplicates already present, %d duplicates in-page, %d merged with other sources)",
+        label,
+        stats["new"],
+        stats["parsed"],
+        stats["duplicates_existing"],
+        stats["duplicates_inpage"],
+        stats["merged"],
+    )
+    # hand back the collector's copies so merges from later sources show up in them
+    return [collector.get(code) for code in new_codes]
+
+
+def parse_polygon_bl4_page(content, hint=None):
+    """Parse the Polygon BL4 page, trying the learned selectors in ``hint`` first.
+
+    Returns (rows, hint) where hint records the list(s) the codes came from.
+    Codes that couldn't be used are returned as rows with a ``problem``.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser")
+    rejects = []
+
+    # 0) Fast path: the list(s) that held the codes on the last successful run
+    if hint:
+        hits = []
+        for region in select_regions(soup, hint["selectors"]):
+            hits.extend(scan_codes(region, containers=("li",), rejects=rejects))
+        if not needs_relearn(hint, len(hits)):
+            _L.debug("Polygon BL4: learned selector matched %d codes", len(hits))
+            return [hit.as_row() for hit in hits] + rejects, {
+                "selectors": hint["selectors"],
+                "count": len(hits),
+            }
+        _L.info(
+            "Polygon BL4: learned selector found %d codes (previously %d), relearning",
+            len(hits),
+            hint.get("count") or 0,
         )
-        r.raise_for_status()
-        soup = BeautifulSoup(r.content, "html.parser")
+        rejects = []
+
+    # 1) Try the exact id-based approach first (legacy)
+    header = soup.find(
+        lambda tag: tag.name in ["h1", "h2", "h3", "h4"]
+        and tag.get("id") == "all-borderlands-4-shift-codes"
+    )
+
+    # 2) If not found, try to find a header whose text mentions Borderlands 4 and shift/shift codes
+    if not header:
+        for tag in soup.find_all(["h1", "h2", "h3", "h4"]):
+            txt = tag.get_text(" ", strip=True).lower()
+            if "borderlands 4" in txt and "shift" in txt:
+                header = tag
+                break
+
+    # Find the codes: prefer the list that immediately follows the header
+    hits = []
+    if header:
+        ul = header.find_next(["ul", "ol"])
+        if ul:
+            _L.debug("Polygon BL4: scanning list after detected header")
+            hits = scan_codes(ul, containers=("li",), rejects=rejects)
+        else:
+            _L.debug("Polygon BL4: header found but no following list element")
 
-        # 1) Try the exact id-based approach first (legacy)
-        header = soup.find(
-            lambda tag: tag.name in ["h1", "h2", "h3", "h4"]
-            and tag.get("id") == "all-borderlands-4-shift-codes"
+    # Fallback: scan all list items on the page if nothing matched so far
+    if not hits:
+        _L.debug(
+            "Polygon BL4: header-based parse yielded no codes, scanning all lists as fallback"
         )
+        rejects = []
+        hits = scan_codes(soup, containers=("li",), rejects=rejects)
 
-        # 2) If not found, try to find a header whose text mentions Borderlands 4 and shift/shift codes
-        if not header:
-            for tag in soup.find_all(["h1", "h2", "h3", "h4"]):
-                txt = tag.get_text(" ", strip=True).lower()
-                if "borderlands 4" in txt and "shift" in txt:
-                    header = tag
-                    break
-
-        codes = []
-        parsed_total = 0
-        duplicates_existing = 0
-        duplicates_inpage = 0
-
-        # Helper to parse LI text for a code + reward
-        def parse_li_text(text):
-            # find a 5x5 code anywhere in the text
-            code_match = re.search(r"([A-Za-z0-9]{5}(?:-[A-Za-z0-9]{5}){4})", text)
-            if not code_match:
-                return None
-            code = code_match.group(1).upper()
-            # reward is often in parentheses — if present, grab it
-            reward_match = re.search(r"\(([^)]+)\)", text)
-            reward = reward_match.group(1).strip() if reward_match else "Unknown"
-            return {
-                "code": code,
-                "reward": reward,
-                "expires": "Unknown",
-                "expired": False,
-            }
+    learned = None
+    if hits:
+        learned = {
+            "selectors": learn_selectors(hits, ["ul", "ol"]),
+            "count": len(hits),
+        }
+    return [hit.as_row() for hit in hits] + rejects, learned
 
-        # If we found a header, try to parse the immediate list after it
-        if header:
-            ul = header.find_next(["ul", "ol"])
-            if ul:
-                _L.debug("Polygon BL4: scanning list after detected header")
-                for li in ul.find_all("li"):
-                    text = li.get_text(" ", strip=True)
-                    parsed = parse_li_text(text)
-                    if not parsed:
-                        _L.debug("Polygon BL4: could not parse li: %s", text)
-                        continue
-                    parsed_total += 1
-                    if parsed["code"] in existing_codes_set:
-                        duplicates_existing += 1
-                        _L.debug(
-                            "Polygon BL4: Skipping duplicate code (already present): %s",
-                            parsed["code"],
-                        )
-                        continue
-                    if any(c["code"] == parsed["code"] for c in codes):
-                        duplicates_inpage += 1
-                        _L.debug(
-                            "Polygon BL4: Skipping duplicate code (in-page): %s",
-                            parsed["code"],
-                        )
-                        continue
-                    codes.append(parsed)
-            else:
-                _L.debug("Polygon BL4: header found but no following list element")
 
-        # Fallback: scan all lists on the page if nothing matched so far
-        if not codes:
-            _L.debug(
-                "Polygon BL4: header-based parse yielded no codes, scanning all lists as fallback"
-            )
-            for ul in soup.find_all(["ul", "ol"]):
-                for li in ul.find_all("li"):
-                    text = li.get_text(" ", strip=True)
-                    parsed = parse_li_text(text)
-                    if not parsed:
-                        continue
-                    parsed_total += 1
-                    if parsed["code"] in existing_codes_set:
-                        duplicates_existing += 1
-                        continue
-                    if any(c["code"] == parsed["code"] for c in codes):
-                        duplicates_inpage += 1
-                        continue
-                    codes.append(parsed)
-
-        new_count = len(codes)
-        # Report new codes and duplicate counts as standard info output
+def scrape_polygon_bl4_codes(existing_codes_set, collector=None, selector_cache=None):
+    return scrape_supplemental(
+        POLYGON_BL4_SOURCE, existing_codes_set, collector, selector_cache
+    )
+
+
+def parse_ign_bl4_page(content, hint=None):
+    """Parse the IGN BL4 wiki page, trying the learned selectors in ``hint`` first.
+
+    Returns (rows, hint) where hint records the tables/lists the codes came from.
+    Codes that couldn't be used are returned as rows with a ``problem``.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser")
+    rejects = []
+
+    if hint:
+        hits = []
+        for region in select_regions(soup, hint["selectors"]):
+            hits.extend(scan_codes(region, containers=("tr", "li"), rejects=rejects))
+        if not needs_relearn(hint, len(hits)):
+            _L.debug("IGN BL4: learned selectors matched %d codes", len(hits))
+            return [hit.as_row() for hit in hits] + rejects, {
+                "selectors": hint["selectors"],
+                "count": len(hits),
+            }
         _L.info(
-            "Polygon BL4: Found %d new candidate codes (parsed %d candidates, %d duplicates already present, %d duplicates in-page)",
-            new_count,
-            parsed_total,
-            duplicates_existing,
-            duplicates_inpage,
+            "IGN BL4: learned selectors found %d codes (previously %d), relearning",
+            len(hits),
+            hint.get("count") or 0,
         )
-        return codes
-    except Exception as e:
-        _L.error(f"Polygon BL4: Error scraping codes: {e}")
-        return []
+
+    # One pass over the page; each code is attributed to its nearest row or list item
+    rejects = []
+    hits = scan_codes(soup, containers=("tr", "li"), rejects=rejects)
+    learned = None
+    if hits:
+        learned = {
+            "selectors": learn_selectors(hits, ["table", "ul", "ol"]),
+            "count": len(hits),
+        }
+    return [hit.as_row() for hit in hits] + rejects, learned
 
 
-def scrape_ign_bl4_codes(existing_codes_set):
+def scrape_ign_bl4_codes(existing_codes_set, collector=None, selector_cache=None):
     """
     Parse IGN wiki for Borderlands 4 SHiFT codes.
     Strategy:
-      - fetch page, scan all tables (rows) and list items for any 5x5 code pattern
-      - extract reward from parentheses if present, detect 'expired' if strikethrough or text contains 'expired'
+      - fetch page, try the tables/lists that held codes last run (see selector_cache)
+      - otherwise scan the whole document once for any 5x5 code pattern
+      - map each code to its table row or list item and extract the reward from parentheses
+        if present, detect 'expired' if strikethrough or text contains 'expired'
       - return list of dicts matching other parsers: {code,reward,expires,expired}
       - log counts: parsed candidates, duplicates already present, in-page duplicates, new found
     """
-    url = "https://www.ign.com/wikis/borderlands-4/Borderlands_4_SHiFT_Codes"
-    # always log intent to request before doing the network call so the entry appears in logs
-    _L.info("Requesting IGN BL4 codes: " + url)
+    return scrape_supplemental(
+        IGN_BL4_SOURCE, existing_codes_set, collector, selector_cache
+    )
+
+
+# JavaScript arrays on the xsmashx88x page that hold codes
+XSMASH_ARRAYS = ("GOLD_KEYS_DATA", "SKINS_DATA")
+
+
+def scrape_xsmash_codes(existing_codes_set, collector=None):
+    """
+    Parse xsmashx88x Shift-Codes GitHub Pages site for SHiFT codes by extracting the
+    GOLD_KEYS_DATA and SKINS_DATA JavaScript arrays. Returns list of dicts:
+    {code, reward, expires, expired}.
+    """
+    return scrape_supplemental(XSMASH_SOURCE, existing_codes_set, collector)
+
+
+def _field(record, name):
+    """A record's value for ``name``, matching the key case-insensitively."""
+    if name in record:
+        return record[name]
+    for key, value in record.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def xsmash_reward(title):
+    """The reward named in an xsmash title such as '<b>Code</b>: 3 Gold Keys - Limited'."""
+    if not isinstance(title, str) or not title.strip():
+        return "Unknown"
     try:
-        r = requests.get(
-            url, timeout=15, headers={"User-Agent": "autoshift-scraper/1.0"}
-        )
-        r.raise_for_status()
-        soup = BeautifulSoup(r.content, "html.parser")
+        reward = html_text(title.strip())
+    except Exception:
+        return title
+    parts = reward.split(":", 1)
+    if len(parts) == 2:
+        after = parts[1].strip()
+        reward = re.split(r"\s[-|]\s", after)[0].strip() or reward
+    return reward
+
+
+def xsmash_expires(value):
+    """(expires, expired) for an xsmash ``createDate(y, m, d, ...)`` value."""
+    if not isinstance(value, Call) or value.name.lower() != "createdate":
+        return "Unknown", False
+    try:
+        nums_int = [int(float(n)) for n in value.args[:6]]
+        year = nums_int[0]
+        month = nums_int[1] if len(nums_int) > 1 else 1
+        day = nums_int[2] if len(nums_int) > 2 else 1
+        hour = nums_int[3] if len(nums_int) > 3 else 0
+        minute = nums_int[4] if len(nums_int) > 4 else 0
+        second = nums_int[5] if len(nums_int) > 5 else 0
+        month = max(1, min(12, month))
+        dt = datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc)
+    except Exception:
+        return value.raw.strip(), False
+    return dt.isoformat(), datetime.now(timezone.utc) > dt
 
-        code_re = re.compile(r"([A-Za-z0-9]{5}(?:-[A-Za-z0-9]{5}){4})")
-        codes = []
-        parsed_total = 0
-        duplicates_existing = 0
-        duplicates_inpage = 0
 
-        def extract_from_text(text, row_tag=None):
-            m = code_re.search(text)
-            if not m:
-                return None
-            code = m.group(1).upper()
-            # reward in parentheses if present
-            rm = re.search(r"\(([^)]+)\)", text)
-            reward = rm.group(1).strip() if rm else "Unknown"
-            # detect expired via explicit word or <s> in the provided tag if available
-            expired = False
-            if row_tag is not None:
-                if row_tag.find("s") is not None:
-                    expired = True
-            if "expired" in text.lower():
-                expired = True
-            return {
+def parse_xsmash_page(text, hint=None, arrays=XSMASH_ARRAYS):
+    """Parse the xsmashx88x page text; returns (rows, None) as it learns no selectors.
+
+    Records without a valid code are returned as rows with a ``problem``.
+    """
+    rows = []
+    found = set()
+    for array_name, record in iter_array_records(text, arrays):
+        found.add(array_name)
+        raw_code = _field(record, "code")
+        code = normalize_code(raw_code if isinstance(raw_code, str) else None)
+        if not code:
+            rows.append(
+                {
+                    "code": raw_code if isinstance(raw_code, (str, int, float)) else None,
+                    "problem": "invalid code",
+                    "array": array_name,
+                    "title": _field(record, "title"),
+                }
+            )
+            continue
+        expires_str, expired_flag = xsmash_expires(_field(record, "expires"))
+        rows.append(
+            {
                 "code": code,
-                "reward": reward,
-                "expires": "Unknown",
-                "expired": expired,
+                "reward": xsmash_reward(_field(record, "title")),
+                "expires": expires_str,
+                "expired": expired_flag,
             }
-
-        # 1) Scan all tables' rows
-        for table in soup.find_all("table"):
-            tbody = table.find("tbody") or table
-            for tr in tbody.find_all("tr"):
-                row_text = tr.get_text(" ", strip=True)
-                parsed_total += 1
-                parsed = extract_from_text(row_text, tr)
-                if not parsed:
-                    continue
-                if parsed["code"] in existing_codes_set:
-                    duplicates_existing += 1
-                    continue
-                if any(c["code"] == parsed["code"] for c in codes):
-                    duplicates_inpage += 1
-                    continue
-                codes.append(parsed)
-
-        # 2) Fallback: scan list items across the page
-        for ul in soup.find_all(["ul", "ol"]):
-            for li in ul.find_all("li"):
-                li_text = li.get_text(" ", strip=True)
-                parsed_total += 1
-                parsed = extract_from_text(li_text, li)
-                if not parsed:
-                    continue
-                if parsed["code"] in existing_codes_set:
-                    duplicates_existing += 1
-                    continue
-                if any(c["code"] == parsed["code"] for c in codes):
-                    duplicates_inpage += 1
-                    continue
-                codes.append(parsed)
-
-        new_count = len(codes)
-        _L.info(
-            "IGN BL4: Found %d new candidate codes (parsed %d candidates, %d duplicates already present, %d duplicates in-page)",
-            new_count,
-            parsed_total,
-            duplicates_existing,
-            duplicates_inpage,
         )
-        return codes
+
+    for array_name in arrays:
+        if array_name not in found:
+            _L.debug("xsmash: %s not found in page", array_name)
+    if not found:
+        _L.debug("xsmash: no supported data arrays found in page")
+    return rows, None
+
+
+# Supplemental sources, fetched after mentalmars and merged into Borderlands 4 universal
+POLYGON_BL4_SOURCE = {
+    "source": "polygon",
+    "label": "Polygon BL4",
+    "description": "Polygon BL4 codes",
+    "sourceURL": "https://www.polygon.com/borderlands-4-active-shift-codes-redeem/",
+    "parser": parse_polygon_bl4_page,
+}
+IGN_BL4_SOURCE = {
+    "source": "ign",
+    "label": "IGN BL4",
+    "description": "IGN BL4 codes",
+    "sourceURL": "https://www.ign.com/wikis/borderlands-4/Borderlands_4_SHiFT_Codes",
+    "parser": parse_ign_bl4_page,
+}
+XSMASH_SOURCE = {
+    "source": "xsmash",
+    "label": "xsmash",
+    "description": "xsmashx88x Shift-Codes page",
+    "sourceURL": "https://xsmashx88x.github.io/bl4shiftcodes/",
+    "parser": parse_xsmash_page,
+    # the parser works on the decoded page text rather than raw bytes
+    "body": "text",
+    # extra keyword arguments for the parser
+    "options": {"arrays": XSMASH_ARRAYS},
+}
+SUPPLEMENTAL_SOURCES = [POLYGON_BL4_SOURCE, IGN_BL4_SOURCE, XSMASH_SOURCE]
+
+
+def submit_supplemental(source, pool, selector_cache=None, run=None):
+    """Fetch a supplemental source and queue its page on the parse pool.
+
+    Returns the parse future, or None if the fetch failed.
+    """
+    # always log intent to request before doing the network call so the entry appears in logs
+    _L.info("Requesting %s: %s", source["description"], source["sourceURL"])
+    try:
+        # fetch() adds a simple user-agent to reduce chance of being blocked
+        r = fetch(source["sourceURL"], budget=run.budget() if run else None)
+        r.raise_for_status()
+        body = r.text if source.get("body") == "text" else r.content
+        hint = selector_cache.get(source["source"]) if selector_cache else None
+        return pool.submit(source["parser"], body, hint, **source.get("options", {}))
     except Exception as e:
-        _L.error(f"IGN BL4: Error scraping codes: {e}")
-        return []
+        _L.error("%s: Error scraping codes: %s", source["label"], e)
+        if run:
+            run.failed(source["source"], e)
+        return None
 
 
-def scrape_xsmash_codes(existing_codes_set):
+def collect_supplemental(
+    source,
+    future,
+    existing_codes_set,
+    collector=None,
+    selector_cache=None,
+    run=None,
+    diagnostics=None,
+):
+    """Wait for a supplemental parse and feed its rows to the collector.
+
+    With no future (or a failed or unfinished parse) the source's cached rows
+    are used, if any.
     """
-    Parse xsmashx88x Shift-Codes GitHub Pages site for SHiFT codes by extracting the
-    GOLD_KEYS_DATA and SKINS_DATA JavaScript arrays. Returns list of dicts:
-    {code, reward, expires, expired}.
+    rows = None
+    if future is not None and run is not None and not run.finished(source["source"], future):
+        future = None
+    if future is not None:
+        try:
+            rows, hint = future.result()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            _L.error("%s: Error scraping codes: %s", source["label"], error)
+            if run:
+                run.failed(source["source"], error)
+            if diagnostics is not None:
+                diagnostics.record(
+                    source["source"],
+                    {"url": source["sourceURL"], "error": error},
+                    "parse failed",
+                )
+        else:
+            if run:
+                run.succeeded(source["source"], rows)
+            if selector_cache:
+                selector_cache.update(source["source"], hint)
+    if rows is None:
+        rows = run.fallback(source["source"]) if run else None
+        if rows is None:
+            return []
+    return collect_candidates(
+        rows,
+        source["source"],
+        source["label"],
+        existing_codes_set,
+        collector,
+        diagnostics,
+    )
+
+
+def scrape_supplemental(source, existing_codes_set, collector=None, selector_cache=None):
+    """Fetch, parse and collect a single supplemental source in-process."""
+    future = submit_supplemental(source, InlineExecutor(), selector_cache)
+    return collect_supplemental(
+        source, future, existing_codes_set, collector, selector_cache
+    )
+
+
+def preflight_lastmod(tracker, urls, run):
+    """Fetch each host's sitemap once and note which of ``urls`` are unchanged.
+
+    Hosts without a sitemap in SITEMAPS are left to the normal fetch.
     """
-    url = "https://xsmashx88x.github.io/bl4shiftcodes/"
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(url_key(url).split("/", 1)[0], []).append(url)
+    for host, host_urls in by_host.items():
+        sitemap = SITEMAPS.get(host)
+        if not sitemap:
+            continue
+        name = f"sitemap: {host}"
+        if not run.allowed(name):
+            continue
+        try:
+            r = fetch(sitemap, budget=run.budget())
+            r.raise_for_status()
+        except Exception as e:
+            _L.warning("%s: %s; fetching its pages as usual", name, e)
+            run.failed(name, e)
+            continue
+        run.breakers.record_success(name)
+        unchanged = tracker.check(sitemap, r.content, host_urls)
+        _L.info(
+            "%s: %d of %d pages unchanged since their last scrape",
+            name,
+            unchanged,
+            len(host_urls),
+        )
+
+
+def notify_subscribers(args, state, output, seen, first_run=False):
+    """Queue the run's changes for each webhook subscriber and deliver the outbox."""
     try:
-        _L.info("Requesting xsmashx88x Shift-Codes page: " + url)
-        r = requests.get(
-            url, timeout=15, headers={"User-Agent": "autoshift-scraper/1.0"}
+        subscribers = load_subscribers(args.webhooks)
+    except (OSError, ValueError) as e:
+        _L.error("Not sending webhooks; can't read %s: %s", args.webhooks, e)
+        return
+    outbox = Outbox(state.path(OUTBOX))
+    if first_run:
+        # with nothing seen before, every code would be "new"
+        _L.info("Webhooks: first run, not announcing the initial codes")
+    else:
+        new, expired = code_changes(output["codes"], seen)
+        queued = outbox.queue(subscribers, new, expired, output["meta"].get("generated"))
+        _L.info(
+            "Webhooks: %d new and %d newly expired entries, %d batches queued",
+            len(new),
+            len(expired),
+            queued,
+        )
+        outbox.save()
+    if len(outbox):
+        sent, failed, waiting = outbox.deliver(workers=args.webhook_workers)
+        _L.info(
+            "Webhooks: %d batches delivered, %d rejected, %d waiting for the next run",
+            sent,
+            failed,
+            waiting,
         )
-        r.raise_for_status()
-        text = r.text
-
-        array_names = ("GOLD_KEYS_DATA", "SKINS_DATA")
-        object_re = re.compile(r"\{(.*?)\}", re.DOTALL)
-        code_re = re.compile(r"code\s*:\s*['\"](?P<code>[A-Za-z0-9\-]+)['\"]", re.IGNORECASE)
-        expires_re = re.compile(r"expires\s*:\s*createDate\((?P<expires>[^)]*)\)", re.IGNORECASE)
-        title_re = re.compile(r"title\s*:\s*(?P<title>'[^']*'|\"[^\"]*\")", re.IGNORECASE)
-
-        candidates = []
-        parsed_total = 0
-        duplicates_existing = 0
-        duplicates_inpage = 0
-
-        found_array = False
-        for array_name in array_names:
-            array_match = re.search(
-                rf"{array_name}\s*=\s*\[(.*?)\]\s*;",
-                text,
-                re.DOTALL | re.IGNORECASE,
-            )
-            if not array_match:
-                _L.debug("xsmash: %s not found in page", array_name)
-                continue
 
-            found_array = True
-            array_body = array_match.group(1)
 
-            for object_match in object_re.finditer(array_body):
-                object_body = object_match.group(1)
-                code_match = code_re.search(object_body)
-                expires_match = expires_re.search(object_body)
-                title_match = title_re.search(object_body)
+def code_sources(page_results, collector):
+    """Map each code to the names of the sources that reported it this run."""
+    sources = {}
+    for name, tables in page_results.items():
+        for table in tables or ():
+            for row in table.get("codes", ()):
+                code = normalize_code(row.get("code"))
+                if code and name not in sources.setdefault(code, []):
+                    sources[code].append(name)
+    for code, names in collector.source_map().items():
+        for name in names:
+            if name not in sources.setdefault(code, []):
+                sources[code].append(name)
+    return sources
+
+
+def add_supplemental_codes(code_tables, rows):
+    """Add ``rows`` to the Borderlands 4 universal table in ``code_tables``.
+
+    The table and its list are replaced by copies rather than extended in
+    place, as they are shared with page_results (so code_sources would
+    credit the rows to mentalmars). Returns False if there is no such table.
+    """
+    for i, code_table_list in enumerate(code_tables):
+        for j, code_table in enumerate(code_table_list):
+            if (
+                code_table.get("game") == "Borderlands 4"
+                and code_table.get("platform") == "universal"
+            ):
+                code_table_list = list(code_table_list)
+                code_table_list[j] = dict(code_table, codes=code_table["codes"] + rows)
+                code_tables[i] = code_table_list
+                return True
+    return False
 
-                parsed_total += 1
-                code = code_match.group("code") if code_match else None
-                if not code:
-                    continue
-                code = code.strip().upper()
 
-                if code in existing_codes_set:
-                    duplicates_existing += 1
-                    continue
-                if any(c["code"] == code for c in candidates):
-                    duplicates_inpage += 1
-                    continue
+def mentalmars_source_name(webpage):
+    """Circuit breaker / cache name for a mentalmars page."""
+    return "mentalmars: " + webpage.get("game")
 
-                raw_title = title_match.group("title") if title_match else None
-                reward = "Unknown"
-                if raw_title:
-                    raw_title = raw_title.strip()
-                    if (raw_title.startswith("'") and raw_title.endswith("'")) or (
-                        raw_title.startswith('"') and raw_title.endswith('"')
-                    ):
-                        raw_title = raw_title[1:-1]
-                    try:
-                        reward = BeautifulSoup(raw_title, "html.parser").get_text(
-                            " ", strip=True
-                        )
-                        parts = reward.split(":", 1)
-                        if len(parts) == 2:
-                            after = parts[1].strip()
-                            reward = re.split(r"\s[-|]\s", after)[0].strip() or reward
-                    except Exception:
-                        reward = raw_title
-
-                expires_raw = expires_match.group("expires") if expires_match else None
-                expires_str = "Unknown"
-                expired_flag = False
-                if expires_raw:
-                    nums = [
-                        n.strip()
-                        for n in re.split(r"\s*,\s*", expires_raw)
-                        if n.strip()
-                    ]
-                    try:
-                        nums_int = [int(float(n)) for n in nums[:6]]
-                        year = nums_int[0]
-                        month = nums_int[1] if len(nums_int) > 1 else 1
-                        day = nums_int[2] if len(nums_int) > 2 else 1
-                        hour = nums_int[3] if len(nums_int) > 3 else 0
-                        minute = nums_int[4] if len(nums_int) > 4 else 0
-                        second = nums_int[5] if len(nums_int) > 5 else 0
-                        if month == 0:
-                            month = 1
-                        if month > 12:
-                            month = max(1, min(12, month))
-                        try:
-                            dt = datetime(
-                                year,
-                                month,
-                                day,
-                                hour,
-                                minute,
-                                second,
-                                tzinfo=timezone.utc,
-                            )
-                            expires_str = dt.isoformat()
-                            expired_flag = datetime.now(timezone.utc) > dt
-                        except Exception:
-                            expires_str = expires_raw.strip()
-                    except Exception:
-                        expires_str = expires_raw.strip()
-
-                candidates.append(
-                    {
-                        "code": code,
-                        "reward": reward,
-                        "expires": expires_str,
-                        "expired": expired_flag,
-                    }
-                )
 
-        if not found_array:
-            _L.debug("xsmash: no supported data arrays found in page")
-            return []
+class SourceRun:
+    """What one run knows about its sources: deadline, breakers and cached results."""
+
+    def __init__(self, deadline, breakers, source_cache, source_budget, freshness=None):
+        self.deadline = deadline
+        self.breakers = breakers
+        self.source_cache = source_cache
+        self.source_budget = source_budget
+        self.freshness = freshness
+        # source -> when the cached rows it contributed were scraped
+        self.stale = {}
 
-        new_count = len(candidates)
+    def budget(self):
+        return self.deadline.budget(self.source_budget)
+
+    def fresh_rows(self, name):
+        """Cached rows for a source scraped within the freshness window, else None."""
+        if not self.source_cache.fresh(name, self.freshness):
+            return None
         _L.info(
-            "xsmash: Found %d new candidate codes (parsed %d candidates, %d duplicates already present, %d duplicates in-page)",
-            new_count,
-            parsed_total,
-            duplicates_existing,
-            duplicates_inpage,
+            "%s: scraped %s ago, within the freshness window; not fetching",
+            name,
+            self.source_cache.age(name),
         )
-        return candidates
-    except Exception as e:
-        _L.error(f"xsmash parser: Error scraping codes: {e}")
-        return []
+        return deepcopy(self.source_cache.get(name)["rows"])
+
+    def unchanged_rows(self, name):
+        """Cached rows for a source whose page hasn't changed, or None if there are none."""
+        entry = self.source_cache.get(name)
+        if entry is None:
+            return None
+        _L.info("%s: page unchanged; using its result from %s", name, entry["scraped"])
+        return deepcopy(entry["rows"])
+
+    def allowed(self, name):
+        """Whether ``name`` should be fetched, counting a skip against it if not."""
+        if self.deadline.expired():
+            _L.warning(
+                "Skipping %s: run deadline of %.0fs reached", name, self.deadline.seconds
+            )
+            self.breakers.skip(name, "deadline")
+            return False
+        return self.breakers.allow(name)
+
+    def finished(self, name, future):
+        """Wait for ``future`` until the run deadline; False if it is still running.
+
+        Running out of time is counted as a deadline skip, not a failure, so
+        it doesn't trip the source's breaker.
+        """
+        if wait([future], timeout=self.deadline.remaining()).done:
+            return True
+        _L.warning(
+            "Gave up waiting for %s: run deadline of %.0fs reached",
+            name,
+            self.deadline.seconds,
+        )
+        self.breakers.skip(name, "deadline")
+        return False
+
+    def succeeded(self, name, rows):
+        self.breakers.record_success(name)
+        self.source_cache.put(name, rows)
+
+    def failed(self, name, error):
+        self.breakers.record_failure(name, error)
+
+    def fallback(self, name):
+        """The last good rows for a source that produced none this run, or None."""
+        entry = self.source_cache.get(name)
+        if entry is None:
+            _L.warning("%s: no cached result to fall back on; its codes are left out", name)
+            return None
+        _L.warning("%s: using cached result from %s", name, entry["scraped"])
+        self.stale[name] = entry["scraped"]
+        # callers extend the rows, which must not touch the cache
+        return deepcopy(entry["rows"])
+
+    def finish(self):
+        self.breakers.save()
+        self.source_cache.save()
+        self.breakers.log_report()
+        if self.stale:
+            _L.warning("Stale sources in this run: %s", ", ".join(sorted(self.stale)))
 
 
 # small helper to interpret schedule strings
@@ -926,6 +1225,45 @@ def parse_schedule_arg(schedule_str):
             return None
 
 
+def publish_to_github(args, commit_msg, file_path=SHIFTCODESJSONPATH):
+    """Commit ``file_path`` as shiftcodes.json on the main branch of args.user/args.repo."""
+    # PyGithub is only imported when we actually publish
+    try:
+        from github import Github
+    except ModuleNotFoundError:
+        _L.error(
+            "PyGithub is not installed. Skipping GitHub publish for %s/%s.",
+            args.user,
+            args.repo,
+        )
+        return None
+
+    _L.info("Connecting to GitHub repo: " + args.user + "/" + args.repo)
+    # Connect to GitHub
+    g = Github(args.token, base_url=args.github_api)
+    repo = g.get_repo(args.user + "/" + args.repo)
+
+    # Read in the latest file
+    _L.info("Read in shiftcodes file")
+    with open(file_path, "rb") as f:
+        file_to_commit = f.read()
+
+    # Push to GitHub:
+    _L.info("Push and Commit")
+    contents = repo.get_contents(
+        "shiftcodes.json", ref="main"
+    )  # Retrieve old file to get its SHA and path
+    commit_return = repo.update_file(
+        contents.path,
+        commit_msg,
+        file_to_commit,
+        contents.sha,
+        branch="main",
+    )  # Add, commit and push branch
+    _L.info("GitHub result: " + str(commit_return))
+    return commit_return
+
+
 def main(args):
 
     # Setup json output folder
@@ -937,106 +1275,193 @@ def main(args):
     codes_excl_expired = []
     code_tables = []
 
-    # Read in the previous codes so we can retain timestamps and know how many are new
-    with open(SHIFTCODESJSONPATH, "rb") as f:
-        try:
-            previous_codes = json.loads(f.read())
-        except:
-            previous_codes = None
-            pass
-    # Run any migrations on the previous codes file to bring it up to date
-    previous_codes, migration_performed = run_migrations_on_shiftfile(
-        SHIFTCODESJSONPATH, previous_codes
+    # Read in the previous codes so we can retain timestamps and know how many
+    # are new. Only the compact (code, game) index is kept in memory.
+    try:
+        previous_meta, previous_codes = load_previous_index(SHIFTCODESJSONPATH)
+    except ShiftFileError as e:
+        _L.error("Could not read previous codes: %s", e)
+        _L.error(
+            "Not overwriting %s; fix or remove it and run again.", SHIFTCODESJSONPATH
+        )
+        return
+    # Run any migrations on the previous codes file to bring it up to date;
+    # the full file is only loaded when there is a migration to run
+    migration_performed = False
+    if needs_migration(previous_meta):
+        previous_codes, migration_performed = run_migrations_on_shiftfile(
+            SHIFTCODESJSONPATH,
+            load_shiftfile(SHIFTCODESJSONPATH),
+            dry_run=args.dry_run_migrations,
+        )
+    if args.dry_run_migrations:
+        _L.info("Migration dry run complete; not scraping.")
+        return
+    if not isinstance(previous_codes, PreviousCodeIndex):
+        previous_codes = PreviousCodeIndex.from_codes(previous_codes)
+
+    try:
+        state = StateDir(args.state_dir)
+    except StateError as e:
+        _L.error("Can't use the state directory: %s", e)
+        return
+
+    # "Seen before?" comes from the code history, started from the previous
+    # output the first time; codes that dropped off a page keep their dates
+    history = CodeHistory(state.path(HISTORY))
+    first_run = not len(history) and not len(previous_codes)
+    if not len(history) and len(previous_codes):
+        history.seed(previous_codes)
+    seen = SeenIndex(history, previous_codes)
+
+    # Fetch every source page in turn, handing each one to the parse pool as
+    # soon as it arrives so parsing overlaps with the remaining fetches. Each
+    # source gets a slice of the run deadline; a source that fails, misses it
+    # or has an open circuit breaker contributes its last good (stale) rows.
+    run = SourceRun(
+        RunDeadline(args.run_deadline),
+        CircuitBreakers(state.path(BREAKERS)),
+        SourceCache(state.path(SOURCES), ttl=timedelta(hours=args.cache_ttl)),
+        args.source_budget,
+        freshness=timedelta(minutes=args.freshness),
     )
+    selector_cache = SelectorCache(state.path(SELECTORS))
+    # One small sitemap fetch per host says which pages changed since their
+    # last good parse; unchanged pages come from the source cache
+    lastmod = LastmodTracker(state.path(LASTMOD))
+    # problem rows seen while parsing and generating, written once at the end
+    diagnostics = DiagnosticsSink(state.path(DIAGNOSTICS))
+    if not args.no_preflight:
+        preflight_lastmod(lastmod, [webpage["sourceURL"] for webpage in webpages], run)
+    with ParsePool(args.parse_workers) as pool:
+        page_results = {}
+        page_futures = []
+        for webpage in webpages:
+            name = mentalmars_source_name(webpage)
+            cached = run.fresh_rows(name)
+            if cached is None and lastmod.unchanged(webpage["sourceURL"]):
+                cached = run.unchanged_rows(name)
+            if cached is not None:
+                page_results[name] = cached
+                continue
+            if not run.allowed(name):
+                page_results[name] = run.fallback(name)
+                continue
+            try:
+                content, scrapedDateAndTime = fetch_webpage(webpage, budget=run.budget())
+            except Exception as e:
+                _L.error("%s: Error fetching codes: %s", name, e)
+                run.failed(name, e)
+                page_results[name] = run.fallback(name)
+                continue
+            page_futures.append(
+                (
+                    webpage,
+                    pool.submit(
+                        parse_mentalmars_page, content, webpage, scrapedDateAndTime
+                    ),
+                )
+            )
+        supplemental_futures = []
+        for source in SUPPLEMENTAL_SOURCES:
+            cached = run.fresh_rows(source["source"])
+            future = None
+            if cached is None and run.allowed(source["source"]):
+                future = submit_supplemental(source, pool, selector_cache, run)
+            supplemental_futures.append((source, future, cached))
+
+        # Scrape the source webpage into a normalised Dictionary
+        for webpage, future in page_futures:
+            name = mentalmars_source_name(webpage)
+            if not run.finished(name, future):
+                page_results[name] = run.fallback(name)
+                continue
+            try:
+                tables = future.result()
+                if not tables:
+                    raise ValueError("no code tables found on the page")
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                _L.error("%s: Error parsing codes: %s", name, error)
+                run.failed(name, error)
+                diagnostics.record(
+                    name, {"url": webpage["sourceURL"], "error": error}, "parse failed"
+                )
+                page_results[name] = run.fallback(name)
+            else:
+                run.succeeded(name, tables)
+                lastmod.record(webpage["sourceURL"])
+                page_results[name] = tables
+        code_tables = [
+            page_results[mentalmars_source_name(webpage)]
+            for webpage in webpages
+            if page_results.get(mentalmars_source_name(webpage))
+        ]
 
-    # Scrape the source webpage into a normalised Dictionary
-    for webpage in webpages:
-        code_tables.append(scrape_codes(webpage))
-
-    # Convert the normalised Dictionary into the denormalised autoshift structure
-    codes_inc_expired = generateAutoshiftJSON(code_tables, previous_codes, True)
-    codes_excl_expired = generateAutoshiftJSON(code_tables, previous_codes, False)
-
-    # --- Polygon BL4 scraper: run after all other parsers ---
-    # Build a set of all codes already present (case-insensitive)
-    existing_codes_set = set()
-    for code_entry in codes_inc_expired[0].get("codes", []):
-        code_val = code_entry.get("code")
-        if code_val:
-            existing_codes_set.add(code_val.upper())
-
-    polygon_bl4_codes = scrape_polygon_bl4_codes(existing_codes_set)
-    if polygon_bl4_codes:
-        # Find the Borderlands 4 universal code_table in code_tables
-        for code_table_list in code_tables:
-            for code_table in code_table_list:
-                if (
-                    code_table.get("game") == "Borderlands 4"
-                    and code_table.get("platform") == "universal"
-                ):
-                    # Add new codes to this table
-                    code_table["codes"].extend(polygon_bl4_codes)
-                    _L.info(
-                        f"Polygon BL4: Added {len(polygon_bl4_codes)} codes to Borderlands 4 universal"
-                    )
-                    break
-
-        # Re-generate the output JSONs with the new codes included
-        codes_inc_expired = generateAutoshiftJSON(code_tables, previous_codes, True)
-        codes_excl_expired = generateAutoshiftJSON(code_tables, previous_codes, False)
-
-    # --- IGN BL4 scraper: run after Polygon (rebuild existing set from latest data) ---
-    existing_codes_set = set()
-    for code_entry in codes_inc_expired[0].get("codes", []):
-        code_val = code_entry.get("code")
-        if code_val:
-            existing_codes_set.add(code_val.upper())
-
-    # log the invocation from main so it's visible in the main flow
-    _L.info("Invoking IGN BL4 parser")
-    ign_bl4_codes = scrape_ign_bl4_codes(existing_codes_set)
-    if ign_bl4_codes:
-        for code_table_list in code_tables:
-            for code_table in code_table_list:
-                if (
-                    code_table.get("game") == "Borderlands 4"
-                    and code_table.get("platform") == "universal"
-                ):
-                    code_table["codes"].extend(ign_bl4_codes)
-                    _L.info(
-                        f"IGN BL4: Added {len(ign_bl4_codes)} codes to Borderlands 4 universal"
-                    )
-                    break
-
-        # Re-generate the output JSONs with the new codes included
-        codes_inc_expired = generateAutoshiftJSON(code_tables, previous_codes, True)
-        codes_excl_expired = generateAutoshiftJSON(code_tables, previous_codes, False)
-
-    # --- xsmashx88x GH-Pages scraper: run after IGN (rebuild existing set from latest data) ---
-    existing_codes_set = set()
-    for code_entry in codes_inc_expired[0].get("codes", []):
-        code_val = code_entry.get("code")
-        if code_val:
-            existing_codes_set.add(code_val.upper())
-
-    xsmash_codes = scrape_xsmash_codes(existing_codes_set)
-    if xsmash_codes:
-        for code_table_list in code_tables:
-            for code_table in code_table_list:
-                if (
-                    code_table.get("game") == "Borderlands 4"
-                    and code_table.get("platform") == "universal"
-                ):
-                    code_table["codes"].extend(xsmash_codes)
-                    _L.info(
-                        f"xsmash: Added {len(xsmash_codes)} codes to Borderlands 4 universal"
-                    )
-                    break
+        # Convert the normalised Dictionary into the denormalised autoshift structure
+        codes_inc_expired = generateAutoshiftJSON(
+            code_tables, seen, True, run.stale, diagnostics
+        )
+        codes_excl_expired = generateAutoshiftJSON(
+            code_tables, seen, False, run.stale, diagnostics
+        )
+
+        # --- Supplemental BL4 scrapers: collected after all other parsers ---
+        # Build a set of all codes already present (case-insensitive); the
+        # supplemental sources share one collector so a code reported by several
+        # of them is merged into a single row instead of being dropped.
+        existing_codes_set = CodeStore.from_output(codes_inc_expired).codes()
+        collector = CandidateCollector(existing_codes_set)
+        for source, future, cached in supplemental_futures:
+            if cached is not None:
+                collect_candidates(
+                    cached, source["source"], source["label"], existing_codes_set, collector
+                )
+                continue
+            collect_supplemental(
+                source,
+                future,
+                existing_codes_set,
+                collector,
+                selector_cache,
+                run,
+                diagnostics,
+            )
+        if run.deadline.expired():
+            # don't wait on parses that overran the deadline
+            pool.abandon()
+    selector_cache.save()
+    lastmod.save()
+    run.finish()
+
+    # Codes the mentalmars tables already have keep their rows, but a reward
+    # or expiry the supplemental sources know fills in an "Unknown"
+    merged = collector.merge_existing(
+        row
+        for code_table_list in code_tables
+        for code_table in code_table_list
+        for row in code_table["codes"]
+    )
+    if merged:
+        _L.info("Supplemental BL4: Filled in details of %d existing codes", merged)
+    supplemental_codes = collector.rows()
+    if supplemental_codes and add_supplemental_codes(code_tables, supplemental_codes):
+        _L.info(
+            "Supplemental BL4: Added %d codes to Borderlands 4 universal (%d reported by more than one source)",
+            len(supplemental_codes),
+            collector.multi_source_count(),
+        )
 
-        # Re-generate the output JSONs with the new codes included
-        codes_inc_expired = generateAutoshiftJSON(code_tables, previous_codes, True)
-        codes_excl_expired = generateAutoshiftJSON(code_tables, previous_codes, False)
+    if supplemental_codes or merged:
+        # Re-generate the output JSONs with the new codes and details included
+        codes_inc_expired = generateAutoshiftJSON(
+            code_tables, seen, True, run.stale, diagnostics
+        )
+        codes_excl_expired = generateAutoshiftJSON(
+            code_tables, seen, False, run.stale, diagnostics
+        )
 
+    diagnostics.flush()
     _L.info("Scraping Complete. Now writing out shiftcodes.json file")
 
     _L.info(
@@ -1045,61 +1470,92 @@ def main(args):
         + " new codes."
     )
 
-    # Write out the file even if no new codes so we can track last scrape time
-    with open(SHIFTCODESJSONPATH, "w") as write_file:
-        json.dump(codes_inc_expired, write_file, indent=2, default=str)
+    # Write out the file even if no new codes so we can track last scrape time.
+    # Expiry reports queued by mark_expired.py are applied in the same write,
+    # under the lock every writer of the file takes.
+    with inbox.file_lock(SHIFTCODESJSONPATH):
+        expiry_requests = inbox.pending(SHIFTCODESJSONPATH)
+        # codes marked expired straight in the file (mark_expired.py) since
+        # it was read at the start of the run
+        late_expiries = inbox.expired_since(SHIFTCODESJSONPATH, previous_codes)
+        not_found = []
+        if expiry_requests or late_expiries:
+            store = CodeStore.from_output(codes_inc_expired)
+            for code, expires in late_expiries.items():
+                store.mark_expired(code, expires)
+            if late_expiries:
+                _L.info(
+                    "Kept %d expiries written to %s during the run",
+                    len(late_expiries),
+                    SHIFTCODESJSONPATH,
+                )
+            found, not_found = inbox.apply(store, expiry_requests)
+            if expiry_requests:
+                _L.info(
+                    "Inbox: %d queued requests marked %d entries expired",
+                    len(expiry_requests),
+                    found,
+                )
+            if not_found:
+                _L.warning(
+                    "Inbox: codes not in the output, left queued: %s",
+                    ", ".join(not_found),
+                )
+            codes_inc_expired[0]["meta"]["summary"] = summarize(
+                codes_inc_expired[0]["codes"], datetime.now(timezone.utc)
+            )
+        if args.canonical:
+            # sorted, stable output: unchanged codes give a byte-identical file
+            output, status = canonicalize(codes_inc_expired)
+            write_shiftfile(SHIFTCODESJSONPATH, output)
+            write_json(STATUSJSONPATH, status)
+        else:
+            write_shiftfile(SHIFTCODESJSONPATH, codes_inc_expired)
+        write_artifacts(SHIFTCODESJSONPATH)
+        inbox.settle(expiry_requests, not_found)
+
+    # Queue this run's new and newly expired codes for the webhooks before
+    # the history moves on, then try to deliver everything queued
+    if args.webhooks:
+        notify_subscribers(args, state, codes_inc_expired[0], seen, first_run)
+
+    history.record_run(
+        codes_inc_expired[0]["codes"],
+        datetime.now(timezone.utc),
+        code_sources(page_results, collector),
+    )
+    history.maybe_compact()
+    if args.state_bundle:
+        # a bundle that can't be written must not stop the publish below
+        try:
+            export_state(state, args.state_bundle)
+        except OSError as e:
+            _L.error("Failed to export the state to %s: %s", args.state_bundle, e)
 
     # Commit the new file to GitHub publically if the args are set:
     if args.user and args.repo and args.token:
-        if Github is None:
-            _L.error(
-                "PyGithub is not installed. Skipping GitHub publish for %s/%s.",
-                args.user,
-                args.repo,
-            )
-            return
         # Only commit if there are new codes or if a migration was performed
         if (
             codes_inc_expired[0].get("meta").get("newcodecount") > 0
             or migration_performed
+            or expiry_requests
+            or late_expiries
         ):
-            _L.info("Connecting to GitHub repo: " + args.user + "/" + args.repo)
-            # Connect to GitHub
-            file_path = SHIFTCODESJSONPATH
-            g = Github(args.token)
-            repo = g.get_repo(args.user + "/" + args.repo)
-
-            # Read in the latest file
-            _L.info("Read in shiftcodes file")
-            with open(file_path, "rb") as f:
-                file_to_commit = f.read()
-
-            # Push to GitHub:
-            _L.info("Push and Commit")
-            contents = repo.get_contents(
-                "shiftcodes.json", ref="main"
-            )  # Retrieve old file to get its SHA and path
-            commit_msg = (
-                "added new codes"
-                if codes_inc_expired[0].get("meta").get("newcodecount") > 0
-                else "migrated shiftcodes file"
-            )
-            commit_return = repo.update_file(
-                contents.path,
-                commit_msg,
-                file_to_commit,
-                contents.sha,
-                branch="main",
-            )  # Add, commit and push branch
-            _L.info("GitHub result: " + str(commit_return))
+            if codes_inc_expired[0].get("meta").get("newcodecount") > 0:
+                commit_msg = "added new codes"
+            elif migration_performed:
+                commit_msg = "migrated shiftcodes file"
+            else:
+                commit_msg = "marked codes expired"
+            publish_to_github(args, commit_msg)
         else:
             _L.info(
-                "Not committing to GitHub as there are no new codes and no migration."
+                "Not committing to GitHub as there are no new codes, expiries or migration."
             )
 
-
 if __name__ == "__main__":
     import os
+    import threading
 
     # build argument parser
     parser = setup_argparser()
@@ -1110,9 +1566,45 @@ if __name__ == "__main__":
     if args.verbose:
         _L.setLevel(DEBUG)
         _L.debug("Debug mode on")
+    if args.officialscraper:
+        _L.warning(
+            "--officialscraper is deprecated and has no effect; "
+            "use --request-interval and --schedule-jitter instead"
+        )
+
+    # One rate limiter for the life of the process, so back-offs requested by a
+    # site (Retry-After) carry over into later scheduled runs
+    set_rate_limiter(
+        HostRateLimiter(
+            interval=args.request_interval,
+            jitter=args.request_jitter,
+            robots_fetcher=fetch_robots,
+            user_agent=USER_AGENT,
+        )
+    )
+
+    # Warm caches from an earlier run, e.g. restored by a CI cache step
+    if args.state_bundle and path.exists(args.state_bundle):
+        try:
+            import_state(StateDir(args.state_dir), args.state_bundle)
+        except StateError as e:
+            _L.warning("Starting without the saved state: %s", e)
+
+    # Optional local HTTP endpoint, refreshed after every run
+    server = None
+    if args.serve is not None:
+        from server import CodeServer
+
+        server = CodeServer(SHIFTCODESJSONPATH, host=args.serve_host, port=args.serve)
+        server.start()
+
+    def run(args):
+        main(args)
+        if server:
+            server.reload()
 
     # execute the main function at least once (and only once if scheduler is not set)
-    main(args)
+    run(args)
 
     # scheduling: accept minutes when user supplies e.g. "30m", otherwise treat as hours
     sched = parse_schedule_arg(args.schedule)
@@ -1123,29 +1615,33 @@ if __name__ == "__main__":
         scheduler = BlockingScheduler()
         if mode == "hours":
             hours = float(val)
-            if hours < 2:
-                if getattr(args, "officialscraper", False):
-                    _L.info(
-                        "Official scraper override enabled; scheduling every %.2f hours",
-                        hours,
-                    )
-                else:
-                    _L.warning(
-                        f"Running this tool every {hours} hours would result in too many requests.\n"
-                        "Scheduling changed to run every 2 hours!"
-                    )
-                    hours = 2.0
+            # Politeness towards the sources is handled per request by the
+            # rate limiter, so only the same 15 minute floor as "Nm" applies
+            if hours * 60 < 15:
+                _L.warning(
+                    "Schedule value too short (%.2f hours). Enforcing minimum of 15m.",
+                    hours,
+                )
+                hours = 0.25
             # robust: convert total hours to total minutes (rounded) then split
             total_minutes = int(round(hours * 60))
             h, m = divmod(total_minutes, 60)
             _L.info(f"Scheduling to run every {h:02}:{m:02} hours")
-            scheduler.add_job(main, "interval", args=(args,), hours=hours)
+            scheduler.add_job(
+                run, "interval", args=(args,), hours=hours, jitter=args.schedule_jitter
+            )
         else:  # minutes
             minutes = int(val)
             hh = minutes // 60
             mm = minutes % 60
             _L.info(f"Scheduling to run every {hh:02}:{mm:02} (hh:mm)")
-            scheduler.add_job(main, "interval", args=(args,), minutes=minutes)
+            scheduler.add_job(
+                run,
+                "interval",
+                args=(args,),
+                minutes=minutes,
+                jitter=args.schedule_jitter,
+            )
 
         print(f"Press Ctrl+{'Break' if os.name == 'nt' else 'C'} to exit")
         try:
@@ -1156,5 +1652,12 @@ if __name__ == "__main__":
         # invalid or no schedule specified -> no scheduler started
         if args.schedule:
             _L.error("Invalid schedule argument provided: %s", args.schedule)
+        if server:
+            # nothing scheduled: keep serving the file from this run
+            print(f"Press Ctrl+{'Break' if os.name == 'nt' else 'C'} to exit")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
 
     _L.info("Goodbye.")
@@ -0,0 +1,258 @@
+"""End-to-end timing of repeated scraper runs, publish included.
+
+Serves synthetic versions of every source page (and the mentalmars sitemap)
+from a local SourceStandIn and publishes to a GitHubStandIn, then runs
+autoshift_scraper.main() several times in a scratch directory. Each run the
+Borderlands 4 page gains --new-codes codes and its sitemap lastmod moves on,
+so later runs look like a normal scheduled run: one changed page, the rest
+unchanged, and a publish. --mark-expired also marks a code expired and
+uploads it with mark_expired.py between runs.
+
+Reports the wall time of each run, the requests each stand-in answered, and
+the time spent per stage. Parse stages are only timed with --parse-workers 0
+(the default here), as worker processes can't report back.
+
+    python benchmarks/bench_pipeline.py [--runs N] [--codes N] [--new-codes N] [--mark-expired]
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import autoshift_scraper as scraper
+import mark_expired
+from common import _L, DEBUG, WARNING
+from standins import GitHubStandIn, SourceStandIn
+
+USER, REPO, TOKEN = "bench", "autoshift-codes", "bench-token"
+ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ0123456789"
+
+
+def code_for(*parts):
+    """A valid-looking SHiFT code derived from ``parts``."""
+    digest = hashlib.sha256(":".join(map(str, parts)).encode("utf-8")).digest()
+    chars = [ALPHABET[b % len(ALPHABET)] for b in digest[:25]]
+    return "-".join("".join(chars[i : i + 5]) for i in range(0, 25, 5))
+
+
+def mentalmars_page(webpage, codes, extra=0):
+    """One table per configured table; the first also gets ``extra`` newer codes."""
+    figures = []
+    for t, _ in enumerate(webpage["platform_ordered_tables"]):
+        rows = [code_for(webpage["game"], t, i) for i in range(codes)]
+        if t == 0:
+            rows = [code_for(webpage["game"], "new", i) for i in range(extra)] + rows
+        body = "".join(
+            f"<tr><td>{code}</td><td>{1 + i % 5} Golden Keys</td><td>Unknown</td></tr>"
+            for i, code in enumerate(rows)
+        )
+        figures.append(
+            "<figure><table><thead><tr><th>SHiFT Code</th><th>Reward</th><th>Expire Date</th></tr></thead>"
+            f"<tbody>{body}</tbody></table></figure>"
+        )
+    return ("<html><body><article>" + "".join(figures) + "</article></body></html>").encode("utf-8")
+
+
+def polygon_page(codes):
+    items = "".join(f"<li>{code_for('polygon', i)} (1 Golden Key) — added Sept. 22</li>" for i in range(codes))
+    return (
+        '<h2 id="all-borderlands-4-shift-codes">All Borderlands 4 SHiFT codes</h2>' f"<ul>{items}</ul>"
+    ).encode("utf-8")
+
+
+def ign_page(codes):
+    rows = "".join(f"<tr><td>{code_for('ign', i)}</td><td>Golden Key</td></tr>" for i in range(codes))
+    return f"<html><body><table>{rows}</table></body></html>".encode("utf-8")
+
+
+def xsmash_page(codes):
+    items = ",".join(
+        f'{{code: "{code_for("xsmash", i)}", expires: createDate(2030, 12, 31, 0, 0, 0, 0), title: "3 Gold Keys"}}'
+        for i in range(codes)
+    )
+    return f"<script>const GOLD_KEYS_DATA = [{items}];</script>".encode("utf-8")
+
+
+class Stages:
+    """Wall time and call count per stage, reset for each run."""
+
+    def __init__(self):
+        self.runs = []
+        self.current = None
+
+    def start_run(self):
+        self.current = defaultdict(lambda: [0, 0.0])
+        self.runs.append(self.current)
+
+    @contextmanager
+    def timing(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.current[stage]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with self.timing(stage):
+                return fn(*args, **kwargs)
+
+        return timed
+
+
+def instrument(stages, in_process):
+    """Time the scraper's stages by wrapping the names main() looks up."""
+    for stage, name in [
+        ("preflight", "preflight_lastmod"),
+        ("fetch mentalmars", "fetch_webpage"),
+        ("fetch supplemental", "submit_supplemental"),
+        ("collect supplemental", "collect_supplemental"),
+        ("generate output", "generateAutoshiftJSON"),
+        ("write shiftcodes.json", "write_shiftfile"),
+        ("write artifacts", "write_artifacts"),
+        ("publish", "publish_to_github"),
+    ]:
+        setattr(scraper, name, stages.wrap(stage, getattr(scraper, name)))
+    scraper.CodeHistory.record_run = stages.wrap("history", scraper.CodeHistory.record_run)
+    if in_process:
+        scraper.parse_mentalmars_page = stages.wrap("parse mentalmars", scraper.parse_mentalmars_page)
+        for source in scraper.SUPPLEMENTAL_SOURCES:
+            source["parser"] = stages.wrap("parse supplemental", source["parser"])
+
+
+def serve_sources(source, args, state):
+    """Point every source (and the mentalmars sitemap) at the stand-in."""
+    bl4 = scraper.webpages[0]
+    for i, webpage in enumerate(scraper.webpages):
+        page_path = source.path_for(webpage["sourceURL"])
+        if webpage is bl4:
+            source.pages[page_path] = lambda w=webpage: mentalmars_page(w, args.codes, state["new"])
+        else:
+            source.pages[page_path] = mentalmars_page(webpage, args.codes)
+        webpage["sourceURL"] = source.url_for(webpage["sourceURL"])
+    for supplemental, page in [
+        (scraper.POLYGON_BL4_SOURCE, polygon_page(args.codes)),
+        (scraper.IGN_BL4_SOURCE, ign_page(args.codes)),
+        (scraper.XSMASH_SOURCE, xsmash_page(args.codes)),
+    ]:
+        source.pages[source.path_for(supplemental["sourceURL"])] = page
+        supplemental["sourceURL"] = source.url_for(supplemental["sourceURL"])
+
+    def sitemap():
+        urls = "".join(
+            f"<url><loc>{w['sourceURL']}</loc><lastmod>2025-01-{1 + (state['run'] if w is bl4 else 0):02d}T00:00:00+00:00</lastmod></url>"
+            for w in scraper.webpages
+        )
+        return f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode("utf-8")
+
+    sitemap_url = source.url + "/sitemap.xml"
+    source.pages["/sitemap.xml"] = sitemap
+    scraper.SITEMAPS = {source.url.split("://", 1)[1]: sitemap_url}
+
+
+def delta(after, before):
+    return {label: after[label] - before[label] for label in after if after[label] != before[label]}
+
+
+def first_active_code(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for entry in data[0]["codes"]:
+        if not entry.get("expired"):
+            return entry["code"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--codes", type=int, default=20, help="codes per source table")
+    parser.add_argument("--new-codes", dest="new_codes", type=int, default=1, help="codes added to the BL4 page each run")
+    parser.add_argument("--parse-workers", dest="parse_workers", type=int, default=0)
+    parser.add_argument("--mark-expired", dest="mark_expired", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    _L.setLevel(DEBUG if args.verbose else WARNING)
+
+    stages = Stages()
+    instrument(stages, in_process=args.parse_workers == 0)
+    state = {"run": 0, "new": 0}
+    workdir = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    # the scraper writes data/ relative to the working directory
+    os.chdir(workdir.name)
+    try:
+        with SourceStandIn() as source, GitHubStandIn() as github:
+            serve_sources(source, args, state)
+            scraper_args = scraper.setup_argparser().parse_args(
+                [
+                    "--state-dir", os.path.join(workdir.name, "state"),
+                    "--parse-workers", str(args.parse_workers),
+                    "--user", USER, "--repo", REPO, "--token", TOKEN,
+                    "--github-api", github.url,
+                ]
+            )
+            # the repository starts empty; the first upload takes the create path
+            os.makedirs("data", exist_ok=True)
+            with open(scraper.SHIFTCODESJSONPATH, "w", encoding="utf-8") as f:
+                f.write("[]\n")
+            started = time.perf_counter()
+            mark_expired.upload_shiftfile(
+                scraper.SHIFTCODESJSONPATH, USER, REPO, TOKEN, "seed", api_url=github.url
+            )
+            print(f"setup: created shiftcodes.json in {(time.perf_counter() - started) * 1000:.1f} ms, GitHub {dict(github.calls)}")
+
+            walls = []
+            for run in range(1, args.runs + 1):
+                state["run"] = run
+                state["new"] = (run - 1) * args.new_codes
+                github_before, source_before = Counter(github.calls), Counter(source.calls)
+                stages.start_run()
+                started = time.perf_counter()
+                with stages.timing("main"):
+                    scraper.main(scraper_args)
+                if args.mark_expired:
+                    code = first_active_code(scraper.SHIFTCODESJSONPATH)
+                    if code:
+                        with stages.timing("mark expired"):
+                            mark_expired.mark_expired([code], filepath=scraper.SHIFTCODESJSONPATH)
+                        with stages.timing("upload (mark_expired)"):
+                            mark_expired.upload_shiftfile(
+                                scraper.SHIFTCODESJSONPATH, USER, REPO, TOKEN, f"expired {code}", api_url=github.url
+                            )
+                wall_ms = (time.perf_counter() - started) * 1000
+                walls.append(wall_ms)
+                pages = delta(source.calls, source_before)
+                print(
+                    f"run {run}: {wall_ms:7.1f} ms, {sum(pages.values())} source requests, "
+                    f"GitHub {delta(github.calls, github_before) or 'none'}"
+                )
+
+            print(f"\n{'stage':<24}{'calls/run':>10}{'mean ms':>10}{'max ms':>10}")
+            names = sorted({name for run in stages.runs for name in run}, key=lambda n: (n != "main", n))
+            for name in names:
+                per_run = [run[name] for run in stages.runs if name in run]
+                calls = sum(e[0] for e in per_run) / len(stages.runs)
+                times = [e[1] * 1000 for e in per_run] + [0.0] * (len(stages.runs) - len(per_run))
+                print(f"{name:<24}{calls:>10.1f}{sum(times) / len(times):>10.1f}{max(times):>10.1f}")
+            print(f"\nGitHub calls: {dict(github.calls)}; commits: {len(github.commits)}")
+            print(f"published shiftcodes.json: {len(github.files['shiftcodes.json'])} bytes")
+    finally:
+        os.chdir(cwd)
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Startup cost of the command line entry points.
+
+Runs each command under ``python -X importtime`` and reports wall time, total
+import time and the slowest top-level imports. Heavy third-party packages
+(requests, bs4, PyGithub, apscheduler) must not show up for modes that don't
+need them; --max-ms turns the report into a check.
+
+    python benchmarks/bench_startup.py [--repeat N] [--max-ms MS]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+HEAVY = ("requests", "bs4", "github", "apscheduler", "multiprocessing")
+
+COMMANDS = [
+    ("mark_expired.py --help", ["mark_expired.py", "--help"]),
+    ("autoshift_scraper.py --help", ["autoshift_scraper.py", "--help"]),
+    ("autoshift_scraper.py --dry-run-migrations", ["autoshift_scraper.py", "--dry-run-migrations"]),
+]
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name_field = fields[2]
+        # one leading space, then two more per level of nesting
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        modules[name_field.strip()] = (int(fields[0]), int(fields[1]), depth)
+    return modules
+
+
+def run(argv, cwd):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + [os.path.join(ROOT, argv[0])] + argv[1:],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return elapsed_ms, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if any median import time exceeds this")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as cwd:
+        os.makedirs(os.path.join(cwd, "data"))
+        for label, argv in COMMANDS:
+            walls, imports = [], []
+            for _ in range(args.repeat):
+                wall_ms, modules = run(argv, cwd)
+                walls.append(wall_ms)
+                imports.append(sum(m[0] for m in modules.values()) / 1000)
+            walls.sort()
+            imports.sort()
+            wall_ms, import_ms = walls[len(walls) // 2], imports[len(imports) // 2]
+            heavy = sorted({name.split(".")[0] for name in modules} & set(HEAVY))
+            top = sorted(
+                ((m[1], name) for name, m in modules.items() if m[2] == 0),
+                reverse=True,
+            )[:5]
+            print(f"{label}\n  wall {wall_ms:6.1f} ms, imports {import_ms:6.1f} ms (median of {args.repeat})")
+            print("  slowest top-level imports: " + ", ".join(f"{n} {us / 1000:.1f}ms" for us, n in top))
+            print("  heavy packages imported: " + (", ".join(heavy) if heavy else "none"))
+            if heavy or (args.max_ms is not None and import_ms > args.max_ms):
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
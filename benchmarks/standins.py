@@ -0,0 +1,217 @@
+"""Local stand-ins for the services a scraper run talks to.
+
+``GitHubStandIn`` implements the parts of the GitHub REST API that the
+publish paths use through PyGithub (get_repo, get_contents, update_file,
+create_file) against a repository held in memory, or in a directory when
+``root`` is given. Point ``--github-api`` (or ``Github(base_url=...)``) at
+its ``url``. Like GitHub, an update must name the blob SHA it replaces.
+
+``SourceStandIn`` serves source pages by path. ``url_for`` maps a real page
+URL onto it (https://mentalmars.com/a/ -> http://127.0.0.1:PORT/mentalmars.com/a/)
+so every source can share one server.
+
+Both count the requests they answer in ``calls`` and run in a background
+thread; use them as context managers.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+def blob_sha(content):
+    """The git blob SHA-1 of ``content``, as GitHub reports it for a file."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class _StandIn:
+    """A ThreadingHTTPServer on a free local port, counting requests by label."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                standin._dispatch(self, "GET")
+
+            def do_PUT(self):
+                standin._dispatch(self, "PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, label):
+        with self._lock:
+            self.calls[label] += 1
+
+    def _dispatch(self, request, method):
+        status, body, content_type = self.handle(method, request)
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def handle(self, method, request):
+        """Return (status, body bytes, content type) for a request."""
+        raise NotImplementedError
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _json(status, data):
+    return status, json.dumps(data).encode("utf-8"), "application/json"
+
+
+class GitHubStandIn(_StandIn):
+    """The GitHub contents API for the repositories ``owner/name``, on one branch."""
+
+    def __init__(self, files=None, root=None, branch="main", host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.root = root
+        self.branch = branch
+        self.files = {}
+        self.commits = []
+        if root and os.path.isdir(root):
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    filepath = os.path.join(directory, name)
+                    with open(filepath, "rb") as f:
+                        self.files[os.path.relpath(filepath, root).replace(os.sep, "/")] = f.read()
+        self.files.update(files or {})
+
+    def _store(self, file_path, content):
+        self.files[file_path] = content
+        if self.root:
+            filepath = os.path.join(self.root, *file_path.split("/"))
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            with open(filepath, "wb") as f:
+                f.write(content)
+
+    def _repo(self, full_name):
+        owner, name = full_name.split("/")
+        return {
+            "id": 1,
+            "name": name,
+            "full_name": full_name,
+            "owner": {"login": owner, "type": "User"},
+            "private": False,
+            "default_branch": self.branch,
+            "url": f"{self.url}/repos/{full_name}",
+        }
+
+    def _content(self, full_name, file_path):
+        content = self.files[file_path]
+        return {
+            "type": "file",
+            "encoding": "base64",
+            "name": file_path.rsplit("/", 1)[-1],
+            "path": file_path,
+            "size": len(content),
+            "sha": blob_sha(content),
+            "content": base64.b64encode(content).decode("ascii"),
+            "url": f"{self.url}/repos/{full_name}/contents/{file_path}",
+        }
+
+    def handle(self, method, request):
+        parts = urlsplit(request.path)
+        segments = [unquote(s) for s in parts.path.strip("/").split("/")]
+        if len(segments) < 3 or segments[0] != "repos":
+            return _json(404, {"message": "Not Found"})
+        full_name = "/".join(segments[1:3])
+        if len(segments) == 3 and method == "GET":
+            self.count("GET repo")
+            return _json(200, self._repo(full_name))
+        if len(segments) < 5 or segments[3] != "contents":
+            return _json(404, {"message": "Not Found"})
+        file_path = "/".join(segments[4:])
+        if method == "GET":
+            self.count("GET contents")
+            if file_path not in self.files:
+                return _json(404, {"message": "Not Found"})
+            return _json(200, self._content(full_name, file_path))
+
+        self.count("PUT contents")
+        length = int(request.headers.get("Content-Length") or 0)
+        data = json.loads(request.rfile.read(length) or b"{}")
+        if data.get("branch", self.branch) != self.branch:
+            return _json(404, {"message": "Branch not found"})
+        existing = self.files.get(file_path)
+        if existing is not None:
+            if not data.get("sha"):
+                return _json(422, {"message": "\"sha\" wasn't supplied."})
+            if data["sha"] != blob_sha(existing):
+                return _json(409, {"message": f"{file_path} does not match {data['sha']}"})
+        self._store(file_path, base64.b64decode(data.get("content") or ""))
+        commit_sha = hashlib.sha1(
+            f"{len(self.commits)}:{data.get('message')}:{blob_sha(self.files[file_path])}".encode("utf-8")
+        ).hexdigest()
+        self.commits.append({"sha": commit_sha, "message": data.get("message"), "path": file_path})
+        return _json(
+            201 if existing is None else 200,
+            {
+                "content": self._content(full_name, file_path),
+                "commit": {
+                    "sha": commit_sha,
+                    "message": data.get("message"),
+                    "url": f"{self.url}/repos/{full_name}/git/commits/{commit_sha}",
+                },
+            },
+        )
+
+
+class SourceStandIn(_StandIn):
+    """Serves ``pages`` ({path: bytes, or a callable returning bytes}) by path."""
+
+    def __init__(self, pages=None, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.pages = dict(pages or {})
+
+    def url_for(self, url):
+        """Where this server serves the page that lives at ``url``."""
+        parts = urlsplit(url)
+        return f"{self.url}/{parts.netloc}{parts.path}"
+
+    def path_for(self, url):
+        return urlsplit(self.url_for(url)).path
+
+    def handle(self, method, request):
+        page_path = urlsplit(request.path).path
+        page = self.pages.get(page_path)
+        self.count(page_path)
+        if page is None or method != "GET":
+            return 404, b"Not Found", "text/plain"
+        body = page() if callable(page) else page
+        if page_path.endswith(".xml"):
+            return 200, body, "application/xml"
+        return 200, body, "text/html; charset=utf-8"
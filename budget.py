@@ -0,0 +1,156 @@
+"""Run deadline and per-source circuit breakers.
+
+A run gets an overall deadline and each source a time budget within it, so
+one hung or slow site can't hold up the others (or, in scheduler mode, every
+later run). Sources that keep failing are skipped for a back-off period by a
+circuit breaker whose state is kept under data/ between runs; whatever the
+healthy sources returned is still published.
+"""
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from os import makedirs, path
+
+from common import _L, DIRNAME
+from shiftfile import atomic_write
+
+BREAKERSPATH = path.join(DIRNAME, "data", "breakers.json")
+
+DEFAULT_RUN_DEADLINE = 600.0  # seconds for a whole run
+DEFAULT_SOURCE_BUDGET = 120.0  # seconds for one source's fetch (waits and retries included)
+
+FAILURE_THRESHOLD = 3  # consecutive failures before a breaker opens
+BACKOFF = timedelta(hours=1)  # first open period, doubled each time it re-opens
+MAX_BACKOFF = timedelta(hours=24)
+
+
+class RunDeadline:
+    """Wall-clock budget for a single run."""
+
+    def __init__(self, seconds=DEFAULT_RUN_DEADLINE, clock=time.monotonic):
+        self._clock = clock
+        self.seconds = seconds
+        self.ends = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self.ends - self._clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def budget(self, source_budget=DEFAULT_SOURCE_BUDGET):
+        """Seconds a source may use: its own budget, capped by what's left of the run."""
+        return min(source_budget, self.remaining())
+
+
+class CircuitBreakers:
+    """Per-source circuit breakers, persisted as JSON between runs.
+
+    A breaker opens after FAILURE_THRESHOLD consecutive failures and stays
+    open for BACKOFF (doubling each time it trips again, up to MAX_BACKOFF).
+    Once that has passed the source is tried again ("half-open"): a success
+    closes the breaker, another failure re-opens it straight away.
+    """
+
+    def __init__(self, filepath=BREAKERSPATH, now=None):
+        self.filepath = filepath
+        self._now = now or (lambda: datetime.now(timezone.utc))
+        self._state = {}
+        # skips during this run, by source and reason
+        self.skips = {}
+        if filepath and path.exists(filepath):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                _L.warning("Ignoring unreadable breaker state %s: %s", filepath, e)
+
+    def _entry(self, source):
+        return self._state.setdefault(
+            source,
+            {"failures": 0, "trips": 0, "open_until": None, "last_error": None, "total_skips": 0},
+        )
+
+    def _open_until(self, source):
+        until = self._state.get(source, {}).get("open_until")
+        return datetime.fromisoformat(until) if until else None
+
+    def state(self, source):
+        until = self._open_until(source)
+        if until is None:
+            return "closed"
+        return "open" if self._now() < until else "half-open"
+
+    def allow(self, source):
+        """True if ``source`` may be fetched this run; counts a skip if not."""
+        if self.state(source) != "open":
+            return True
+        _L.warning(
+            "Skipping %s: circuit breaker open until %s after %d failures",
+            source,
+            self._state[source]["open_until"],
+            self._state[source]["failures"],
+        )
+        self.skip(source, "breaker")
+        return False
+
+    def skip(self, source, reason):
+        per_source = self.skips.setdefault(source, {})
+        per_source[reason] = per_source.get(reason, 0) + 1
+        self._entry(source)["total_skips"] += 1
+
+    def record_success(self, source):
+        entry = self._entry(source)
+        if entry["open_until"]:
+            _L.info("%s recovered; closing its circuit breaker", source)
+        entry.update(failures=0, trips=0, open_until=None, last_error=None)
+
+    def record_failure(self, source, error=None):
+        entry = self._entry(source)
+        entry["failures"] += 1
+        entry["last_error"] = str(error) if error else None
+        # a half-open breaker re-opens on the first failure
+        if entry["failures"] >= FAILURE_THRESHOLD or entry["open_until"]:
+            backoff = min(BACKOFF * (2 ** entry["trips"]), MAX_BACKOFF)
+            entry["trips"] += 1
+            entry["open_until"] = (self._now() + backoff).isoformat()
+            _L.warning(
+                "Circuit breaker for %s opened for %s after %d consecutive failures",
+                source,
+                backoff,
+                entry["failures"],
+            )
+
+    def report(self):
+        """Return {source: {...}} with each breaker's state and this run's skips."""
+        sources = sorted(set(self._state) | set(self.skips))
+        return {
+            source: {
+                "state": self.state(source),
+                "failures": self._state.get(source, {}).get("failures", 0),
+                "open_until": self._state.get(source, {}).get("open_until"),
+                "skipped": dict(self.skips.get(source, {})),
+                "total_skips": self._state.get(source, {}).get("total_skips", 0),
+            }
+            for source in sources
+        }
+
+    def log_report(self):
+        for source, info in self.report().items():
+            skipped = ", ".join(f"{n} by {reason}" for reason, n in info["skipped"].items())
+            _L.info(
+                "Source %s: breaker %s, %d consecutive failures%s",
+                source,
+                info["state"],
+                info["failures"],
+                f", skipped ({skipped})" if skipped else "",
+            )
+
+    def save(self):
+        if not self.filepath:
+            return
+        makedirs(path.dirname(self.filepath), exist_ok=True)
+        atomic_write(
+            self.filepath,
+            json.dumps(self._state, indent=2, sort_keys=True).encode("utf-8"),
+        )
@@ -0,0 +1,127 @@
+"""Candidate collection for the supplemental (non-mentalmars) parsers.
+
+Each parser reports the codes it found to a shared ``CandidateCollector``.
+Candidates are keyed by normalised code so duplicates are detected in O(1),
+and a code reported by several sources is merged into a single row rather
+than thrown away: a real reward or a concrete expiry date from any source
+wins over "Unknown". A code that is already in the output (from the
+mentalmars tables) isn't added again, but what the sources know about it is
+kept and filled into those rows with ``merge_existing``. The collector also
+records which sources reported each code and keeps the per-source duplicate
+counters the parsers have always logged.
+"""
+from extraction import normalize_code
+
+UNKNOWN_VALUES = frozenset(["", "unknown"])
+
+
+def _is_unknown(value):
+    return value is None or str(value).strip().lower() in UNKNOWN_VALUES
+
+
+def merge_rows(current, incoming):
+    """Merge ``incoming`` into ``current`` in place, preferring known values."""
+    for field in ("reward", "expires"):
+        if _is_unknown(current.get(field)) and not _is_unknown(incoming.get(field)):
+            current[field] = incoming[field]
+    # any source showing the code as expired (e.g. struck through) wins
+    if incoming.get("expired"):
+        current["expired"] = True
+    return current
+
+
+class CandidateCollector:
+    """Deduplicate and merge code rows reported by one or more sources."""
+
+    def __init__(self, existing_codes=None):
+        # codes already present in the output (e.g. from the mentalmars tables)
+        self.existing = set(existing_codes or ())
+        self._rows = {}
+        # what the sources said about codes in ``existing``, for merge_existing
+        self._existing_rows = {}
+        self._sources = {}
+        self._metrics = {}
+
+    def _stats(self, source):
+        return self._metrics.setdefault(
+            source,
+            {
+                "parsed": 0,
+                "new": 0,
+                "duplicates_existing": 0,
+                "duplicates_inpage": 0,
+                "merged": 0,
+            },
+        )
+
+    def add(self, row, source):
+        """Add a parsed row; return True if the code was new to the collector."""
+        stats = self._stats(source)
+        code = normalize_code(row.get("code"))
+        if not code:
+            return False
+        stats["parsed"] += 1
+
+        sources = self._sources.setdefault(code, [])
+        seen_here = source in sources
+        if not seen_here:
+            sources.append(source)
+
+        if code in self.existing:
+            stats["duplicates_existing"] += 1
+            merge_rows(self._existing_rows.setdefault(code, {"code": code}), row)
+            return False
+
+        current = self._rows.get(code)
+        if current is None:
+            new_row = dict(row)
+            new_row["code"] = code
+            self._rows[code] = new_row
+            stats["new"] += 1
+            return True
+
+        if seen_here:
+            stats["duplicates_inpage"] += 1
+        else:
+            stats["merged"] += 1
+        merge_rows(current, row)
+        return False
+
+    def merge_existing(self, rows):
+        """Fill unknown fields of output ``rows`` in place from the sources; returns how many changed."""
+        changed = 0
+        for row in rows:
+            update = self._existing_rows.get(normalize_code(row.get("code")))
+            if update is None:
+                continue
+            before = (row.get("reward"), row.get("expires"), row.get("expired"))
+            merge_rows(row, update)
+            if (row.get("reward"), row.get("expires"), row.get("expired")) != before:
+                changed += 1
+        return changed
+
+    def get(self, code):
+        return self._rows.get(code)
+
+    def rows(self, source=None):
+        """Return the collected rows, optionally only those first reported by ``source``."""
+        if source is None:
+            return list(self._rows.values())
+        return [
+            row for code, row in self._rows.items() if self._sources[code][0] == source
+        ]
+
+    def sources(self, code):
+        """Return the sources that reported ``code``, in the order they reported it."""
+        return list(self._sources.get(code, ()))
+
+    def source_map(self):
+        """Return {code: [sources]} for every code any source reported."""
+        return {code: list(sources) for code, sources in self._sources.items()}
+
+    def stats(self, source):
+        return dict(self._stats(source))
+
+    def multi_source_count(self):
+        """Number of codes reported by more than one source."""
+        return sum(1 for sources in self._sources.values() if len(sources) > 1)
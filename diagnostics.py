@@ -0,0 +1,90 @@
+"""Buffered, deduplicated log of rows the scraper couldn't use.
+
+Problem rows (a code without a reward, a candidate whose code isn't valid,
+a page that failed to parse) are recorded with ``DiagnosticsSink.record``
+and kept in memory. ``flush`` is called once at the end of a run and appends
+them to data/debug_problem_rows.json, one JSON object per line. A row is
+identified by its source and a hash of its contents, so the same bad row is
+written once, not once for every time the output is generated in each run.
+When the file grows past MAX_BYTES it is rotated to ``.1``, replacing the
+previous rotation.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from os import makedirs, path
+
+from common import _L, DIRNAME
+
+DIAGNOSTICSPATH = path.join(DIRNAME, "data", "debug_problem_rows.json")
+MAX_BYTES = 1024 * 1024
+
+
+def row_hash(row):
+    """Short, stable hash of a row's contents."""
+    text = json.dumps(row, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class DiagnosticsSink:
+    """Collects problem rows during a run and writes the new ones once."""
+
+    def __init__(self, filepath=DIAGNOSTICSPATH, max_bytes=MAX_BYTES):
+        self.filepath = filepath
+        self.max_bytes = max_bytes
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, source, row, reason, **context):
+        """Buffer a problem ``row`` from ``source``; returns False if already buffered."""
+        key = (source, row_hash(row))
+        if key in self._pending:
+            return False
+        entry = {"source": source, "hash": key[1], "reason": reason}
+        entry.update(context)
+        entry["row"] = row
+        self._pending[key] = entry
+        return True
+
+    def _written(self):
+        """(source, hash) of every entry already in the file or its rotation."""
+        keys = set()
+        for filepath in (self.filepath + ".1", self.filepath):
+            if not path.exists(filepath):
+                continue
+            with open(filepath, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        keys.add((entry["source"], entry["hash"]))
+                    except (ValueError, KeyError, TypeError):
+                        # lines from before entries were hashed
+                        continue
+        return keys
+
+    def flush(self):
+        """Append the buffered rows not written in an earlier run; returns how many."""
+        if not self._pending:
+            return 0
+        try:
+            written = self._written()
+            new = [e for key, e in self._pending.items() if key not in written]
+            self._pending = {}
+            if not new:
+                return 0
+            makedirs(path.dirname(self.filepath), exist_ok=True)
+            if path.exists(self.filepath) and path.getsize(self.filepath) >= self.max_bytes:
+                os.replace(self.filepath, self.filepath + ".1")
+            seen = datetime.now(timezone.utc).isoformat()
+            with open(self.filepath, "a", encoding="utf-8") as f:
+                for entry in new:
+                    entry["seen"] = seen
+                    f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            _L.error("Failed to write %s: %s", self.filepath, e)
+            return 0
+        _L.warning("Wrote %d new problem rows to %s", len(new), self.filepath)
+        return len(new)
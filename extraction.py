@@ -0,0 +1,217 @@
+"""Shared SHiFT-code extraction used by every parser.
+
+All parsers look for the same thing: a 5x5 code somewhere in a page, plus the
+reward, expiry and strikethrough state of the row or list item it sits in.
+Rather than calling ``get_text`` on every ``li``/``tr`` and running a regex
+per element, ``scan_codes`` walks the document's text nodes once, runs the
+precompiled code pattern over them and only resolves the enclosing container
+(and its text) for nodes that actually contain a code.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# A 5x5 code anywhere in a string (e.g. inside "ABCDE-... (1 Golden Key)")
+CODE_RE = re.compile(r"([A-Za-z0-9]{5}(?:-[A-Za-z0-9]{5}){4})")
+# The same shape, anchored, for validating an already normalised code
+CODE_FULL_RE = re.compile(r"^[A-Z0-9]{5}(?:-[A-Z0-9]{5}){4}$")
+# Something shaped like a code that isn't a valid one (wrong group sizes or
+# count); upper case only, so ordinary hyphenated words don't match
+MALFORMED_RE = re.compile(r"\b[A-Z0-9]{3,7}(?:-[A-Z0-9]{3,7}){3,5}\b")
+# Text nodes worth looking at when rejects are collected
+_CANDIDATE_RE = re.compile(CODE_RE.pattern + "|" + MALFORMED_RE.pattern)
+# Rewards are usually given in parentheses after the code
+REWARD_RE = re.compile(r"\(([^)]+)\)")
+# "Expires: Sept. 30", "expires on October 2, 2025", "Expiry: 2025-10-02"
+EXPIRES_RE = re.compile(
+    r"\bexpir(?:es|y|ation)\b(?:\s+date)?\s*:?\s*(?:on\s+)?"
+    r"(?P<expires>\d{4}-\d{2}-\d{2}|[A-Za-z]{3,9}\.?\s+\d{1,2}(?:,?\s+\d{4})?)",
+    re.IGNORECASE,
+)
+
+# Tags used by the source sites to strike out expired codes
+STRIKE_TAGS = ["s", "del", "strike"]
+# Text inside these tags is never rendered, so codes in them are ignored
+NON_TEXT_PARENTS = frozenset(["script", "style", "template", "noscript"])
+
+
+def normalize_code(raw_code):
+    """Return the upper-cased code if it is a valid 5x5 SHiFT code, else None."""
+    if not raw_code:
+        return None
+    code = str(raw_code).strip().upper()
+    if not CODE_FULL_RE.fullmatch(code):
+        return None
+    return code
+
+
+class CodeMatch(
+    namedtuple("CodeMatch", ["code", "reward", "expires", "expired", "container"])
+):
+    """A code found in a document together with the details of its container."""
+
+    __slots__ = ()
+
+    def as_row(self):
+        """Return the row dict shape shared by all the parsers."""
+        return {
+            "code": self.code,
+            "reward": self.reward,
+            "expires": self.expires,
+            "expired": self.expired,
+        }
+
+
+def describe_container(container):
+    """Pull (reward, expires, expired) out of a row or list item."""
+    text = container.get_text(" ", strip=True)
+    reward_match = REWARD_RE.search(text)
+    reward = reward_match.group(1).strip() if reward_match else "Unknown"
+    expires_match = EXPIRES_RE.search(text)
+    expires = expires_match.group("expires") if expires_match else "Unknown"
+    expired = (
+        container.find(STRIKE_TAGS) is not None or "expired" in text.lower()
+    )
+    return reward, expires, expired
+
+
+@lru_cache(maxsize=256)
+def canonical_field(heading):
+    """Map a table heading to code/reward/expires/expired, or keep it as is.
+
+    This is intentionally fuzzy: many pages prefix the heading with the game
+    name (e.g. 'Borderlands 4 SHiFT Code') or use slightly different wording
+    like 'Expire Date', so the checks are case-insensitive substring checks.
+    """
+    k = heading.strip().lower()
+    # handle "expired" specifically before the more generic "expire" check
+    if "expired" in k:
+        return "expired"
+    if "shift code" in k or ("shift" in k and "code" in k):
+        return "code"
+    if "expire" in k:
+        return "expires"
+    if "reward" in k:
+        return "reward"
+    # preserve the original heading if it doesn't match any known canonical
+    # field; downstream code will either handle it or ignore it
+    return heading
+
+
+def _span(cell):
+    try:
+        return max(1, int(cell.get("colspan", 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+@lru_cache(maxsize=256)
+def compile_header(signature):
+    """The field for each column of a table whose headings are ``signature``.
+
+    ``signature`` is a tuple of (heading text, colspan) pairs; a heading
+    spanning several columns names each of them. Memoized per process: the
+    tables parsed by one process share a mapping for the same headings. Parse
+    workers are new processes each run, so across runs only in-process
+    parsing (``--parse-workers 0``) keeps the cache.
+    """
+    fields = []
+    for heading, span in signature:
+        fields.extend([canonical_field(heading)] * span)
+    return tuple(fields)
+
+
+def finish_row(record, struck=False):
+    """Normalise a row keyed by canonical field: clean ``expires``, make ``expired`` a bool."""
+    expires = record.get("expires")
+    record["expires"] = (
+        expires.replace("Expires: ", "") if expires is not None else "Unknown"
+    )
+    expired = record.get("expired")
+    # treat any value that is not exactly False, "false", "no", "0", or "" (case-insensitive) as True
+    record["expired"] = struck or (
+        expired is not None
+        and str(expired).strip().lower() not in ["false", "no", "0", ""]
+    )
+    return record
+
+
+def extract_table_rows(table):
+    """Return the finished rows of an HTML ``table``, keyed by canonical field.
+
+    Cells are assigned to columns by position, ``colspan`` included; a cell
+    spanning several columns fills the first. A row holding a strikethrough
+    tag (s, del, strike) anywhere is expired.
+    """
+    thead = table.find("thead")
+    headings = (thead or table).find_all("th")
+    fields = compile_header(tuple((th.get_text(), _span(th)) for th in headings))
+    width = len(fields)
+    body = table.find("tbody") or table
+    rows = []
+    for tr in body.find_all("tr"):
+        cells = tr.find_all(("td", "th"), recursive=False)
+        if tr.parent is thead or all(cell.name == "th" for cell in cells):
+            # a heading row (or an empty one)
+            continue
+        record = {}
+        column = 0
+        for cell in cells:
+            if column >= width:
+                break
+            field = fields[column]
+            if field not in record:
+                record[field] = cell.get_text()
+            column += _span(cell)
+        rows.append(finish_row(record, tr.find(STRIKE_TAGS) is not None))
+    return rows
+
+
+def scan_codes(root, containers=("li", "tr"), rejects=None):
+    """Return a CodeMatch for every 5x5 code under ``root`` in document order.
+
+    Each text node is matched exactly once; a code is attributed to its
+    nearest enclosing tag named in ``containers`` and codes outside any
+    container are ignored. Container details are computed once per container,
+    however many codes it holds. If ``rejects`` is a list, a problem row is
+    appended to it for each ignored code and each malformed one.
+    """
+    from bs4.element import Comment
+
+    containers = list(containers)
+    details = {}
+    matches = []
+    for node in root.find_all(string=CODE_RE if rejects is None else _CANDIDATE_RE):
+        if isinstance(node, Comment):
+            continue
+        if node.parent is not None and node.parent.name in NON_TEXT_PARENTS:
+            continue
+        valid = list(CODE_RE.finditer(node))
+        container = node.find_parent(containers)
+        if container is None:
+            if rejects is not None:
+                for m in valid:
+                    rejects.append(_reject(m.group(1), "code outside a row or list item", node))
+            continue
+        if rejects is not None:
+            spans = [m.span() for m in valid]
+            for m in MALFORMED_RE.finditer(node):
+                if not any(m.start() < end and start < m.end() for start, end in spans):
+                    rejects.append(_reject(m.group(0), "malformed code", container))
+        if not valid:
+            continue
+        key = id(container)
+        if key not in details:
+            details[key] = describe_container(container)
+        reward, expires, expired = details[key]
+        for m in valid:
+            matches.append(
+                CodeMatch(m.group(1).upper(), reward, expires, expired, container)
+            )
+    return matches
+
+
+def _reject(code, problem, element):
+    """A problem row for a code a parser couldn't use, with the text around it."""
+    text = element.get_text(" ", strip=True) if hasattr(element, "get_text") else str(element)
+    return {"code": code, "problem": problem, "text": " ".join(text.split())[:200]}
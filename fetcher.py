@@ -0,0 +1,92 @@
+"""HTTP GET shared by every scraper.
+
+All page fetches go through ``fetch`` so they share one per-host rate limiter
+and the same handling of 429/503 responses: the ``Retry-After`` they carry
+(or an exponential back-off when there is none) blocks the host in the
+limiter and the request is retried once the host is free again. A ``budget``
+bounds the whole fetch (rate-limit waits, retries and request timeouts) so a
+slow source can't eat into the rest of the run.
+"""
+import time
+
+from common import _L
+from ratelimit import ROBOTS_TIMEOUT, HostRateLimiter, retry_after_seconds
+
+USER_AGENT = "autoshift-scraper/1.0"
+DEFAULT_TIMEOUT = 15
+MAX_RETRIES = 2
+RETRY_STATUSES = (429, 503)
+# back-off used when a 429/503 carries no Retry-After
+BACKOFF = 10.0
+
+# Until main() installs a configured limiter only Retry-After is honoured
+_rate_limiter = HostRateLimiter(interval=0, jitter=0)
+
+
+def set_rate_limiter(limiter):
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+def get_rate_limiter():
+    return _rate_limiter
+
+
+class BudgetExceeded(TimeoutError):
+    """Raised when a fetch runs out of its time budget."""
+
+    def __init__(self, url, budget):
+        super().__init__(f"{url} did not complete within its {budget:.0f}s budget")
+        self.url = url
+        self.budget = budget
+
+
+def fetch_robots(url, timeout=ROBOTS_TIMEOUT):
+    """Return the text of a robots.txt, or None if there isn't a usable one."""
+    import requests
+
+    r = requests.get(url, timeout=timeout, headers={"User-Agent": USER_AGENT})
+    if getattr(r, "status_code", 200) != 200:
+        return None
+    return r.text
+
+
+def fetch(url, timeout=DEFAULT_TIMEOUT, headers=None, retries=MAX_RETRIES, budget=None):
+    """GET ``url`` politely; returns the final response (which may still be an error).
+
+    With ``budget`` (seconds) the fetch raises BudgetExceeded, or HostBlocked
+    from the limiter, rather than run past it.
+    """
+    import requests
+
+    headers = headers or {"User-Agent": USER_AGENT}
+    ends = None if budget is None else time.monotonic() + budget
+    attempt = 0
+    while True:
+        request_timeout = timeout
+        if ends is not None:
+            remaining = ends - time.monotonic()
+            if remaining <= 0:
+                raise BudgetExceeded(url, budget)
+            _rate_limiter.wait(url, max_wait=remaining)
+            request_timeout = min(timeout, max(ends - time.monotonic(), 0.1))
+        else:
+            _rate_limiter.wait(url)
+        r = requests.get(url, timeout=request_timeout, headers=headers)
+        status = getattr(r, "status_code", None)
+        if status not in RETRY_STATUSES or attempt >= retries:
+            return r
+        attempt += 1
+        delay = retry_after_seconds((getattr(r, "headers", None) or {}).get("Retry-After"))
+        if delay is None:
+            delay = BACKOFF * 2 ** (attempt - 1)
+        _L.warning(
+            "%s returned HTTP %d; retrying in %.0fs (attempt %d of %d)",
+            url,
+            status,
+            delay,
+            attempt,
+            retries,
+        )
+        # the next wait() sleeps until then, or raises HostBlocked if that is too long
+        _rate_limiter.defer(url, delay)
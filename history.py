@@ -0,0 +1,274 @@
+"""Append-only history of every code the scraper has seen.
+
+shiftcodes.json only holds the codes scraped in the current run, so a code
+that drops off a source page loses its history, and telling whether a code
+is new means reading the whole previous file. Each run instead appends
+events to data/history/events.jsonl:
+
+* ``run`` - a run finished; every code in it was seen at this time;
+* ``first_seen`` - a (code, game) was scraped for the first time;
+* ``gone`` - a code in the previous run is missing from this one;
+* ``returned`` - a code that was gone is back;
+* ``expired`` - it was marked expired for the first time;
+* ``source`` - a source that hadn't reported it before now does.
+
+Only changes are logged, so a run in which nothing changed adds one line.
+A code's last_seen is the latest run while it is present, and the last run
+before it went missing once it is gone.
+
+Once the log grows past COMPACT_EVENTS lines it is folded into
+data/history/snapshot.json and started afresh. Loading reads the snapshot
+and replays the (short) log into a compact in-memory index, so the cost of
+"seen before?" does not grow with the age of the history. Replaying is
+idempotent, so a crash between writing the snapshot and truncating the log
+loses nothing.
+"""
+import json
+import os
+from os import makedirs, path
+
+from common import _L, DIRNAME
+from shiftfile import atomic_write, canonical_timestamp
+
+HISTORYDIR = path.join(DIRNAME, "data", "history")
+EVENTS_NAME = "events.jsonl"
+SNAPSHOT_NAME = "snapshot.json"
+SNAPSHOT_VERSION = 2
+
+# fold the log into the snapshot once it holds this many events
+COMPACT_EVENTS = 50000
+
+# index slots: [first_seen, last_seen (once gone), expired, sources, present]
+_FIRST, _LAST, _EXPIRED, _SOURCES, _PRESENT = range(5)
+
+
+def _event(kind, time, code, game, **extra):
+    event = {"event": kind, "time": time, "code": code, "game": game}
+    event.update(extra)
+    return event
+
+
+class CodeHistory:
+    """In-memory index of the history log: (code, game) -> first/last seen, expired, sources."""
+
+    def __init__(self, directory=HISTORYDIR):
+        self.directory = directory
+        self.events_path = path.join(directory, EVENTS_NAME)
+        self.snapshot_path = path.join(directory, SNAPSHOT_NAME)
+        self._seen = {}
+        # time of the latest run, the last_seen of every code still present
+        self.last_run = None
+        self.pending_events = 0
+        self._load()
+
+    def _load(self):
+        if path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                self.last_run = snapshot.get("last_run")
+                for row in snapshot["codes"]:
+                    code, game, first, last, expired, sources = row[:6]
+                    # version 1 snapshots don't say; a present code is then
+                    # logged as returned on the next run
+                    present = row[6] if len(row) > 6 else False
+                    self._seen[(code, game)] = [first, last, expired, tuple(sources), present]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                _L.error(
+                    "Ignoring unreadable history snapshot %s: %s", self.snapshot_path, e
+                )
+                self._seen = {}
+        if not path.exists(self.events_path):
+            return
+        with open(self.events_path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self.apply(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    # most likely a line cut short by a crash mid-append
+                    _L.warning("Skipping bad history event at line %d: %s", number, e)
+                    continue
+                self.pending_events += 1
+
+    def apply(self, event):
+        """Update the index with one event."""
+        kind = event["event"]
+        if kind == "run":
+            self.last_run = event["time"]
+            return
+        key = (event["code"], event["game"])
+        state = self._seen.get(key)
+        if kind == "first_seen":
+            if state is None:
+                self._seen[key] = [event["time"], event["time"], False, (), True]
+        elif state is None:
+            raise KeyError(f"{kind} event for unknown code {key}")
+        elif kind == "gone":
+            state[_LAST] = event["last_seen"]
+            state[_PRESENT] = False
+        elif kind == "returned":
+            state[_PRESENT] = True
+        elif kind == "last_seen":
+            # logs written before only changes were recorded
+            state[_LAST] = event["time"]
+        elif kind == "expired":
+            state[_EXPIRED] = True
+        elif kind == "source":
+            if event["source"] not in state[_SOURCES]:
+                state[_SOURCES] = state[_SOURCES] + (event["source"],)
+        else:
+            raise KeyError(f"unknown history event {kind!r}")
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __contains__(self, key):
+        return key in self._seen
+
+    def seen(self, code, game):
+        return (code, game) in self._seen
+
+    def archived(self, code, game):
+        """When the code was first seen, or None if never."""
+        state = self._seen.get((code, game))
+        return state[_FIRST] if state else None
+
+    def last_seen(self, code, game):
+        state = self._seen.get((code, game))
+        if not state:
+            return None
+        if state[_PRESENT] and self.last_run is not None:
+            return self.last_run
+        return state[_LAST]
+
+    def expired(self, code, game):
+        state = self._seen.get((code, game))
+        return state[_EXPIRED] if state else False
+
+    def sources(self, code, game):
+        state = self._seen.get((code, game))
+        return state[_SOURCES] if state else ()
+
+    def _append(self, events):
+        if not events:
+            return
+        makedirs(self.directory, exist_ok=True)
+        lines = "".join(json.dumps(event, default=str) + "\n" for event in events)
+        # one append per run; a torn last line is skipped on the next load
+        with open(self.events_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        for event in events:
+            self.apply(event)
+        self.pending_events += len(events)
+
+    def seed(self, previous_codes):
+        """Start the history from a previous output's PreviousCodeIndex."""
+        events = []
+        for code, game, archived, expired in previous_codes.items():
+            if (code, game) in self._seen:
+                continue
+            events.append(_event("first_seen", archived, code, game))
+            if expired:
+                events.append(_event("expired", archived, code, game))
+        self._append(events)
+        _L.info("History: seeded %d codes from the previous output", len(self._seen))
+
+    def record_run(self, entries, when, sources=None):
+        """Append this run's events for the output ``entries``.
+
+        ``sources`` maps a code to the names of the sources that reported it.
+        """
+        when = canonical_timestamp(when)
+        sources = sources or {}
+        events = [{"event": "run", "time": when}]
+        done = set()
+        for entry in entries:
+            code, game = entry.get("code"), entry.get("game")
+            key = (code, game)
+            if key in done:
+                # pc codes (and repeated tables) list a code more than once
+                continue
+            done.add(key)
+            state = self._seen.get(key)
+            if state is None:
+                # first seen when it was archived, which for a new code is this
+                # run; kept as the text the output file holds
+                archived = entry.get("archived")
+                if archived is not None and not isinstance(archived, str):
+                    archived = str(archived)
+                events.append(_event("first_seen", archived, code, game))
+                known_sources = ()
+                already_expired = False
+            else:
+                known_sources = state[_SOURCES]
+                already_expired = state[_EXPIRED]
+                if not state[_PRESENT]:
+                    events.append(_event("returned", when, code, game))
+            if entry.get("expired") and not already_expired:
+                events.append(_event("expired", when, code, game))
+            for source in sources.get(code) or [entry.get("link")]:
+                if source and source not in known_sources:
+                    events.append(_event("source", when, code, game, source=source))
+        for (code, game), state in self._seen.items():
+            if state[_PRESENT] and (code, game) not in done:
+                events.append(
+                    _event("gone", when, code, game, last_seen=self.last_seen(code, game))
+                )
+        self._append(events)
+        _L.info("History: recorded %d events for %d codes", len(events), len(done))
+        return events
+
+    def compact(self):
+        """Fold the log into the snapshot and start a new, empty log."""
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "last_run": self.last_run,
+            "codes": [
+                [code, game, first, last, expired, list(sources), present]
+                for (code, game), (first, last, expired, sources, present) in self._seen.items()
+            ],
+        }
+        makedirs(self.directory, exist_ok=True)
+        atomic_write(
+            self.snapshot_path,
+            json.dumps(snapshot, separators=(",", ":"), default=str).encode("utf-8"),
+        )
+        # the snapshot already holds everything in the log, so replaying a log
+        # that survived a crash here would change nothing
+        atomic_write(self.events_path, b"")
+        _L.info(
+            "History: compacted %d events into a snapshot of %d codes",
+            self.pending_events,
+            len(self._seen),
+        )
+        self.pending_events = 0
+
+    def maybe_compact(self, threshold=COMPACT_EVENTS):
+        if self.pending_events >= threshold:
+            self.compact()
+
+
+class SeenIndex:
+    """"Seen before?" lookups for generateCodeRecords, backed by the history.
+
+    The previous output is still consulted so edits made to it between runs
+    (e.g. codes marked expired with mark_expired.py) are kept.
+    """
+
+    __slots__ = ("history", "previous")
+
+    def __init__(self, history, previous):
+        self.history = history
+        self.previous = previous
+
+    def archived(self, code, game):
+        archived = self.history.archived(code, game)
+        return archived if archived is not None else self.previous.archived(code, game)
+
+    def expired(self, code, game):
+        return self.history.expired(code, game) or self.previous.expired(code, game)
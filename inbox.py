@@ -0,0 +1,154 @@
+"""Queue of expiry reports for shiftcodes.json, applied in batches.
+
+``mark_expired.py --queue CODE...`` drops a small request file into an
+``inbox/`` directory next to shiftcodes.json instead of rewriting the file.
+Each request is its own file, so reports never overwrite each other. A drain,
+done by ``mark_expired.py --drain`` or by the scraper just before it writes
+its output, applies everything pending in one load/write cycle (so one
+publish). It holds a lock on shiftcodes.json while doing so, and every
+writer takes the same lock, so a drain and a scraper run can't interleave
+their writes. Codes a drain can't find (e.g. reported before the scraper has
+seen them) stay queued for the next one.
+
+The scraper reads shiftcodes.json when it starts but writes it at the end of
+the run, so before writing it also takes over any expiries that were written
+straight to the file in between (``expired_since``).
+"""
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from os import makedirs, path
+
+from common import _L
+from shiftfile import ShiftFileError, ShiftFileReader, atomic_write
+
+INBOX_NAME = "inbox"
+LOCK_TIMEOUT = 300  # seconds to wait for another writer
+
+
+def inbox_dir(filepath):
+    return path.join(path.dirname(path.abspath(filepath)), INBOX_NAME)
+
+
+@contextmanager
+def file_lock(filepath, timeout=LOCK_TIMEOUT):
+    """Hold an exclusive lock on ``filepath`` (via ``filepath``.lock) for the block."""
+    lock_path = filepath + ".lock"
+    makedirs(path.dirname(path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        try:
+            import fcntl
+
+            def try_lock():
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            def unlock():
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+        except ModuleNotFoundError:
+            import msvcrt
+
+            def try_lock():
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+            def unlock():
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+        ends = time.monotonic() + timeout
+        while True:
+            try:
+                try_lock()
+                break
+            except OSError:
+                if time.monotonic() >= ends:
+                    raise TimeoutError(f"{filepath} is locked by another writer")
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            unlock()
+
+
+def enqueue(codes, expires=None, filepath=None):
+    """Queue an expiry request for ``codes`` against ``filepath``; returns the request's path."""
+    now = datetime.now(timezone.utc)
+    request = {
+        "codes": [code.strip().upper() for code in codes],
+        # when the codes are marked expired if no time was given: when reported
+        "expires": expires or now.isoformat(),
+        "queued": now.isoformat(),
+    }
+    directory = inbox_dir(filepath)
+    makedirs(directory, exist_ok=True)
+    # sortable by time, unique across processes
+    name = f"{now.strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.json"
+    request_path = path.join(directory, name)
+    atomic_write(request_path, json.dumps(request).encode("utf-8"))
+    return request_path
+
+
+def pending(filepath):
+    """The queued requests for ``filepath``, oldest first, as (path, request) pairs."""
+    directory = inbox_dir(filepath)
+    if not path.isdir(directory):
+        return []
+    requests = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        request_path = path.join(directory, name)
+        try:
+            with open(request_path, "r", encoding="utf-8") as f:
+                requests.append((request_path, json.load(f)))
+        except (OSError, ValueError) as e:
+            _L.warning("Skipping unreadable inbox request %s: %s", request_path, e)
+    return requests
+
+
+def apply(store, requests):
+    """Mark the requested codes expired in a CodeStore; returns (entries marked, codes not found)."""
+    found = 0
+    not_found = []
+    for _, request in requests:
+        for code in request.get("codes", []):
+            marked = store.mark_expired(code, request.get("expires"))
+            if not marked:
+                not_found.append(code)
+            found += marked
+    return found, not_found
+
+
+def settle(requests, not_found):
+    """Drop applied requests from the inbox, keeping the codes in ``not_found`` queued."""
+    missing = set(not_found)
+    for request_path, request in requests:
+        remaining = [code for code in request.get("codes", []) if code in missing]
+        try:
+            if remaining:
+                request = dict(request, codes=remaining)
+                atomic_write(request_path, json.dumps(request).encode("utf-8"))
+            else:
+                os.remove(request_path)
+        except FileNotFoundError:
+            pass
+
+
+def expired_since(filepath, previous):
+    """Codes expired in ``filepath`` but not in ``previous`` (a PreviousCodeIndex), as {code: expires}.
+
+    These were marked expired directly in the file after ``previous`` was read.
+    """
+    late = {}
+    try:
+        for entry in ShiftFileReader(filepath):
+            code, game = entry.get("code"), entry.get("game")
+            if entry.get("expired") and not previous.expired(code, game):
+                late.setdefault(code, entry.get("expires"))
+    except (OSError, ShiftFileError) as e:
+        _L.warning("Could not check %s for expiries written during the run: %s", filepath, e)
+    return late
@@ -0,0 +1,263 @@
+"""Streaming reader for JavaScript object and array literals in a page.
+
+Some sources ship their codes as JavaScript data rather than markup, e.g.
+
+    const GOLD_KEYS_DATA = [
+        { code: "AAAAA-...", expires: createDate(2030, 12, 31), title: '3 Keys' },
+        ...
+    ];
+
+``iter_array_records`` finds the named arrays with one pass over the page and
+reads each one with a small tokenizer that understands strings (with
+escapes), numbers, nested objects and arrays, comments, trailing commas and
+calls such as ``createDate(...)``. A ``]`` or ``}`` inside a string cannot end
+the array early, and the work is linear in the size of the page.
+
+``html_text`` turns the HTML fragments those records carry into plain text
+without building a document tree; results are cached as titles repeat across
+runs and arrays.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+from html.parser import HTMLParser
+
+from common import _L
+
+# A function call in a literal, e.g. createDate(2030, 12, 31); ``raw`` is the
+# source text of the arguments
+Call = namedtuple("Call", ["name", "args", "raw"])
+# A bare identifier used as a value (a variable or constant defined elsewhere)
+Ref = namedtuple("Ref", ["name"])
+
+_KEYWORDS = {"true": True, "false": False, "null": None, "undefined": None}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "0": "\0"}
+_WHITESPACE_RE = re.compile(r"(?:\s+|//[^\n]*|/\*.*?\*/)+", re.DOTALL)
+_IDENT_RE = re.compile(r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*")
+_NUMBER_RE = re.compile(
+    r"[-+]?(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+)
+
+
+class JSLiteralError(ValueError):
+    """Raised when a literal can't be read; ``pos`` is the offset in the text."""
+
+    def __init__(self, message, pos):
+        super().__init__(f"{message} at offset {pos}")
+        self.pos = pos
+
+
+class _Reader:
+    """Recursive-descent reader over ``text`` starting at ``pos``."""
+
+    __slots__ = ("text", "pos")
+
+    def __init__(self, text, pos=0):
+        self.text = text
+        self.pos = pos
+
+    def skip(self):
+        match = _WHITESPACE_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+
+    def peek(self):
+        self.skip()
+        return self.text[self.pos : self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise JSLiteralError(f"expected {char!r}", self.pos)
+        self.pos += 1
+
+    def value(self):
+        char = self.peek()
+        if char == "{":
+            return self.object()
+        if char == "[":
+            return self.array()
+        if char in ("'", '"', "`"):
+            value = self.string()
+            # 'a' + 'b' concatenation, as used to wrap long titles
+            while self.peek() == "+":
+                self.pos += 1
+                if self.peek() not in ("'", '"', "`"):
+                    raise JSLiteralError("expected a string after '+'", self.pos)
+                value += self.string()
+            return value
+        match = _NUMBER_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            number = match.group()
+            if number.lstrip("+-")[:2] in ("0x", "0X"):
+                return int(number, 16)
+            return float(number) if any(c in number for c in ".eE") else int(number)
+        match = _IDENT_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            name = match.group()
+            if name in _KEYWORDS:
+                return _KEYWORDS[name]
+            if name == "new":
+                return self.value()
+            if self.peek() == "(":
+                return self.call(name)
+            return Ref(name)
+        raise JSLiteralError(f"unexpected {char or 'end of text'!r}", self.pos)
+
+    def string(self):
+        quote = self.text[self.pos]
+        start = self.pos + 1
+        end = self.text.find(quote, start)
+        chunk = self.text[start:end] if end != -1 else None
+        if chunk is not None and "\\" not in chunk and (quote != "`" or "${" not in chunk):
+            # no escapes: the common case, taken without a per-character loop
+            self.pos = end + 1
+            return chunk
+        parts = []
+        i = start
+        text = self.text
+        while i < len(text):
+            char = text[i]
+            if char == quote:
+                self.pos = i + 1
+                return "".join(parts)
+            if char == "\\":
+                i += 1
+                escaped = text[i : i + 1]
+                if escaped == "u" and text[i + 1 : i + 2] == "{":
+                    close = text.index("}", i)
+                    parts.append(chr(int(text[i + 2 : close], 16)))
+                    i = close
+                elif escaped == "u":
+                    parts.append(chr(int(text[i + 1 : i + 5], 16)))
+                    i += 4
+                elif escaped == "x":
+                    parts.append(chr(int(text[i + 1 : i + 3], 16)))
+                    i += 2
+                elif escaped == "\n":
+                    pass  # line continuation
+                else:
+                    parts.append(_ESCAPES.get(escaped, escaped))
+            else:
+                parts.append(char)
+            i += 1
+        raise JSLiteralError("unterminated string", start - 1)
+
+    def object(self):
+        self.expect("{")
+        record = {}
+        while True:
+            char = self.peek()
+            if char == "}":
+                self.pos += 1
+                return record
+            if char in ("'", '"'):
+                key = self.string()
+            else:
+                match = _IDENT_RE.match(self.text, self.pos) or _NUMBER_RE.match(
+                    self.text, self.pos
+                )
+                if not match:
+                    raise JSLiteralError("expected a property name", self.pos)
+                self.pos = match.end()
+                key = match.group()
+            if self.peek() == ":":
+                self.pos += 1
+                record[key] = self.value()
+            else:
+                # shorthand property { code }
+                record[key] = Ref(key)
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != "}":
+                raise JSLiteralError("expected ',' or '}'", self.pos)
+
+    def elements(self, close):
+        """Yield the comma-separated values up to ``close`` (consumed)."""
+        while True:
+            char = self.peek()
+            if char == close:
+                self.pos += 1
+                return
+            if char == ",":
+                # hole in an array, e.g. [1,,2]
+                self.pos += 1
+                continue
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != close:
+                raise JSLiteralError(f"expected ',' or {close!r}", self.pos)
+
+    def array(self):
+        self.expect("[")
+        return list(self.elements("]"))
+
+    def call(self, name):
+        start = self.pos + 1
+        self.expect("(")
+        args = tuple(self.elements(")"))
+        return Call(name, args, self.text[start : self.pos - 1])
+
+
+def parse_literal(text, pos=0):
+    """Read one literal from ``text`` at ``pos``; returns (value, end offset)."""
+    reader = _Reader(text, pos)
+    value = reader.value()
+    return value, reader.pos
+
+
+@lru_cache(maxsize=64)
+def _assignment_re(names):
+    alternatives = "|".join(re.escape(name) for name in names)
+    return re.compile(rf"\b(?P<name>{alternatives})\s*=\s*\[", re.IGNORECASE)
+
+
+def iter_array_records(text, names):
+    """Yield (array name, record) for every object in the named arrays.
+
+    Arrays are read in page order; records are yielded as they are read, so
+    a malformed element only loses the rest of its own array.
+    """
+    canonical = {name.lower(): name for name in names}
+    assignment_re = _assignment_re(tuple(names))
+    pos = 0
+    while True:
+        match = assignment_re.search(text, pos)
+        if not match:
+            return
+        name = canonical[match.group("name").lower()]
+        reader = _Reader(text, match.end())
+        try:
+            for element in reader.elements("]"):
+                if isinstance(element, dict):
+                    yield name, element
+        except ValueError as e:
+            _L.warning("Stopped reading %s: %s", name, e)
+            reader.pos = max(reader.pos, match.end())
+        pos = reader.pos
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the text nodes of an HTML fragment."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_data(self, data):
+        data = data.strip()
+        if data:
+            self.parts.append(data)
+
+
+@lru_cache(maxsize=4096)
+def html_text(fragment):
+    """Text of an HTML fragment, pieces joined by a space (like get_text(" ", strip=True))."""
+    if "<" not in fragment and "&" not in fragment:
+        return fragment.strip()
+    extractor = _TextExtractor()
+    extractor.feed(fragment)
+    extractor.close()
+    return " ".join(extractor.parts)
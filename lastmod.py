@@ -0,0 +1,118 @@
+"""Cheap change detection from sitemap (or Atom feed) lastmod dates.
+
+WordPress sites such as mentalmars publish a sitemap listing every post with
+its ``lastmod``. Fetching that one document per host and comparing each
+page's lastmod with the one stored after its last successful parse tells us
+which pages changed; unchanged pages are taken from the source cache instead
+of being fetched and parsed again. The stored dates are kept in
+data/lastmod.json (part of the scraper state).
+
+Pages on hosts without a configured sitemap, pages missing from it, and any
+failure fetching or reading it all fall back to a normal fetch.
+"""
+import io
+import json
+from os import makedirs, path
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+from common import _L, DIRNAME
+from shiftfile import atomic_write
+
+LASTMODPATH = path.join(DIRNAME, "data", "lastmod.json")
+
+# entry element -> (element holding the page URL, element holding its date)
+_ENTRY_TAGS = {
+    "url": ("loc", "lastmod"),  # sitemap
+    "entry": ("link", "updated"),  # Atom feed
+}
+
+
+def url_key(url):
+    """``url`` reduced to what identifies the page: host without www., path without trailing /."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host + (parts.path.rstrip("/") or "/")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_lastmods(content):
+    """Map url_key -> lastmod text for every entry in a sitemap or Atom feed.
+
+    A sitemap index (which only points at other sitemaps) yields nothing.
+    """
+    lastmods = {}
+    for _, element in ElementTree.iterparse(io.BytesIO(content)):
+        tags = _ENTRY_TAGS.get(_local(element.tag))
+        if not tags:
+            continue
+        url = lastmod = None
+        for child in element:
+            name = _local(child.tag)
+            if name == tags[0]:
+                url = child.get("href") or child.text
+            elif name == tags[1]:
+                lastmod = (child.text or "").strip()
+        if url and lastmod:
+            lastmods[url_key(url)] = lastmod
+        element.clear()
+    return lastmods
+
+
+class LastmodTracker:
+    """Lastmod dates seen in this run's sitemaps against those of the last good parse."""
+
+    def __init__(self, filepath=LASTMODPATH):
+        self.filepath = filepath
+        self.current = {}
+        self._stored = {}
+        self._dirty = False
+        if filepath and path.exists(filepath):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    self._stored = json.load(f)
+            except (OSError, ValueError) as e:
+                _L.warning("Ignoring unreadable lastmod file %s: %s", filepath, e)
+                self._stored = {}
+
+    def check(self, sitemap_url, content, urls):
+        """Read a fetched sitemap; returns how many of ``urls`` it lists as unchanged."""
+        try:
+            lastmods = parse_lastmods(content)
+        except ElementTree.ParseError as e:
+            _L.warning("Could not read sitemap %s: %s", sitemap_url, e)
+            return 0
+        for url in urls:
+            key = url_key(url)
+            if key in lastmods:
+                self.current[key] = lastmods[key]
+            else:
+                _L.info("%s is not listed in %s; fetching it as usual", url, sitemap_url)
+        return sum(1 for url in urls if self.unchanged(url))
+
+    def unchanged(self, url):
+        """True if ``url``'s lastmod is the one it had at its last successful parse."""
+        key = url_key(url)
+        return key in self.current and self._stored.get(key) == self.current[key]
+
+    def record(self, url):
+        """Remember ``url``'s current lastmod once its page was parsed successfully."""
+        key = url_key(url)
+        if key in self.current and self._stored.get(key) != self.current[key]:
+            self._stored[key] = self.current[key]
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        makedirs(path.dirname(self.filepath), exist_ok=True)
+        atomic_write(
+            self.filepath,
+            json.dumps(self._stored, indent=2, sort_keys=True).encode("utf-8"),
+        )
+        self._dirty = False
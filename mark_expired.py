@@ -1,15 +1,18 @@
 import argparse
-import json
 from datetime import datetime, timezone
 from os import path
 
-from github import Github
-from github.GithubException import UnknownObjectException
+import inbox
+from artifacts import write_artifacts
+from query import CodeStore
+from records import summarize
+from shiftfile import ShiftFileError, load_shiftfile, write_shiftfile
 
 SHIFTCODESJSONPATH = "data/shiftcodes.json"
+GITHUB_API = "https://api.github.com"
 
 
-def upload_shiftfile(filepath, user, repo_name, token, commit_msg=None):
+def upload_shiftfile(filepath, user, repo_name, token, commit_msg=None, api_url=GITHUB_API):
     """Upload or update shiftcodes.json in the specified GitHub repo (main branch)."""
     if not (user and repo_name and token):
         print("GitHub credentials incomplete; skipping upload.")
@@ -19,7 +22,11 @@ def upload_shiftfile(filepath, user, repo_name, token, commit_msg=None):
         content_bytes = f.read()
     content_str = content_bytes.decode("utf-8")
     try:
-        g = Github(token)
+        # PyGithub is only imported when an upload is requested
+        from github import Github
+        from github.GithubException import UnknownObjectException
+
+        g = Github(token, base_url=api_url)
         repo = g.get_repo(f"{user}/{repo_name}")
         try:
             contents = repo.get_contents("shiftcodes.json", ref="main")
@@ -38,62 +45,99 @@ def upload_shiftfile(filepath, user, repo_name, token, commit_msg=None):
 def load_file(fn):
     if not path.exists(fn):
         raise SystemExit(f"File not found: {fn}")
-    with open(fn, "r", encoding="utf-8") as f:
-        return json.load(f)
+    try:
+        return load_shiftfile(fn)
+    except ShiftFileError as e:
+        raise SystemExit(f"Could not read {e}")
 
 
 def save_file(fn, data):
-    with open(fn, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, default=str)
+    meta = data[0].get("meta")
+    if isinstance(meta, dict):
+        # the counts in the summary change with the expired flags
+        meta["summary"] = summarize(data[0]["codes"], datetime.now(timezone.utc))
+    write_shiftfile(fn, data)
+    write_artifacts(fn)
 
 
-def mark_expired(codes_to_mark, expires_override=None, filepath=SHIFTCODESJSONPATH):
+def _load_store(filepath):
     data = load_file(filepath)
     if not data or not isinstance(data, list) or "codes" not in data[0]:
         raise SystemExit("Unexpected shiftcodes.json format")
-    entries = data[0]["codes"]
-    found = 0
-    not_found = []
-    now_iso = datetime.now(timezone.utc).isoformat()
-    for target in codes_to_mark:
-        t = target.strip().upper()
-        matched = False
-        for e in entries:
-            code_val = (e.get("code") or "").strip().upper()
-            if code_val == t:
-                matched = True
-                if expires_override:
-                    e["expires"] = expires_override
-                else:
-                    e["expires"] = now_iso
-                e["expired"] = True
-                found += 1
-        if not matched:
-            not_found.append(t)
-    save_file(filepath, data)
+    return data, CodeStore.from_output(data)
+
+
+def mark_expired(codes_to_mark, expires_override=None, filepath=SHIFTCODESJSONPATH):
+    # locked so a scraper run (or a drain) can't write the file in between
+    with inbox.file_lock(filepath):
+        data, store = _load_store(filepath)
+        found = 0
+        not_found = []
+        expires = expires_override or datetime.now(timezone.utc).isoformat()
+        for target in codes_to_mark:
+            t = target.strip().upper()
+            # the store updates the loaded entries (and its indexes) in place
+            marked = store.mark_expired(t, expires)
+            if not marked:
+                not_found.append(t)
+            found += marked
+        save_file(filepath, data)
     return found, not_found
 
 
+def drain(filepath=SHIFTCODESJSONPATH):
+    """Apply every queued request in one load/write; returns (requests, found, not_found)."""
+    with inbox.file_lock(filepath):
+        requests = inbox.pending(filepath)
+        if not requests:
+            return 0, 0, []
+        data, store = _load_store(filepath)
+        found, not_found = inbox.apply(store, requests)
+        save_file(filepath, data)
+        inbox.settle(requests, not_found)
+    return len(requests), found, not_found
+
+
 def main():
     p = argparse.ArgumentParser(description="Mark one or more SHiFT codes as expired in data/shiftcodes.json")
-    p.add_argument("codes", nargs="+", help="SHiFT code(s) to mark expired (exact match). Can pass multiple codes.")
+    p.add_argument("codes", nargs="*", help="SHiFT code(s) to mark expired (exact match). Can pass multiple codes.")
     p.add_argument("--expires", default=None, help="Optional ISO datetime to set in the 'expires' field (defaults to now UTC)")
     p.add_argument("--file", default=SHIFTCODESJSONPATH, help="Path to shiftcodes.json (default: data/shiftcodes.json)")
+    mode = p.add_mutually_exclusive_group()
+    mode.add_argument("--queue", action="store_true", help="Queue the codes in the inbox for the next drain instead of writing the file now")
+    mode.add_argument("--drain", action="store_true", help="Apply every queued request in one write (and one upload)")
     # optional GitHub push parameters
     p.add_argument("--user", default=None, help="GitHub username or org that owns the repo (optional, to push file)")
     p.add_argument("--repo", default=None, help="GitHub repository name (optional, to push file)")
     p.add_argument("--token", default=None, help="GitHub token with contents:write permission (optional, to push file)")
+    p.add_argument("--github-api", default=GITHUB_API, help="GitHub API base URL (default: %(default)s)")
     args = p.parse_args()
-
-    found, not_found = mark_expired(args.codes, expires_override=args.expires, filepath=args.file)
+    if not args.codes and not args.drain:
+        p.error("give the codes to mark expired, or --drain")
+
+    if args.queue:
+        request_path = inbox.enqueue(args.codes, args.expires, filepath=args.file)
+        print(f"Queued {len(args.codes)} code(s) in {request_path}")
+        return
+    if args.drain:
+        if args.codes:
+            inbox.enqueue(args.codes, args.expires, filepath=args.file)
+        requests, found, not_found = drain(args.file)
+        if not requests:
+            print("Inbox is empty; nothing to do.")
+            return
+        print(f"Applied {requests} queued request(s)")
+        commit_msg = f"Marked expired via mark_expired.py --drain: {requests} request(s)"
+    else:
+        found, not_found = mark_expired(args.codes, expires_override=args.expires, filepath=args.file)
+        commit_msg = f"Marked expired via mark_expired.py: {', '.join(args.codes)}"
     print(f"Marked expired: {found}")
     if not_found:
         print("Not found:", ", ".join(not_found))
 
     # If GitHub credentials provided, upload the updated file
     if args.user and args.repo and args.token:
-        ok = upload_shiftfile(args.file, args.user, args.repo, args.token,
-                              commit_msg=f"Marked expired via mark_expired.py: {', '.join(args.codes)}")
+        ok = upload_shiftfile(args.file, args.user, args.repo, args.token, commit_msg=commit_msg, api_url=args.github_api)
         if ok:
             print("Uploaded updated shiftcodes.json to GitHub.")
         else:
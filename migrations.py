@@ -0,0 +1,112 @@
+"""Versioned migrations for shiftcodes.json.
+
+Each migration is registered against the integer file version it produces
+and upgrades the loaded structure in memory. ``migrate`` applies every step
+between the file's version and ``CURRENT_VERSION`` in order, so however many
+steps run, the caller writes the result back once.
+"""
+from time import perf_counter
+
+from common import _L
+from extraction import normalize_code
+
+CURRENT_VERSION = 2
+
+# target version -> function(data) returning a short summary of what it did
+MIGRATIONS = {}
+
+
+def migration(version):
+    """Register ``fn`` as the step that upgrades a file to ``version``."""
+
+    def register(fn):
+        if version in MIGRATIONS:
+            raise ValueError(f"Duplicate migration for version {version}")
+        MIGRATIONS[version] = fn
+        return fn
+
+    return register
+
+
+def parse_version(value):
+    """Return the integer version of a file's ``meta.version`` (0 if unset).
+
+    Early files used "0.1", which is treated like an unversioned file.
+    """
+    if value is None or value == "":
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"Unrecognised shiftcodes file version: {value!r}")
+
+
+def needs_migration(meta):
+    """Whether a file with ``meta`` is older than CURRENT_VERSION.
+
+    A version that isn't a number is logged and left alone, not migrated.
+    """
+    if meta is None:
+        return False
+    try:
+        return parse_version(meta.get("version")) < CURRENT_VERSION
+    except ValueError as e:
+        _L.error("%s; skipping migrations", e)
+        return False
+
+
+@migration(1)
+def set_initial_version(data):
+    # Unversioned (or "0.1") files only need the version recorded
+    return "set file version"
+
+
+@migration(2)
+def drop_invalid_codes(data):
+    # Only allow codes that match the 5x5 pattern
+    codes = data[0].get("codes", [])
+    filtered = []
+    for c in codes:
+        code_val = normalize_code(c.get("code"))
+        if code_val:
+            # keep original entry but normalise stored code to upper/stripped
+            c["code"] = code_val
+            filtered.append(c)
+        else:
+            _L.debug("Migration: dropping invalid code entry: %s", c)
+    data[0]["codes"] = filtered
+    return f"removed {len(codes) - len(filtered)} invalid codes"
+
+
+def migrate(data, target=CURRENT_VERSION):
+    """Apply all pending migrations to ``data`` in memory.
+
+    Returns a list of (version, name, seconds, summary) for each step applied.
+    """
+    applied = []
+    if not data:
+        return applied
+    meta = data[0].setdefault("meta", {})
+    version = parse_version(meta.get("version"))
+    if version > target:
+        _L.debug("Shiftcodes file is at version %d, newer than %d", version, target)
+        return applied
+    for step in range(version + 1, target + 1):
+        fn = MIGRATIONS[step]
+        started = perf_counter()
+        summary = fn(data)
+        meta["version"] = str(step)
+        elapsed = perf_counter() - started
+        _L.info(
+            "Migration v%d -> v%d (%s): %s in %.3fs",
+            step - 1,
+            step,
+            fn.__name__,
+            summary,
+            elapsed,
+        )
+        applied.append((step, fn.__name__, elapsed, summary))
+    return applied
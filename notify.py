@@ -0,0 +1,214 @@
+"""Webhook notifications of new and newly expired codes.
+
+Subscribers are listed in a JSON file (``--webhooks``)::
+
+    [
+        {"url": "https://example.com/hook", "games": ["Borderlands 4"], "platforms": ["steam", "universal"]},
+        {"url": "https://example.org/all-codes"}
+    ]
+
+``games`` and ``platforms`` are optional, case-insensitive filters. After
+each run the new and newly expired codes are batched into one payload per
+subscriber and queued in an outbox (data/outbox.json, part of the scraper
+state) before anything is sent, so a crash or restart loses nothing. The
+outbox is then delivered with one worker per subscriber. A subscriber's
+batches are sent oldest first, each retried a few times, and anything still
+undelivered waits in the outbox for a later run.
+"""
+import hashlib
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from os import path
+
+from common import _L, DIRNAME
+from fetcher import USER_AGENT
+from shiftfile import atomic_write
+
+OUTBOXPATH = path.join(DIRNAME, "data", "outbox.json")
+
+DEFAULT_WORKERS = 4
+TIMEOUT = 10  # seconds per POST
+ATTEMPTS = 3  # POSTs per batch in one run
+RETRY_DELAY = 2  # seconds before the second attempt, doubling after that
+MAX_AGE = timedelta(days=7)  # undelivered batches older than this are dropped
+# client errors that are worth retrying; other 4xx responses never will succeed
+RETRY_STATUSES = {408, 425, 429}
+
+
+class Subscriber(namedtuple("Subscriber", ["url", "games", "platforms"])):
+    """A webhook URL with optional game and platform filters (lower-cased sets)."""
+
+    __slots__ = ()
+
+    def wants(self, entry):
+        game = str(entry.get("game") or "").lower()
+        platform = str(entry.get("platform") or "").lower()
+        return (not self.games or game in self.games) and (
+            not self.platforms or platform in self.platforms
+        )
+
+
+def load_subscribers(filepath):
+    """Read the subscribers file; raises ValueError if it isn't a list of {"url": ...}."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if not isinstance(config, list):
+        raise ValueError(f"{filepath} must hold a list of subscribers")
+    subscribers = []
+    for item in config:
+        if not isinstance(item, dict) or not item.get("url"):
+            raise ValueError(f"Subscriber without a url in {filepath}: {item!r}")
+        subscribers.append(
+            Subscriber(
+                item["url"],
+                frozenset(g.lower() for g in item.get("games") or ()),
+                frozenset(p.lower() for p in item.get("platforms") or ()),
+            )
+        )
+    return subscribers
+
+
+def code_changes(entries, seen):
+    """Split the output ``entries`` into (new, newly expired) against ``seen``.
+
+    ``seen`` answers archived(code, game) / expired(code, game) for the state
+    before this run (a SeenIndex or PreviousCodeIndex).
+    """
+    new = []
+    expired = []
+    for entry in entries:
+        code, game = entry.get("code"), entry.get("game")
+        if seen.archived(code, game) is None:
+            new.append(entry)
+        elif entry.get("expired") and not seen.expired(code, game):
+            expired.append(entry)
+    return new, expired
+
+
+def _post(url, body, headers):
+    import requests
+
+    return requests.post(url, data=body, headers=headers, timeout=TIMEOUT)
+
+
+class Outbox:
+    """Batches waiting to be delivered, persisted as JSON between runs."""
+
+    def __init__(self, filepath=OUTBOXPATH, now=None):
+        self.filepath = filepath
+        self._now = now or (lambda: datetime.now(timezone.utc))
+        self.batches = []
+        if filepath and path.exists(filepath):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    self.batches = json.load(f)
+            except (OSError, ValueError) as e:
+                _L.error("Ignoring unreadable webhook outbox %s: %s", filepath, e)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def queue(self, subscribers, new, expired, generated):
+        """Add one batch per subscriber with something to hear about; returns how many."""
+        added = 0
+        for subscriber in subscribers:
+            payload = {
+                "generated": str(generated),
+                "new": [e for e in new if subscriber.wants(e)],
+                "expired": [e for e in expired if subscriber.wants(e)],
+            }
+            if not payload["new"] and not payload["expired"]:
+                continue
+            body = json.dumps(payload, default=str, sort_keys=True)
+            self.batches.append(
+                {
+                    # also sent as X-Autoshift-Delivery so receivers can drop repeats
+                    "id": hashlib.sha256((subscriber.url + body).encode("utf-8")).hexdigest()[:32],
+                    "url": subscriber.url,
+                    "queued": self._now().isoformat(),
+                    "attempts": 0,
+                    "last_error": None,
+                    "body": body,
+                }
+            )
+            added += 1
+        return added
+
+    def save(self):
+        atomic_write(self.filepath, json.dumps(self.batches, indent=1).encode("utf-8"))
+
+    def _send(self, batch, post, sleep):
+        """Try a batch up to ATTEMPTS times; returns "sent", "retry" or "failed"."""
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+            "X-Autoshift-Delivery": batch["id"],
+        }
+        for attempt in range(ATTEMPTS):
+            if attempt:
+                sleep(RETRY_DELAY * 2 ** (attempt - 1))
+            batch["attempts"] += 1
+            try:
+                r = post(batch["url"], batch["body"].encode("utf-8"), headers)
+            except Exception as e:
+                batch["last_error"] = str(e) or type(e).__name__
+                continue
+            status = r.status_code
+            if 200 <= status < 300:
+                return "sent"
+            batch["last_error"] = f"HTTP {status}"
+            if 400 <= status < 500 and status not in RETRY_STATUSES:
+                return "failed"
+        return "retry"
+
+    def _deliver_to(self, batches, post, sleep):
+        """Send one subscriber's batches in order, stopping at the first that can't be sent."""
+        done = []
+        for batch in batches:
+            result = self._send(batch, post, sleep)
+            if result == "retry":
+                break
+            done.append((batch["id"], result))
+        return done
+
+    def deliver(self, post=_post, workers=DEFAULT_WORKERS, sleep=time.sleep):
+        """Deliver every queued batch, subscribers in parallel; returns (sent, failed, waiting)."""
+        # drop batches that have waited too long
+        cutoff = self._now() - MAX_AGE
+        for batch in [b for b in self.batches if datetime.fromisoformat(b["queued"]) < cutoff]:
+            _L.error(
+                "Webhook %s: giving up on a batch queued at %s (%s)",
+                batch["url"],
+                batch["queued"],
+                batch["last_error"],
+            )
+            self.batches.remove(batch)
+        by_url = {}
+        for batch in self.batches:
+            by_url.setdefault(batch["url"], []).append(batch)
+        results = {}
+        if by_url:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(by_url)))) as pool:
+                futures = [
+                    pool.submit(self._deliver_to, batches, post, sleep)
+                    for batches in by_url.values()
+                ]
+                for future in futures:
+                    results.update(future.result())
+        sent = sum(1 for result in results.values() if result == "sent")
+        failed = [b for b in self.batches if results.get(b["id"]) == "failed"]
+        for batch in failed:
+            _L.error("Webhook %s rejected a batch: %s", batch["url"], batch["last_error"])
+        self.batches = [b for b in self.batches if b["id"] not in results]
+        for batch in self.batches:
+            _L.warning(
+                "Webhook %s: batch not delivered after %d attempts (%s); will retry next run",
+                batch["url"],
+                batch["attempts"],
+                batch["last_error"],
+            )
+        self.save()
+        return sent, len(failed), len(self.batches)
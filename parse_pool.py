@@ -0,0 +1,71 @@
+"""Parsing stage that spreads page parsing over all cores.
+
+BeautifulSoup with ``html.parser`` is pure Python, so parsing pages one after
+another in the scraping process keeps a single core busy while the rest sit
+idle. ``ParsePool`` hands each fetched document to a ``ProcessPoolExecutor``
+worker as soon as it arrives, so parsing overlaps with the remaining fetches.
+Workers return only the compact parsed rows (plain dicts/lists), never soup
+objects. With ``workers=0`` everything runs in-process, which is what the
+tests and single-core containers use.
+"""
+import os
+from concurrent.futures import Executor, Future
+
+from common import _L
+
+
+class InlineExecutor(Executor):
+    """Executor that runs each call immediately in the calling process."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class ParsePool:
+    """Submit parse jobs to a process pool, or in-process when workers is 0."""
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = default_workers()
+        self.workers = max(0, int(workers))
+        self._abandoned = False
+        if self.workers == 0:
+            self._executor = InlineExecutor()
+        else:
+            # multiprocessing is only imported when a worker pool is wanted
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        _L.debug(
+            "Parse stage using %s",
+            f"{self.workers} worker processes" if self.workers else "the main process",
+        )
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)``; ``fn`` must be a module-level function."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=not self._abandoned)
+
+    def abandon(self):
+        """Stop without waiting for running jobs; queued jobs are cancelled."""
+        _L.warning("Abandoning unfinished parse jobs")
+        self._abandoned = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
@@ -0,0 +1,317 @@
+"""Indexed queries over the generated codes.
+
+``CodeStore`` wraps the structure ``generateAutoshiftJSON`` produces (or a
+shiftcodes.json loaded from disk) and keeps secondary indexes by code, game,
+platform, expired state, ``archived`` time and expiry time, so questions
+like "active Borderlands 4 Steam codes archived since yesterday" are answered
+from the indexes, and counts and time ranges come from bisecting sorted keys
+rather than walking every entry.
+
+    python query.py --game "Borderlands 4" --platform steam --active --since 2025-01-01
+"""
+import argparse
+import json
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from shiftfile import canonical_timestamp, load_shiftfile
+
+SHIFTCODESJSONPATH = "data/shiftcodes.json"
+
+
+# Two unrelated defaults for dateutil: a field the text leaves out comes out
+# differently under each, so partial dates ("Sept 30") can be told apart
+_PARTIAL_DATE_PROBES = (datetime(2000, 1, 1), datetime(2001, 2, 2))
+
+
+@lru_cache(maxsize=4096)
+def parse_time(value):
+    """Return ``value`` as a canonical UTC timestamp string, or None if it isn't a time.
+
+    ISO 8601 is tried first; other date formats (as found in ``expires``) go
+    through python-dateutil when it is installed. Those must give a full
+    date: one missing its year, month or day is None rather than filled in
+    from today, so results don't depend on when they were first asked for.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return canonical_timestamp(value)
+    text = str(value).strip()
+    try:
+        datetime.fromisoformat(text)
+        return canonical_timestamp(text)
+    except ValueError:
+        pass
+    try:
+        from dateutil import parser as dateutil_parser
+    except ModuleNotFoundError:
+        return None
+    try:
+        dt, probe = (
+            dateutil_parser.parse(text, default=default)
+            for default in _PARTIAL_DATE_PROBES
+        )
+    except (ValueError, OverflowError):
+        return None
+    if dt.date() != probe.date():
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return canonical_timestamp(dt)
+
+
+def _bound(value):
+    """A range bound as a timestamp key; unparseable bounds are an error, not ignored."""
+    if value is None:
+        return None
+    key = parse_time(value)
+    if key is None:
+        raise ValueError(f"Not a recognisable time: {value!r}")
+    return key
+
+
+class _RangeIndex:
+    """Positions sorted by a timestamp key, for range scans and counts."""
+
+    __slots__ = ("keys", "positions")
+
+    def __init__(self, pairs):
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [pos for _, pos in pairs]
+
+    def _bounds(self, start=None, end=None):
+        lo = bisect_left(self.keys, start) if start else 0
+        hi = bisect_left(self.keys, end) if end else len(self.keys)
+        return lo, max(lo, hi)
+
+    def scan(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return self.positions[lo:hi]
+
+    def count(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+    def ceiling(self, key):
+        """The first key at or after ``key``, or None if every key is before it."""
+        i = bisect_left(self.keys, key)
+        return self.keys[i] if i < len(self.keys) else None
+
+    def move(self, position, old_key, new_key):
+        if old_key is not None:
+            i = bisect_left(self.keys, old_key)
+            while self.positions[i] != position:
+                i += 1
+            del self.keys[i]
+            del self.positions[i]
+        if new_key is not None:
+            i = bisect_left(self.keys, new_key)
+            # keep equal keys in position order
+            while (
+                i < len(self.keys)
+                and self.keys[i] == new_key
+                and self.positions[i] < position
+            ):
+                i += 1
+            self.keys.insert(i, new_key)
+            self.positions.insert(i, position)
+
+
+class CodeStore:
+    """The autoshift code entries with secondary indexes for querying."""
+
+    def __init__(self, entries, meta=None):
+        self.meta = meta or {}
+        self.entries = list(entries)
+        self._by_code = {}
+        self._by_game = {}
+        self._by_platform = {}
+        self._expired = []
+        self._active = []
+        self._expires_keys = []
+        archived = []
+        expires = []
+        for pos, entry in enumerate(self.entries):
+            code = str(entry.get("code") or "").upper()
+            game = str(entry.get("game") or "").lower()
+            platform = str(entry.get("platform") or "").lower()
+            self._by_code.setdefault(code, []).append(pos)
+            self._by_game.setdefault(game, []).append(pos)
+            self._by_platform.setdefault(platform, []).append(pos)
+            (self._expired if entry.get("expired") else self._active).append(pos)
+            archived_key = parse_time(entry.get("archived"))
+            if archived_key:
+                archived.append((archived_key, pos))
+            expires_key = parse_time(entry.get("expires"))
+            self._expires_keys.append(expires_key)
+            if expires_key:
+                expires.append((expires_key, pos))
+        self._archived = _RangeIndex(archived)
+        self._expires = _RangeIndex(expires)
+
+    @classmethod
+    def from_output(cls, data):
+        """Build a store from the [{"meta": ..., "codes": [...]}] output structure."""
+        if not data:
+            return cls([])
+        return cls(data[0].get("codes", []), data[0].get("meta"))
+
+    @classmethod
+    def from_file(cls, filepath=SHIFTCODESJSONPATH):
+        return cls.from_output(load_shiftfile(filepath))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def codes(self):
+        """The set of distinct (upper-case) codes."""
+        return {code for code in self._by_code if code}
+
+    def games(self):
+        return sorted({self.entries[p[0]].get("game") for p in self._by_game.values()})
+
+    def platforms(self):
+        return sorted(
+            {self.entries[p[0]].get("platform") for p in self._by_platform.values()}
+        )
+
+    def lookup(self, code):
+        """Every entry (one per game/platform) for ``code``."""
+        return [self.entries[pos] for pos in self._by_code.get(code.strip().upper(), [])]
+
+    def _candidates(
+        self,
+        game=None,
+        platform=None,
+        expired=None,
+        archived_from=None,
+        archived_to=None,
+        expires_from=None,
+        expires_to=None,
+    ):
+        """The position lists the given filters restrict to (one per filter)."""
+        candidates = []
+        if game:
+            candidates.append(self._by_game.get(game.lower(), []))
+        if platform:
+            candidates.append(self._by_platform.get(platform.lower(), []))
+        if expired is not None:
+            candidates.append(self._expired if expired else self._active)
+        if archived_from or archived_to:
+            candidates.append(
+                self._archived.scan(_bound(archived_from), _bound(archived_to))
+            )
+        if expires_from or expires_to:
+            candidates.append(
+                self._expires.scan(_bound(expires_from), _bound(expires_to))
+            )
+        return candidates
+
+    def positions(self, **filters):
+        """Positions (in file order) of the entries matching every filter.
+
+        Filters: game, platform (case-insensitive), expired (True/False),
+        archived_from/archived_to and expires_from/expires_to (half-open time
+        ranges, as datetimes or ISO strings).
+        """
+        candidates = self._candidates(**filters)
+        if not candidates:
+            return list(range(len(self.entries)))
+        candidates.sort(key=len)
+        if len(candidates) == 1:
+            return sorted(candidates[0])
+        matched = set(candidates[0])
+        for other in candidates[1:]:
+            matched.intersection_update(other)
+            if not matched:
+                break
+        return sorted(matched)
+
+    def archived_bucket(self, since):
+        """The earliest ``archived`` key at or after ``since``, or None if every entry is older.
+
+        Every ``archived_from`` that maps to the same bucket selects the same
+        entries, so callers can cache on it instead of the raw time.
+        """
+        return self._archived.ceiling(_bound(since))
+
+    def select(self, **filters):
+        """The entries matching ``filters`` (see ``positions``), in file order."""
+        return [self.entries[pos] for pos in self.positions(**filters)]
+
+    def count(self, **filters):
+        """How many entries match ``filters``; a single filter is answered from its index."""
+        filters = {key: value for key, value in filters.items() if value is not None}
+        if not filters:
+            return len(self.entries)
+        if filters.keys() <= {"archived_from", "archived_to"}:
+            return self._archived.count(
+                _bound(filters.get("archived_from")), _bound(filters.get("archived_to"))
+            )
+        if filters.keys() <= {"expires_from", "expires_to"}:
+            return self._expires.count(
+                _bound(filters.get("expires_from")), _bound(filters.get("expires_to"))
+            )
+        candidates = self._candidates(**filters)
+        if len(candidates) == 1:
+            return len(candidates[0])
+        return len(self.positions(**filters))
+
+    def mark_expired(self, code, expires):
+        """Mark every entry for ``code`` expired as of ``expires``; returns how many."""
+        positions = self._by_code.get(code.strip().upper(), [])
+        new_key = parse_time(expires)
+        for pos in positions:
+            entry = self.entries[pos]
+            if not entry.get("expired"):
+                del self._active[bisect_left(self._active, pos)]
+                insort(self._expired, pos)
+            entry["expires"] = expires
+            entry["expired"] = True
+            self._expires.move(pos, self._expires_keys[pos], new_key)
+            self._expires_keys[pos] = new_key
+        return len(positions)
+
+    def as_output(self):
+        """The store in the [{"meta": ..., "codes": [...]}] output structure."""
+        return [{"meta": self.meta, "codes": self.entries}]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Query the codes in data/shiftcodes.json")
+    p.add_argument("--file", default=SHIFTCODESJSONPATH, help="Path to shiftcodes.json (default: %(default)s)")
+    p.add_argument("--code", default=None, help="Show the entries for one code")
+    p.add_argument("--game", default=None, help="Only codes for this game")
+    p.add_argument("--platform", default=None, help="Only codes for this platform")
+    state = p.add_mutually_exclusive_group()
+    state.add_argument("--active", action="store_true", help="Only codes not marked expired")
+    state.add_argument("--expired", action="store_true", help="Only codes marked expired")
+    p.add_argument("--since", default=None, help="Only codes archived at or after this ISO time")
+    p.add_argument("--until", default=None, help="Only codes archived before this ISO time")
+    p.add_argument("--expires-before", default=None, help="Only codes expiring before this time")
+    p.add_argument("--count", action="store_true", help="Print the number of matches instead of the entries")
+    args = p.parse_args()
+
+    store = CodeStore.from_file(args.file)
+    if args.code:
+        print(json.dumps(store.lookup(args.code), indent=2, default=str))
+        return
+    filters = {
+        "game": args.game,
+        "platform": args.platform,
+        "expired": True if args.expired else (False if args.active else None),
+        "archived_from": args.since,
+        "archived_to": args.until,
+        "expires_to": args.expires_before,
+    }
+    if args.count:
+        print(store.count(**filters))
+    else:
+        print(json.dumps(store.select(**filters), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
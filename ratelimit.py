@@ -0,0 +1,198 @@
+"""Per-host politeness for everything the scraper fetches.
+
+Each host gets a token bucket: requests to it are spaced by at least its
+minimum interval (the configured default, or the site's robots.txt
+``Crawl-delay`` if that is longer), with a little random jitter so many
+self-hosted scrapers don't hit a site in lockstep. A ``Retry-After`` from a
+429/503 response blocks the host until that time has passed. A request only
+ever waits as long as these limits require for its own host.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from common import _L
+
+DEFAULT_INTERVAL = 5.0  # seconds between requests to the same host
+DEFAULT_JITTER = 2.0  # up to this many extra seconds per wait
+# Never sleep longer than this for one request; the host is reported blocked instead
+MAX_WAIT = 120.0
+# Longest a robots.txt fetch may take; a caller's lower max_wait caps it further
+ROBOTS_TIMEOUT = 10.0
+
+
+class HostBlocked(Exception):
+    """Raised when a host can't be requested within the time we are prepared to wait."""
+
+    def __init__(self, host, seconds):
+        super().__init__(f"{host} cannot be requested for another {seconds:.0f}s")
+        self.host = host
+        self.seconds = seconds
+
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+
+def retry_after_seconds(value, now=None):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds, or None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class _Bucket:
+    __slots__ = ("interval", "tokens", "capacity", "updated", "blocked_until")
+
+    def __init__(self, interval, capacity, now):
+        self.interval = interval
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def refill(self, now):
+        if self.interval > 0:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) / self.interval
+            )
+        else:
+            self.tokens = self.capacity
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available and the host is unblocked."""
+        self.refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.interval
+        return max(wait, self.blocked_until - now)
+
+
+class HostRateLimiter:
+    """Token-bucket rate limiter keyed by host, shared by all fetchers."""
+
+    def __init__(
+        self,
+        interval=DEFAULT_INTERVAL,
+        burst=1,
+        jitter=DEFAULT_JITTER,
+        max_wait=MAX_WAIT,
+        robots_fetcher=None,
+        user_agent="*",
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.interval = interval
+        self.burst = burst
+        self.jitter = jitter
+        self.max_wait = max_wait
+        # robots_fetcher(url, timeout) -> robots.txt text (or None); None disables robots checks
+        self.robots_fetcher = robots_fetcher
+        self.user_agent = user_agent
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets = {}
+        # host -> robots.txt Crawl-delay (or None), fetched once per host
+        self._crawl_delays = {}
+        self._lock = threading.Lock()
+
+    def _crawl_delay(self, url, timeout):
+        parts = urlsplit(url)
+        text = self.robots_fetcher(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout)
+        if not text:
+            return None
+        parser = RobotFileParser()
+        parser.parse(text.splitlines())
+        delay = parser.crawl_delay(self.user_agent)
+        if delay:
+            _L.info("%s asks for a Crawl-delay of %ss", parts.netloc, delay)
+        return float(delay) if delay else None
+
+    def _fetch_crawl_delay(self, url, max_wait=None):
+        """Look up the Crawl-delay of ``url``'s host unless it is known; call without the lock.
+
+        robots.txt is fetched outside the lock so a slow site doesn't hold up
+        requests to every other host, and within ``max_wait`` seconds so it
+        can't eat a source's whole budget. Two first requests to one host may
+        both fetch it; the first answer stored wins.
+        """
+        host = host_of(url)
+        if self.robots_fetcher is None or host in self._crawl_delays:
+            return
+        timeout = ROBOTS_TIMEOUT if max_wait is None else min(ROBOTS_TIMEOUT, max_wait)
+        if timeout <= 0:
+            return
+        try:
+            crawl_delay = self._crawl_delay(url, timeout)
+        except Exception as e:
+            _L.debug("Could not fetch robots.txt for %s: %s", host, e)
+            if timeout < ROBOTS_TIMEOUT:
+                # cut short by the caller's budget; a later request tries again
+                return
+            crawl_delay = None
+        with self._lock:
+            self._crawl_delays.setdefault(host, crawl_delay)
+
+    def _bucket(self, url):
+        host = host_of(url)
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            interval = self.interval
+            crawl_delay = self._crawl_delays.get(host)
+            if crawl_delay:
+                interval = max(interval, crawl_delay)
+            bucket = _Bucket(interval, self.burst, self._clock())
+            self._buckets[host] = bucket
+        return host, bucket
+
+    def wait(self, url, max_wait=None):
+        """Block until a request to ``url``'s host is allowed, then take a token.
+
+        Raises HostBlocked if that would mean waiting longer than max_wait
+        (the limiter's own, or the lower ``max_wait`` given by the caller).
+        """
+        limit = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        started = self._clock()
+        self._fetch_crawl_delay(url, max_wait)
+        limit -= self._clock() - started
+        with self._lock:
+            host, bucket = self._bucket(url)
+            delay = bucket.delay(self._clock())
+            if delay > limit:
+                raise HostBlocked(host, delay)
+            if delay > 0 and self.jitter:
+                delay += random.uniform(0, self.jitter)
+            # reserve the token now so concurrent callers queue up behind us
+            bucket.tokens -= 1
+        if delay > 0:
+            _L.debug("Rate limiter: waiting %.1fs before requesting %s", delay, host)
+            self._sleep(delay)
+        return delay
+
+    def defer(self, url, seconds):
+        """Block ``url``'s host for ``seconds`` (e.g. from a Retry-After header)."""
+        self._fetch_crawl_delay(url)
+        with self._lock:
+            host, bucket = self._bucket(url)
+            bucket.blocked_until = max(bucket.blocked_until, self._clock() + seconds)
+        _L.info("Rate limiter: backing off %s for %.0fs", host, seconds)
+
+    def blocked_for(self, url):
+        """Seconds until ``url``'s host may be requested again (0 if it may now)."""
+        self._fetch_crawl_delay(url)
+        with self._lock:
+            _, bucket = self._bucket(url)
+            return max(0.0, bucket.delay(self._clock()))
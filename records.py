@@ -0,0 +1,164 @@
+"""Compact internal representation of the codes we publish.
+
+autoshift expects one denormalised entry per code/platform pair, each
+repeating the game, link and type strings. Internally we keep a single slotted
+``CodeRecord`` per scraped row instead: the repeated strings are interned so
+every record shares one copy, and a "pc" row holds both of its platforms in a
+small tuple rather than being duplicated for steam and epic. Records are only
+expanded into autoshift's entries when the output is serialised.
+"""
+import sys
+from dataclasses import dataclass
+
+from query import parse_time
+from shiftfile import canonical_timestamp
+
+CODE_TYPE = "shift"
+
+# Table platforms that stand for more than one autoshift platform
+PLATFORM_EXPANSION = {"pc": ("steam", "epic")}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def platforms_for(platform):
+    """Return the (interned) autoshift platforms a table platform stands for."""
+    return tuple(_intern(p) for p in PLATFORM_EXPANSION.get(platform, (platform,)))
+
+
+@dataclass(slots=True)
+class CodeRecord:
+    code: str
+    game: str
+    platforms: tuple
+    reward: str
+    archived: object
+    expires: str
+    expired: bool
+    link: str
+    type: str = CODE_TYPE
+
+    @classmethod
+    def create(cls, code, game, platform, reward, archived, expires, expired, link):
+        """Build a record, interning the strings shared between many records."""
+        return cls(
+            code=code,
+            game=_intern(game),
+            platforms=platforms_for(platform),
+            reward=_intern(reward),
+            archived=archived,
+            expires=_intern(expires),
+            expired=expired,
+            link=_intern(link),
+        )
+
+    def entries(self):
+        """Yield the denormalised autoshift entries for this record."""
+        for platform in self.platforms:
+            yield {
+                "code": self.code,
+                "type": self.type,
+                "game": self.game,
+                "platform": platform,
+                "reward": self.reward,
+                "archived": self.archived,
+                "expires": self.expires,
+                "expired": self.expired,
+                "link": self.link,
+            }
+
+
+def expand_records(records, summary=None):
+    """Expand records into the list of entries autoshift reads.
+
+    With a ``Summary`` each entry is also counted into it as it is built.
+    """
+    if summary is None:
+        return [entry for record in records for entry in record.entries()]
+    entries = []
+    for record in records:
+        for entry in record.entries():
+            summary.add(entry)
+            entries.append(entry)
+    return entries
+
+
+def _later(a, b):
+    return b if a is None or (b is not None and b > a) else a
+
+
+def _earlier(a, b):
+    return b if a is None or (b is not None and b < a) else a
+
+
+class Summary:
+    """Counts and times for the output's meta, gathered as entries are built.
+
+    They let clients tell what changed without reading every code.
+    ``latest_archived`` is the newest code; ``next_expiry`` the soonest
+    future expiry of a code not marked expired. A game's ``last_changed``
+    is its newest code or the latest (past) expiry of one of its expired
+    codes, whichever is later.
+    """
+
+    __slots__ = ("now", "total", "active", "latest_archived", "next_expiry", "games")
+
+    def __init__(self, now):
+        self.now = canonical_timestamp(now)
+        self.total = 0
+        self.active = 0
+        self.latest_archived = None
+        self.next_expiry = None
+        self.games = {}
+
+    def add(self, entry):
+        archived = parse_time(entry.get("archived"))
+        expires = parse_time(entry.get("expires"))
+        game = self.games.get(entry.get("game"))
+        if game is None:
+            game = self.games[entry.get("game")] = {
+                "active": 0,
+                "expired": 0,
+                "platforms": {},
+                "last_changed": None,
+                "next_expiry": None,
+            }
+        self.total += 1
+        self.latest_archived = _later(self.latest_archived, archived)
+        changed = archived
+        if entry.get("expired"):
+            game["expired"] += 1
+            if expires is not None and expires <= self.now:
+                changed = _later(changed, expires)
+        else:
+            self.active += 1
+            game["active"] += 1
+            platforms = game["platforms"]
+            platform = entry.get("platform")
+            platforms[platform] = platforms.get(platform, 0) + 1
+            if expires is not None and expires > self.now:
+                game["next_expiry"] = _earlier(game["next_expiry"], expires)
+                self.next_expiry = _earlier(self.next_expiry, expires)
+        game["last_changed"] = _later(game["last_changed"], changed)
+
+    def as_meta(self):
+        return {
+            "total": self.total,
+            "active": self.active,
+            "latest_archived": self.latest_archived,
+            "next_expiry": self.next_expiry,
+            "games": {
+                name: dict(game, platforms=dict(sorted(game["platforms"].items())))
+                for name, game in sorted(self.games.items(), key=lambda item: str(item[0]))
+            },
+        }
+
+
+def summarize(entries, now):
+    """The meta summary for already built ``entries`` (e.g. after editing them)."""
+    summary = Summary(now)
+    for entry in entries:
+        summary.add(entry)
+    return summary.as_meta()
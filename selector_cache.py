@@ -0,0 +1,110 @@
+"""Learned CSS selectors for the supplemental page parsers.
+
+Parsing a page from scratch means hunting for the right heading or scanning
+every table and list. Once a parse has found codes we remember where they
+were, as structural CSS selectors, and try those regions first next time.
+The full scan only runs (and the selectors are relearned) when the learned
+regions come back empty or with far fewer codes than the last run.
+"""
+import json
+import re
+from datetime import datetime, timezone
+from os import makedirs, path
+
+from common import _L, DIRNAME
+from shiftfile import atomic_write
+
+SELECTORCACHEPATH = path.join(DIRNAME, "data", "selector_cache.json")
+
+# Relearn when the fast path finds fewer than this fraction of last run's codes
+RELEARN_RATIO = 0.5
+
+_SIMPLE_ID_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_-]*$")
+
+
+def css_path(tag):
+    """Return a structural CSS selector that finds ``tag`` again in a similar page."""
+    parts = []
+    while tag is not None and tag.name not in (None, "[document]"):
+        tag_id = tag.get("id")
+        if isinstance(tag_id, str) and _SIMPLE_ID_RE.match(tag_id):
+            parts.append("#" + tag_id)
+            break
+        index = 1 + sum(
+            1 for sibling in tag.previous_siblings if getattr(sibling, "name", None) == tag.name
+        )
+        parts.append(f"{tag.name}:nth-of-type({index})")
+        tag = tag.parent
+    return " > ".join(reversed(parts))
+
+
+def select_regions(soup, selectors):
+    """Return the tags matched by the learned selectors, skipping stale ones."""
+    regions = []
+    for selector in selectors:
+        try:
+            region = soup.select_one(selector)
+        except Exception as e:
+            _L.debug("Ignoring unusable learned selector %s: %s", selector, e)
+            continue
+        if region is not None:
+            regions.append(region)
+    return regions
+
+
+def learn_selectors(hits, region_names):
+    """Return selectors for the regions (e.g. lists or tables) that held ``hits``."""
+    selectors = []
+    for hit in hits:
+        region = hit.container.find_parent(region_names) or hit.container
+        selector = css_path(region)
+        if selector not in selectors:
+            selectors.append(selector)
+    return selectors
+
+
+def needs_relearn(hint, count):
+    """True when a fast-path parse found nothing or far fewer codes than last time."""
+    if count == 0:
+        return True
+    return count < (hint.get("count") or 0) * RELEARN_RATIO
+
+
+class SelectorCache:
+    """Per-parser learned selectors persisted as JSON under data/."""
+
+    def __init__(self, filepath=SELECTORCACHEPATH):
+        self.filepath = filepath
+        self._entries = {}
+        self._dirty = False
+        if path.exists(filepath):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                _L.warning("Ignoring unreadable selector cache %s: %s", filepath, e)
+                self._entries = {}
+
+    def get(self, parser):
+        return self._entries.get(parser)
+
+    def update(self, parser, hint):
+        """Store the hint a parser returned; timestamp it if the selectors changed."""
+        if not hint:
+            return
+        previous = self._entries.get(parser) or {}
+        entry = {"selectors": hint["selectors"], "count": hint["count"]}
+        if previous.get("selectors") == hint["selectors"]:
+            entry["learned"] = previous.get("learned")
+        else:
+            entry["learned"] = datetime.now(timezone.utc).isoformat()
+        if entry != previous:
+            self._entries[parser] = entry
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        makedirs(path.dirname(self.filepath), exist_ok=True)
+        atomic_write(self.filepath, json.dumps(self._entries, indent=2).encode("utf-8"))
+        self._dirty = False
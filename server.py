@@ -0,0 +1,363 @@
+"""Optional local HTTP endpoint for shiftcodes.json.
+
+In daemon mode (``--serve``) an asyncio server runs in a background thread
+and serves the current codes from memory, so a fleet of autoshift instances
+can poll it instead of fetching the full file from GitHub each time:
+
+* ``GET /shiftcodes.json`` returns the file exactly as written, using the
+  precompressed artifacts (gzip, and br/zstd when present) that match the
+  client's ``Accept-Encoding``;
+* every response has a strong ``ETag`` (the SHA-256 of its bytes) and a
+  matching ``If-None-Match`` gets an empty ``304``;
+* query filters ``game``, ``platform``, ``since`` (archived at or after an
+  ISO timestamp) and ``include_expired`` are answered from indexes built
+  once per reload. Filtered responses are gzipped at a fast level, as they
+  are built on the event loop, and the most recently used ones are cached
+  until the next reload.
+
+Only GET and HEAD are supported; connections are kept alive between requests.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from os import path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from artifacts import ENCODINGS, load_manifest
+from common import _L
+from query import CodeStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+FILE_PATHS = ("/", "/shiftcodes.json")
+FILTERS = ("game", "platform", "since", "include_expired")
+# Preference order when a client accepts several encodings
+ENCODING_PREFERENCE = ("br", "zstd", "gzip")
+FILTERED_CACHE_SIZE = 256
+FILTERED_GZIP_LEVEL = 6
+IDLE_TIMEOUT = 15.0
+MAX_HEADER_BYTES = 16 * 1024
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+def etag_for(body):
+    return '"' + hashlib.sha256(body).hexdigest() + '"'
+
+
+def parse_accept_encoding(value):
+    """Return the set of content codings a client accepts (q > 0)."""
+    accepted = set()
+    for item in (value or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _filtered_gzip(data):
+    return gzip.compress(data, compresslevel=FILTERED_GZIP_LEVEL, mtime=0)
+
+
+# (Content-Encoding, file suffix, compressor) like available_encodings()
+FILTERED_ENCODINGS = [("gzip", ".gz", _filtered_gzip)]
+
+
+class Representation:
+    """One response body in its available encodings, each with its own ETag."""
+
+    __slots__ = ("variants",)
+
+    def __init__(self, variants):
+        # encoding (None for identity) -> (body, etag)
+        self.variants = variants
+
+    @classmethod
+    def build(cls, body, encodings=None):
+        variants = {None: (body, etag_for(body))}
+        for encoding, _, compress in encodings or ():
+            compressed = compress(body)
+            variants[encoding] = (compressed, etag_for(compressed))
+        return cls(variants)
+
+    def select(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding in ENCODING_PREFERENCE:
+            if encoding in accepted and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+class Snapshot:
+    """Immutable view of one version of shiftcodes.json with its query indexes."""
+
+    def __init__(self, body, data, full):
+        self.body = body
+        self.store = CodeStore.from_output(data)
+        self.meta = self.store.meta
+        self.codes = self.store.entries
+        self.full = full
+        self._filtered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select(self, game=None, platform=None, since=None, include_expired=True):
+        """Return the matching entries, in file order, using the indexes."""
+        return self.store.select(
+            game=game,
+            platform=platform,
+            expired=None if include_expired else False,
+            archived_from=since,
+        )
+
+    def filtered(self, query):
+        """The cached Representation for a normalised filter query.
+
+        ``since`` in the query is an archived_bucket; None means no entry is
+        recent enough.
+        """
+        with self._lock:
+            rep = self._filtered.get(query)
+            if rep is not None:
+                self._filtered.move_to_end(query)
+                return rep
+        filters = dict(query)
+        if "since" in filters and filters["since"] is None:
+            codes = []
+        else:
+            codes = self.select(
+                game=filters.get("game"),
+                platform=filters.get("platform"),
+                since=filters.get("since"),
+                include_expired=filters.get("include_expired", "true").lower()
+                not in ("false", "0", "no"),
+            )
+        body = json.dumps(
+            [{"meta": self.meta, "codes": codes}], indent=2, default=str
+        ).encode("utf-8")
+        rep = Representation.build(body, FILTERED_ENCODINGS)
+        with self._lock:
+            self._filtered[query] = rep
+            self._filtered.move_to_end(query)
+            while len(self._filtered) > FILTERED_CACHE_SIZE:
+                self._filtered.popitem(last=False)
+        return rep
+
+
+def load_snapshot(filepath):
+    """Read shiftcodes.json and its precompressed artifacts into a Snapshot."""
+    with open(filepath, "rb") as f:
+        body = f.read()
+    data = json.loads(body) if body.strip() else []
+    manifest = load_manifest(filepath)
+    name = path.basename(filepath)
+    variants = {None: (body, etag_for(body))}
+    # the artifacts only match if the manifest describes this version of the file
+    current = manifest.get(name, {}).get("sha256") == hashlib.sha256(body).hexdigest()
+    for encoding, suffix, _, _ in ENCODINGS:
+        entry = manifest.get(name + suffix)
+        if not current or not entry:
+            continue
+        try:
+            with open(filepath + suffix, "rb") as f:
+                compressed = f.read()
+        except OSError:
+            continue
+        if hashlib.sha256(compressed).hexdigest() == entry["sha256"]:
+            variants[encoding] = (compressed, '"' + entry["sha256"] + '"')
+    if "gzip" not in variants:
+        compressed = gzip.compress(body, mtime=0)
+        variants["gzip"] = (compressed, etag_for(compressed))
+    return Snapshot(body, data, Representation(variants))
+
+
+def _response(status, headers=(), body=b"", head=False):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines.extend(f"{k}: {v}" for k, v in headers)
+    lines.append(f"Content-Length: {len(body)}")
+    payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    return payload if head or status == 304 else payload + body
+
+
+class CodeServer:
+    """Serve the latest shiftcodes.json over HTTP from a background thread."""
+
+    def __init__(self, filepath, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.filepath = filepath
+        self.host = host
+        self.port = port
+        self._snapshot = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def reload(self):
+        """Pick up the file as last written; the old snapshot serves until then."""
+        try:
+            self._snapshot = load_snapshot(self.filepath)
+        except (OSError, ValueError) as e:
+            _L.error("HTTP server: could not load %s: %s", self.filepath, e)
+            return
+        _L.info(
+            "HTTP server: serving %d codes (ETag %s)",
+            len(self._snapshot.codes),
+            self._snapshot.full.variants[None][1],
+        )
+
+    def respond(self, method, target, headers):
+        """Return the raw HTTP response bytes for one request."""
+        head = method == "HEAD"
+        if method not in ("GET", "HEAD"):
+            return _response(405, [("Allow", "GET, HEAD")], head=head)
+        parts = urlsplit(target)
+        if unquote(parts.path) not in FILE_PATHS:
+            return _response(404, [("Content-Type", "text/plain")], b"Not found\n", head)
+        snapshot = self._snapshot
+        if snapshot is None:
+            return _response(503, [("Retry-After", "60")], head=head)
+        query = parse_qs(parts.query)
+        unknown = set(query) - set(FILTERS)
+        if unknown:
+            message = f"Unknown filter(s): {', '.join(sorted(unknown))}\n".encode("utf-8")
+            return _response(400, [("Content-Type", "text/plain")], message, head)
+        filters = {k: v[-1] for k, v in query.items()}
+        since = filters.get("since")
+        if since:
+            try:
+                datetime.fromisoformat(since)
+            except ValueError:
+                message = f"since must be an ISO 8601 timestamp, not {since!r}\n"
+                return _response(
+                    400, [("Content-Type", "text/plain")], message.encode("utf-8"), head
+                )
+            # times between the same two archived stamps give the same codes
+            filters["since"] = snapshot.store.archived_bucket(since)
+        elif "since" in filters:
+            del filters["since"]
+        if filters:
+            rep = snapshot.filtered(tuple(sorted(filters.items())))
+        else:
+            rep = snapshot.full
+        encoding, (body, etag) = rep.select(headers.get("accept-encoding"))
+        response_headers = [
+            ("Content-Type", "application/json"),
+            ("ETag", etag),
+            ("Vary", "Accept-Encoding"),
+            ("Cache-Control", "no-cache"),
+        ]
+        if encoding:
+            response_headers.append(("Content-Encoding", encoding))
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or etag in (tag.strip() for tag in if_none_match.split(","))
+        ):
+            return _response(304, [("ETag", etag), ("Vary", "Accept-Encoding")])
+        return _response(200, response_headers, body, head)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    raw = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT
+                    )
+                except (
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                    asyncio.TimeoutError,
+                ):
+                    break
+                lines = raw.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(_response(400))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                writer.write(self.respond(method.upper(), target, headers))
+                await writer.drain()
+                connection = headers.get("connection", "").lower()
+                if connection == "close" or (
+                    version == "HTTP/1.0" and connection != "keep-alive"
+                ):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        # port 0 asks the OS for a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """Load the current file and start serving in a daemon thread."""
+        if path.exists(self.filepath):
+            self.reload()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self._serve())
+            except asyncio.CancelledError:
+                pass
+            except OSError as e:
+                _L.error(
+                    "HTTP server: could not listen on %s:%s: %s", self.host, self.port, e
+                )
+                self._ready.set()
+            finally:
+                # let open connections finish their cleanup before the loop goes
+                pending = asyncio.all_tasks(self._loop)
+                for task in pending:
+                    task.cancel()
+                self._loop.run_until_complete(
+                    asyncio.gather(*pending, return_exceptions=True)
+                )
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="codeserver", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        _L.info("HTTP server listening on http://%s:%d/shiftcodes.json", self.host, self.port)
+        return self
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread:
+            self._thread.join(timeout=5)
@@ -0,0 +1,313 @@
+"""Streaming reader for shiftcodes.json.
+
+The previous run's file is only needed for a handful of fields per code
+(``code``, ``game``, ``archived`` and ``expired``), yet reading it with
+``json.loads(f.read())`` holds the raw text and the whole object graph in
+memory at once. ``ShiftFileReader`` instead walks the file in fixed-size
+chunks and decodes one ``codes`` entry at a time, so callers can build just
+the compact index they need. Malformed files raise ``ShiftFileError`` with
+the byte offset of the problem instead of silently reading as empty.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from os import path
+
+CHUNK_SIZE = 64 * 1024
+
+# meta fields that change on every run; canonical output moves them to a status file
+VOLATILE_META = ("generated", "newcodecount", "stale")
+_WHITESPACE = " \t\n\r"
+
+
+class ShiftFileError(Exception):
+    """Raised when shiftcodes.json exists but cannot be parsed."""
+
+
+class _JSONStream:
+    """Minimal pull parser over a text file, decoding one value at a time."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._consumed = 0
+        self._eof = False
+
+    @property
+    def offset(self):
+        return self._consumed + self._pos
+
+    def _fill(self):
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._consumed += self._pos
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        ch = self.peek()
+        if not ch or ch not in chars:
+            found = repr(ch) if ch else "end of file"
+            raise ShiftFileError(
+                f"expected one of {chars!r} at offset {self.offset}, found {found}"
+            )
+        self._pos += 1
+        return ch
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                # the value may simply continue in the next chunk
+                if self._fill():
+                    continue
+                raise ShiftFileError(
+                    f"{e.msg} at offset {self._consumed + e.pos}"
+                ) from None
+            # a number at the very end of the buffer might be cut short
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+class ShiftFileReader:
+    """Iterate over the ``codes`` entries of a shiftcodes.json file.
+
+    The file is a list holding one object with ``meta`` and ``codes``. Other
+    top-level fields of that object (e.g. ``meta``) are collected into
+    ``fields`` as they are encountered; ``meta`` comes before ``codes`` in
+    every file we write, so it is available as soon as the first entry is.
+    """
+
+    def __init__(self, filepath, chunk_size=CHUNK_SIZE):
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.fields = {}
+        self.empty = True
+
+    @property
+    def meta(self):
+        return self.fields.get("meta")
+
+    def __iter__(self):
+        self.fields = {}
+        self.empty = True
+        if not path.exists(self.filepath):
+            return
+        with open(self.filepath, "r", encoding="utf-8") as f:
+            stream = _JSONStream(f, self.chunk_size)
+            try:
+                yield from self._walk(stream)
+            except UnicodeDecodeError as e:
+                raise ShiftFileError(f"{self.filepath}: not valid UTF-8 ({e})") from None
+            except ShiftFileError as e:
+                raise ShiftFileError(f"{self.filepath}: {e}") from None
+
+    def _walk(self, stream):
+        # an empty (freshly touched) file is treated as having no codes
+        if stream.peek() == "":
+            return
+        stream.expect("[")
+        if stream.peek() == "]":
+            return
+        stream.expect("{")
+        self.empty = False
+        if stream.peek() != "}":
+            while True:
+                key = stream.value()
+                if not isinstance(key, str):
+                    raise ShiftFileError(f"expected a field name at offset {stream.offset}")
+                stream.expect(":")
+                if key == "codes":
+                    yield from self._walk_codes(stream)
+                else:
+                    self.fields[key] = stream.value()
+                if stream.expect(",}") == "}":
+                    break
+        else:
+            stream.expect("}")
+        # anything after the first object is not part of the format; validate and ignore it
+        while stream.expect(",]") == ",":
+            stream.value()
+        if stream.peek() != "":
+            raise ShiftFileError(f"unexpected data after the end at offset {stream.offset}")
+
+    def _walk_codes(self, stream):
+        stream.expect("[")
+        if stream.peek() == "]":
+            stream.expect("]")
+            return
+        while True:
+            entry = stream.value()
+            if isinstance(entry, dict):
+                yield entry
+            if stream.expect(",]") == "]":
+                return
+
+
+def load_shiftfile(filepath):
+    """Load the whole file into the usual ``[{"meta": ..., "codes": [...]}]`` structure.
+
+    Returns [] for a missing or empty file; raises ShiftFileError if it is corrupt.
+    """
+    reader = ShiftFileReader(filepath)
+    codes = list(reader)
+    if reader.empty:
+        return []
+    data = dict(reader.fields)
+    data["codes"] = codes
+    return [data]
+
+
+class PreviousCodeIndex:
+    """Lookup of (code, game) -> (archived, expired) from a previous run's output."""
+
+    __slots__ = ("_entries",)
+
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, entry):
+        key = (entry.get("code"), entry.get("game"))
+        # keep the first entry per code/game, as pc codes are listed twice
+        if key not in self._entries:
+            self._entries[key] = (entry.get("archived"), bool(entry.get("expired")))
+
+    def archived(self, code, game):
+        found = self._entries.get((code, game))
+        return found[0] if found else None
+
+    def expired(self, code, game):
+        found = self._entries.get((code, game))
+        return found[1] if found else False
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        """Yield (code, game, archived, expired) for every indexed code."""
+        for (code, game), (archived, expired) in self._entries.items():
+            yield code, game, archived, expired
+
+    @classmethod
+    def from_codes(cls, previous_codes):
+        """Build an index from an already loaded shiftcodes structure."""
+        index = cls()
+        if previous_codes:
+            for entry in previous_codes[0].get("codes", []):
+                index.add(entry)
+        return index
+
+
+def load_previous_index(filepath):
+    """Stream ``filepath`` into a PreviousCodeIndex; returns (meta, index).
+
+    meta is None when the file is missing or empty.
+    """
+    reader = ShiftFileReader(filepath)
+    index = PreviousCodeIndex()
+    for entry in reader:
+        index.add(entry)
+    if reader.empty:
+        return None, index
+    return reader.meta or {}, index
+
+
+def atomic_write(filepath, payload):
+    """Write the bytes ``payload`` to ``filepath`` atomically (temp file + rename)."""
+    directory = path.dirname(path.abspath(filepath))
+    tmp_path = path.join(
+        directory, ".%s.%s.tmp" % (path.basename(filepath), os.urandom(6).hex())
+    )
+    # unlike mkstemp's 0600, 0666 lets the umask decide, so a web server or
+    # mirror running as another user can read the file as usual
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(filepath, data):
+    """Write ``data`` as indented JSON to ``filepath`` atomically."""
+    atomic_write(filepath, json.dumps(data, indent=2, default=str).encode("utf-8"))
+
+
+def write_shiftfile(filepath, data):
+    """Write ``data`` to ``filepath`` atomically (temp file + rename)."""
+    write_json(filepath, data)
+
+
+def canonical_timestamp(value):
+    """Format a datetime (or ISO string) as UTC to the second; other values pass through."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value))
+        except ValueError:
+            return value
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat()
+
+
+def _canonical_sort_key(entry):
+    return (
+        entry.get("game") or "",
+        entry.get("platform") or "",
+        str(entry.get("archived") or ""),
+        entry.get("code") or "",
+    )
+
+
+def canonicalize(data):
+    """Split generated output into (canonical data, volatile status).
+
+    The canonical data has its codes sorted by (game, platform, archived,
+    code) and every archived timestamp in one format, and leaves out the
+    meta fields that change on every run, so the same codes always give
+    byte-identical output. Those fields are returned as the status.
+    """
+    meta = dict(data[0].get("meta") or {})
+    status = {key: meta.pop(key) for key in VOLATILE_META if key in meta}
+    codes = []
+    for entry in data[0].get("codes", []):
+        entry = dict(entry)
+        entry["archived"] = canonical_timestamp(entry.get("archived"))
+        codes.append(entry)
+    codes.sort(key=_canonical_sort_key)
+    return [{"meta": meta, "codes": codes}], status
@@ -0,0 +1,74 @@
+"""Last-known-good parse results for each source.
+
+Every successful parse is kept, timestamped, under data/. When a source
+fails to fetch or parse (or is skipped by its circuit breaker or the run
+deadline), its cached rows are used instead so that source's codes don't
+drop out of the output; the output's metadata lists which sources were
+stale. Entries older than the TTL are not used. A source scraped within the
+freshness window is taken straight from the cache without being fetched.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from os import makedirs, path
+
+from common import _L, DIRNAME
+from shiftfile import atomic_write
+
+SOURCECACHEPATH = path.join(DIRNAME, "data", "source_cache.json")
+
+DEFAULT_TTL = timedelta(days=7)
+
+
+class SourceCache:
+    """Per-source parse results persisted as JSON, keyed by source name."""
+
+    def __init__(self, filepath=SOURCECACHEPATH, ttl=DEFAULT_TTL, now=None):
+        self.filepath = filepath
+        self.ttl = ttl
+        self._now = now or (lambda: datetime.now(timezone.utc))
+        self._entries = {}
+        self._dirty = False
+        if filepath and path.exists(filepath):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                _L.warning("Ignoring unreadable source cache %s: %s", filepath, e)
+                self._entries = {}
+
+    def age(self, source):
+        """How long ago ``source`` was last parsed successfully, or None."""
+        entry = self._entries.get(source)
+        if not entry:
+            return None
+        return self._now() - datetime.fromisoformat(entry["scraped"])
+
+    def get(self, source):
+        """The cached entry ({"scraped", "rows"}) if it is within the TTL, else None."""
+        age = self.age(source)
+        if age is None or age > self.ttl:
+            return None
+        return self._entries[source]
+
+    def fresh(self, source, window):
+        """True if ``source`` was parsed successfully less than ``window`` ago."""
+        if not window:
+            return False
+        age = self.age(source)
+        return age is not None and age < window
+
+    def put(self, source, rows):
+        # a JSON round trip both copies the rows (callers go on to modify them)
+        # and turns datetimes into the strings the output file would hold
+        self._entries[source] = {
+            "scraped": self._now().isoformat(),
+            "rows": json.loads(json.dumps(rows, default=str)),
+        }
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        makedirs(path.dirname(self.filepath), exist_ok=True)
+        atomic_write(self.filepath, json.dumps(self._entries).encode("utf-8"))
+        self._dirty = False
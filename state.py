@@ -0,0 +1,192 @@
+"""Scraper state kept between runs, and its portable single-file bundle.
+
+Everything the scraper learns between runs (circuit breakers, learned
+selectors, cached parse results, page lastmod dates, the code history,
+undelivered webhooks) lives in one state directory: data/ by default, or
+wherever ``--state-dir`` points. The directory carries a version in
+state.json so a future layout change can be detected rather than misread.
+
+``export_state`` packs the known state files into a gzipped tarball whose
+first member is a manifest (state version plus SHA-256 and size of every
+file); ``import_state`` checks the manifest and unpacks it. On a fresh CI
+runner or container one cache-restore step therefore brings back all the
+warm caches:
+
+    python state.py export --state-dir state --out state.tar.gz
+    python state.py import --state-dir state state.tar.gz
+"""
+import argparse
+import hashlib
+import io
+import json
+import tarfile
+from datetime import datetime, timezone
+from os import makedirs, path, walk
+
+from common import _L, DIRNAME
+from shiftfile import atomic_write
+
+DEFAULT_STATE_DIR = path.join(DIRNAME, "data")
+STATE_VERSION = 1
+VERSION_NAME = "state.json"
+MANIFEST_NAME = "MANIFEST.json"
+
+# state files and directories, relative to the state directory
+BREAKERS = "breakers.json"
+SELECTORS = "selector_cache.json"
+SOURCES = "source_cache.json"
+HISTORY = "history"
+LASTMOD = "lastmod.json"
+OUTBOX = "outbox.json"
+# problem rows already reported, so later runs don't report them again
+DIAGNOSTICS = "debug_problem_rows.json"
+STATE_FILES = [BREAKERS, SELECTORS, SOURCES, HISTORY, LASTMOD, OUTBOX, DIAGNOSTICS]
+
+
+class StateError(Exception):
+    """Raised when a state directory or bundle can't be used."""
+
+
+class StateDir:
+    """A versioned directory holding all of the scraper's state."""
+
+    def __init__(self, root=None):
+        self.root = path.abspath(root or DEFAULT_STATE_DIR)
+        makedirs(self.root, exist_ok=True)
+        version_path = path.join(self.root, VERSION_NAME)
+        if path.exists(version_path):
+            try:
+                with open(version_path, "r", encoding="utf-8") as f:
+                    version = json.load(f).get("version")
+            except (OSError, ValueError, AttributeError) as e:
+                raise StateError(f"Unreadable {version_path}: {e}")
+            if version != STATE_VERSION:
+                raise StateError(
+                    f"State in {self.root} is version {version}, this scraper uses {STATE_VERSION}"
+                )
+        else:
+            atomic_write(
+                version_path,
+                json.dumps({"version": STATE_VERSION}).encode("utf-8"),
+            )
+
+    def path(self, name):
+        return path.join(self.root, name)
+
+    def files(self):
+        """Relative paths of the state files present, in a stable order."""
+        found = []
+        for name in STATE_FILES:
+            full = self.path(name)
+            if path.isfile(full):
+                found.append(name)
+            elif path.isdir(full):
+                for directory, _, filenames in walk(full):
+                    for filename in filenames:
+                        relative = path.relpath(path.join(directory, filename), self.root)
+                        found.append(relative.replace(path.sep, "/"))
+        return sorted(found)
+
+
+def _tarinfo(name, size):
+    # fixed metadata so the same state gives the same bundle
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = 0
+    info.mode = 0o644
+    return info
+
+
+def _is_state_name(name):
+    """Whether a bundle member is one of STATE_FILES (or inside one of its directories)."""
+    parts = name.split("/")
+    if name.startswith("/") or ".." in parts:
+        return False
+    return name in STATE_FILES or (len(parts) > 1 and parts[0] in STATE_FILES)
+
+
+def export_state(state, out_path):
+    """Write ``state``'s files to a gzipped tarball at ``out_path``; returns the manifest."""
+    files = {}
+    contents = {}
+    for name in state.files():
+        with open(state.path(name), "rb") as f:
+            data = f.read()
+        contents[name] = data
+        files[name] = {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    manifest = {
+        "version": STATE_VERSION,
+        "exported": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+    }
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        manifest_bytes = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+        tar.addfile(_tarinfo(MANIFEST_NAME, len(manifest_bytes)), io.BytesIO(manifest_bytes))
+        for name, data in contents.items():
+            tar.addfile(_tarinfo(name, len(data)), io.BytesIO(data))
+    # e.g. ./.state/ on a cold CI cache
+    makedirs(path.dirname(path.abspath(out_path)), exist_ok=True)
+    atomic_write(out_path, buf.getvalue())
+    _L.info(
+        "Exported %d state files (%d bytes) to %s", len(files), len(buf.getvalue()), out_path
+    )
+    return manifest
+
+
+def import_state(state, bundle_path):
+    """Restore the files in the bundle at ``bundle_path`` into ``state``.
+
+    Raises StateError (leaving the state directory untouched) if the bundle
+    is from another state version or any file fails its manifest check.
+    """
+    try:
+        with tarfile.open(bundle_path, mode="r:gz") as tar:
+            member = tar.extractfile(MANIFEST_NAME)
+            if member is None:
+                raise StateError(f"{bundle_path} has no {MANIFEST_NAME}")
+            manifest = json.loads(member.read())
+            if manifest.get("version") != STATE_VERSION:
+                raise StateError(
+                    f"{bundle_path} holds state version {manifest.get('version')}, "
+                    f"this scraper uses {STATE_VERSION}"
+                )
+            contents = {}
+            for name, expected in manifest["files"].items():
+                if not _is_state_name(name):
+                    raise StateError(f"{bundle_path} contains unexpected file {name}")
+                member = tar.extractfile(name)
+                data = member.read() if member else b""
+                if hashlib.sha256(data).hexdigest() != expected["sha256"]:
+                    raise StateError(f"{name} in {bundle_path} does not match its manifest")
+                contents[name] = data
+    except (OSError, tarfile.TarError, ValueError, KeyError) as e:
+        raise StateError(f"Could not read state bundle {bundle_path}: {e}")
+    for name, data in contents.items():
+        target = state.path(name)
+        makedirs(path.dirname(target), exist_ok=True)
+        atomic_write(target, data)
+    _L.info("Imported %d state files from %s", len(contents), bundle_path)
+    return manifest
+
+
+def main():
+    p = argparse.ArgumentParser(description="Export or import the scraper's state as a single file")
+    p.add_argument("action", choices=["export", "import"])
+    p.add_argument("bundle", nargs="?", default="state.tar.gz", help="Bundle to read or write (default: %(default)s)")
+    p.add_argument("--state-dir", default=None, help="State directory (default: data/)")
+    p.add_argument("--out", default=None, help="Where to write the bundle when exporting")
+    args = p.parse_args()
+
+    state = StateDir(args.state_dir)
+    if args.action == "export":
+        export_state(state, args.out or args.bundle)
+    else:
+        try:
+            import_state(state, args.bundle)
+        except StateError as e:
+            raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
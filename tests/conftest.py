@@ -0,0 +1,29 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+BL4 = "Borderlands 4"
+
+
+def code_entry(
+    code,
+    game=BL4,
+    platform="universal",
+    archived="2025-01-01 00:00:00+00:00",
+    expires="Unknown",
+    expired=False,
+    link="https://example.com/bl4",
+):
+    """One entry of the "codes" list in shiftcodes.json."""
+    return {
+        "code": code,
+        "type": "shift",
+        "game": game,
+        "platform": platform,
+        "reward": "1 Golden Key",
+        "archived": archived,
+        "expires": expires,
+        "expired": expired,
+        "link": link,
+    }
@@ -0,0 +1,78 @@
+import sys
+import os
+import gzip
+import hashlib
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import artifacts
+from artifacts import load_manifest, write_artifacts
+from shiftfile import write_shiftfile
+
+DATA = [
+    {
+        "meta": {"version": "2"},
+        "codes": [{"code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "game": "Borderlands 4"}],
+    }
+]
+
+
+def test_gzip_artifact_is_deterministic_and_listed(tmp_path):
+    fp = str(tmp_path / "shiftcodes.json")
+    write_shiftfile(fp, DATA)
+    manifest = write_artifacts(fp)
+    with open(fp + ".gz", "rb") as f:
+        first = f.read()
+    with open(fp, "rb") as f:
+        raw = f.read()
+    assert gzip.decompress(first) == raw
+    assert manifest["shiftcodes.json"] == {
+        "sha256": hashlib.sha256(raw).hexdigest(),
+        "size": len(raw),
+    }
+    assert manifest["shiftcodes.json.gz"]["encoding"] == "gzip"
+    assert manifest["shiftcodes.json.gz"]["sha256"] == hashlib.sha256(first).hexdigest()
+    assert load_manifest(fp) == manifest
+
+    # writing the same content again gives identical bytes
+    os.remove(fp + ".gz")
+    write_shiftfile(fp, DATA)
+    write_artifacts(fp)
+    with open(fp + ".gz", "rb") as f:
+        assert f.read() == first
+
+
+def test_unchanged_file_is_not_recompressed(tmp_path, monkeypatch):
+    fp = str(tmp_path / "shiftcodes.json")
+    write_shiftfile(fp, DATA)
+    write_artifacts(fp)
+    calls = []
+    monkeypatch.setattr(
+        artifacts,
+        "available_encodings",
+        lambda: [("gzip", ".gz", lambda d: calls.append(d) or gzip.compress(d, mtime=0))],
+    )
+    write_artifacts(fp)
+    assert calls == []
+    DATA[0]["meta"]["version"] = "3"
+    try:
+        write_shiftfile(fp, DATA)
+        write_artifacts(fp)
+    finally:
+        DATA[0]["meta"]["version"] = "2"
+    assert len(calls) == 1
+
+
+def test_optional_encodings_are_skipped_when_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        artifacts,
+        "ENCODINGS",
+        artifacts.ENCODINGS[:1] + [("br", ".br", None, "no_such_brotli_module")],
+    )
+    fp = str(tmp_path / "shiftcodes.json")
+    with open(fp, "w") as f:
+        json.dump(DATA, f)
+    manifest = write_artifacts(fp)
+    assert sorted(manifest) == ["shiftcodes.json", "shiftcodes.json.gz"]
+    assert not os.path.exists(fp + ".br")
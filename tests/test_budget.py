@@ -0,0 +1,98 @@
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import fetcher
+from budget import FAILURE_THRESHOLD, CircuitBreakers, RunDeadline
+from ratelimit import HostBlocked, HostRateLimiter
+
+
+class FakeNow:
+    def __init__(self):
+        self.now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_caps_source_budget():
+    t = [100.0]
+    deadline = RunDeadline(60, clock=lambda: t[0])
+    assert deadline.budget(120) == 60
+    t[0] += 50
+    assert deadline.budget(120) == 10
+    assert not deadline.expired()
+    t[0] += 10
+    assert deadline.expired()
+    assert deadline.budget(120) == 0
+
+
+def test_breaker_opens_after_repeated_failures_and_persists(tmp_path):
+    now = FakeNow()
+    fp = str(tmp_path / "breakers.json")
+    breakers = CircuitBreakers(fp, now=now)
+    for _ in range(FAILURE_THRESHOLD - 1):
+        breakers.record_failure("ign", "HTTP 500")
+    assert breakers.allow("ign")
+    breakers.record_failure("ign", "HTTP 500")
+    assert breakers.state("ign") == "open"
+    assert not breakers.allow("ign")
+    assert breakers.report()["ign"]["skipped"] == {"breaker": 1}
+    breakers.save()
+
+    # the next run still skips it until the back-off has passed
+    reloaded = CircuitBreakers(fp, now=now)
+    assert not reloaded.allow("ign")
+    now.now += timedelta(hours=1, seconds=1)
+    assert reloaded.state("ign") == "half-open"
+    assert reloaded.allow("ign")
+
+
+def test_half_open_failure_reopens_with_longer_backoff(tmp_path):
+    now = FakeNow()
+    breakers = CircuitBreakers(str(tmp_path / "breakers.json"), now=now)
+    for _ in range(FAILURE_THRESHOLD):
+        breakers.record_failure("polygon")
+    now.now += timedelta(hours=1, seconds=1)
+    breakers.record_failure("polygon")
+    assert breakers.state("polygon") == "open"
+    now.now += timedelta(hours=1, seconds=1)
+    assert breakers.state("polygon") == "open"
+    now.now += timedelta(hours=1)
+    assert breakers.state("polygon") == "half-open"
+    breakers.record_success("polygon")
+    assert breakers.state("polygon") == "closed"
+    assert breakers.report()["polygon"]["failures"] == 0
+
+
+def test_fetch_gives_up_when_budget_is_spent(monkeypatch):
+    t = [0.0]
+    limiter = HostRateLimiter(
+        interval=30, jitter=0, clock=lambda: t[0], sleep=lambda s: None
+    )
+    monkeypatch.setattr(fetcher, "_rate_limiter", limiter)
+
+    class Resp:
+        status_code = 200
+        headers = {}
+
+    timeouts = []
+
+    def dummy_get(url, timeout=15, headers=None):
+        timeouts.append(timeout)
+        return Resp()
+
+    import requests
+
+    monkeypatch.setattr(requests, "get", dummy_get)
+    fetcher.fetch("https://a.example/1", budget=5)
+    assert timeouts[0] <= 5
+    # the next request to the host would have to wait 30s, more than the budget
+    with pytest.raises(HostBlocked):
+        fetcher.fetch("https://a.example/2", budget=5)
+    with pytest.raises(fetcher.BudgetExceeded):
+        fetcher.fetch("https://b.example/1", budget=0)
@@ -0,0 +1,78 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from autoshift_scraper import add_supplemental_codes, code_sources
+from candidates import CandidateCollector
+
+
+def test_collector_merges_across_sources():
+    collector = CandidateCollector(existing_codes={"EXIST-EXIST-EXIST-EXIST-EXIST"})
+
+    code = "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"
+    assert collector.add({"code": code.lower(), "reward": "Unknown", "expires": "Unknown", "expired": False}, "polygon")
+    assert not collector.add({"code": code, "reward": "Unknown", "expires": "Unknown", "expired": False}, "polygon")
+    assert not collector.add({"code": code, "reward": "3 Golden Keys", "expires": "2030-12-31T00:00:00+00:00", "expired": False}, "xsmash")
+    assert not collector.add({"code": "EXIST-EXIST-EXIST-EXIST-EXIST", "reward": "x"}, "xsmash")
+
+    row = collector.get(code)
+    assert row["code"] == code
+    assert row["reward"] == "3 Golden Keys"
+    assert row["expires"] == "2030-12-31T00:00:00+00:00"
+    assert collector.sources(code) == ["polygon", "xsmash"]
+    assert collector.rows("polygon") == [row]
+    assert collector.rows("xsmash") == []
+    assert collector.multi_source_count() == 1
+
+    assert collector.stats("polygon") == {
+        "parsed": 2,
+        "new": 1,
+        "duplicates_existing": 0,
+        "duplicates_inpage": 1,
+        "merged": 0,
+    }
+    assert collector.stats("xsmash")["merged"] == 1
+    assert collector.stats("xsmash")["duplicates_existing"] == 1
+
+
+def test_details_of_existing_codes_are_merged_into_their_rows():
+    code = "EXIST-EXIST-EXIST-EXIST-EXIST"
+    collector = CandidateCollector(existing_codes={code})
+    assert not collector.add({"code": code.lower(), "reward": "Unknown", "expires": "2030-12-31"}, "polygon")
+    assert not collector.add({"code": code, "reward": "3 Golden Keys", "expires": "Unknown"}, "xsmash")
+    assert collector.rows() == []
+
+    rows = [
+        {"code": code, "reward": "", "expires": "Unknown", "expired": False},
+        {"code": code, "reward": "1 Golden Key", "expires": "Unknown", "expired": False},
+        {"code": "OTHER-OTHER-OTHER-OTHER-OTHER", "reward": "", "expires": "Unknown", "expired": False},
+    ]
+    assert collector.merge_existing(rows) == 2
+    assert rows[0] == {"code": code, "reward": "3 Golden Keys", "expires": "2030-12-31", "expired": False}
+    # known values from the mentalmars table win
+    assert rows[1]["reward"] == "1 Golden Key"
+    assert rows[1]["expires"] == "2030-12-31"
+    assert rows[2]["reward"] == ""
+
+
+def test_supplemental_codes_are_credited_to_their_own_source():
+    mentalmars = "MMMMM-MMMMM-MMMMM-MMMMM-MMMMM"
+    ign_only = "IIIII-IIIII-IIIII-IIIII-IIIII"
+    table = {
+        "game": "Borderlands 4",
+        "platform": "universal",
+        "codes": [{"code": mentalmars, "reward": "", "expires": "Unknown", "expired": False}],
+    }
+    page_results = {"mentalmars: Borderlands 4": [table]}
+    code_tables = list(page_results.values())
+    collector = CandidateCollector(existing_codes={mentalmars})
+    collector.add({"code": ign_only, "reward": "Golden Key", "expires": "Unknown", "expired": False}, "ign")
+
+    assert add_supplemental_codes(code_tables, collector.rows())
+    assert [row["code"] for row in code_tables[0][0]["codes"]] == [mentalmars, ign_only]
+    assert table["codes"] == [table["codes"][0]]
+
+    sources = code_sources(page_results, collector)
+    assert sources[ign_only] == ["ign"]
+    assert sources[mentalmars] == ["mentalmars: Borderlands 4"]
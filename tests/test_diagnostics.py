@@ -0,0 +1,92 @@
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from autoshift_scraper import (
+    collect_candidates,
+    generateAutoshiftJSON,
+    parse_polygon_bl4_page,
+    parse_xsmash_page,
+)
+from diagnostics import DiagnosticsSink
+from shiftfile import PreviousCodeIndex
+
+TABLES = [
+    [
+        {
+            "game": "Borderlands 4",
+            "platform": "universal",
+            "sourceURL": "https://example.invalid/bl4",
+            "archived": "2025-01-01 00:00:00+00:00",
+            "codes": [
+                {"code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "expires": "Unknown", "expired": False}
+            ],
+        }
+    ]
+]
+
+
+def _lines(filepath):
+    with open(filepath) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_problem_rows_are_written_once(tmp_path):
+    filepath = str(tmp_path / "debug_problem_rows.json")
+    for _ in range(2):
+        # a run generates its output several times
+        sink = DiagnosticsSink(filepath)
+        for include_expired in (True, False, True, False):
+            generateAutoshiftJSON(TABLES, PreviousCodeIndex(), include_expired, diagnostics=sink)
+        assert len(sink) == 1
+        sink.flush()
+
+    lines = _lines(filepath)
+    assert len(lines) == 1
+    assert lines[0]["reason"] == "missing fields"
+    assert lines[0]["source"] == "https://example.invalid/bl4"
+    assert lines[0]["row"]["code"] == "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"
+
+
+def test_file_is_rotated_past_its_cap(tmp_path):
+    filepath = str(tmp_path / "debug_problem_rows.json")
+    sink = DiagnosticsSink(filepath, max_bytes=200)
+    for n in range(3):
+        sink.record("ign", {"code": f"bad-{n}", "reward": "x" * 100}, "invalid code")
+        sink.flush()
+    assert len(_lines(filepath)) == 1
+    assert len(_lines(filepath + ".1")) == 1
+    # entries in the rotated file still count as written
+    sink.record("ign", {"code": "bad-1", "reward": "x" * 100}, "invalid code")
+    assert sink.flush() == 0
+
+
+def test_malformed_rows_are_recorded_where_the_parsers_drop_them(tmp_path):
+    sink = DiagnosticsSink(str(tmp_path / "problems.json"))
+    html = """
+    <h2 id="all-borderlands-4-shift-codes">All Borderlands 4 SHiFT codes</h2>
+    <ul>
+      <li>J9XBB-KK9T3-CRTBW-BBT3T-KTBTW (1 Golden Key)</li>
+      <li>J9XBB-KK9T3-CRTBW-BBT3 (5 Golden Keys)</li>
+    </ul>
+    """
+    rows, _ = parse_polygon_bl4_page(html)
+    new = collect_candidates(rows, "polygon", "Polygon BL4", set(), diagnostics=sink)
+    assert [row["code"] for row in new] == ["J9XBB-KK9T3-CRTBW-BBT3T-KTBTW"]
+
+    rows, _ = parse_xsmash_page('const GOLD_KEYS_DATA = [{code: "NOT-A-CODE", title: "1 Gold Key"}];')
+    assert collect_candidates(rows, "xsmash", "xsmash", set(), diagnostics=sink) == []
+
+    tables = [[dict(TABLES[0][0], codes=[{"code": "BROKEN", "reward": "x", "expires": "Unknown", "expired": False}])]]
+    generateAutoshiftJSON(tables, PreviousCodeIndex(), True, diagnostics=sink)
+
+    assert sink.flush() == 3
+    entries = _lines(str(tmp_path / "problems.json"))
+    assert [(e["source"], e["reason"], e["row"]["code"]) for e in entries] == [
+        ("polygon", "malformed code", "J9XBB-KK9T3-CRTBW-BBT3"),
+        ("xsmash", "invalid code", "NOT-A-CODE"),
+        ("https://example.invalid/bl4", "invalid code", "BROKEN"),
+    ]
+    assert "5 Golden Keys" in entries[0]["row"]["text"]
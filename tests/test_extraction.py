@@ -0,0 +1,80 @@
+from bs4 import BeautifulSoup
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from extraction import compile_header, extract_table_rows, normalize_code, scan_codes
+
+
+def test_normalize_code():
+    assert normalize_code(" abcde-fghij-klmno-pqrst-uvwxy ") == "ABCDE-FGHIJ-KLMNO-PQRST-UVWXY"
+    assert normalize_code("ABCDE-FGHIJ") is None
+    assert normalize_code(None) is None
+
+
+def test_scan_codes_maps_matches_to_containers():
+    html = """
+    <table><tbody>
+      <tr><td>AAAAA-BBBBB-CCCCC-DDDDD-EEEEE</td><td>(3 Golden Keys)</td></tr>
+      <tr><td><s>FFFFF-GGGGG-HHHHH-IIIII-JJJJJ</s></td><td>(Skin)</td></tr>
+    </tbody></table>
+    <ul>
+      <li>KKKKK-LLLLL-MMMMM-NNNNN-OOOOO (1 Golden Key) Expires: Oct. 2, 2025</li>
+      <li>no code here</li>
+    </ul>
+    <p>PPPPP-QQQQQ-RRRRR-SSSSS-TTTTT outside any container</p>
+    <script>var x = "UUUUU-VVVVV-WWWWW-XXXXX-YYYYY";</script>
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    hits = scan_codes(soup, containers=("tr", "li"))
+
+    assert [h.code for h in hits] == [
+        "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+        "FFFFF-GGGGG-HHHHH-IIIII-JJJJJ",
+        "KKKKK-LLLLL-MMMMM-NNNNN-OOOOO",
+    ]
+    assert hits[0].reward == "3 Golden Keys"
+    assert hits[0].expired is False
+    assert hits[1].expired is True
+    assert hits[2].container.name == "li"
+    assert hits[2].as_row() == {
+        "code": "KKKKK-LLLLL-MMMMM-NNNNN-OOOOO",
+        "reward": "1 Golden Key",
+        "expires": "Oct. 2, 2025",
+        "expired": False,
+    }
+
+
+def test_extract_table_rows_reads_cells_by_position():
+    html = """
+    <table>
+      <thead><tr><th>Borderlands 4 SHiFT Code</th><th colspan="2">Reward</th><th>Expire Date</th><th>Notes</th></tr></thead>
+      <tbody>
+        <tr><td>AAAAA-BBBBB-CCCCC-DDDDD-EEEEE</td><td colspan="2">3 Golden Keys</td><td>Expires: Oct 1</td><td>x</td></tr>
+        <tr><td><s>FFFFF-GGGGG-HHHHH-IIIII-JJJJJ</s></td><td>Skin</td><td>(bonus)</td><td>Sept 1</td></tr>
+        <tr><td>KKKKK-LLLLL-MMMMM-NNNNN-OOOOO</td><td colspan="3">Unknown reward, no date</td><td><del>gone</del></td></tr>
+      </tbody>
+    </table>
+    """
+    table = BeautifulSoup(html, "html.parser").find("table")
+    compile_header.cache_clear()
+    rows = extract_table_rows(table)
+    assert rows[0] == {
+        "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+        "reward": "3 Golden Keys",
+        "expires": "Oct 1",
+        "Notes": "x",
+        "expired": False,
+    }
+    # the strikethrough inside a cell no longer shifts the columns
+    assert rows[1]["code"] == "FFFFF-GGGGG-HHHHH-IIIII-JJJJJ"
+    assert rows[1]["reward"] == "Skin"
+    assert rows[1]["expires"] == "Sept 1"
+    assert rows[1]["expired"] is True
+    assert rows[2]["expires"] == "Unknown"
+    assert rows[2]["expired"] is True
+
+    extract_table_rows(table)
+    assert compile_header.cache_info().misses == 1
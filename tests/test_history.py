@@ -0,0 +1,104 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from conftest import code_entry
+from history import CodeHistory, SeenIndex
+from shiftfile import PreviousCodeIndex
+
+BL4 = "Borderlands 4"
+CODE_A = "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"
+CODE_B = "FFFFF-BBBBB-CCCCC-DDDDD-EEEEE"
+
+
+def test_history_survives_codes_dropping_off(tmp_path):
+    history = CodeHistory(str(tmp_path))
+    history.record_run(
+        [
+            code_entry(CODE_A, archived="2025-01-01 00:00:00+00:00"),
+            code_entry(CODE_B, archived="2025-01-01 00:00:00+00:00"),
+        ],
+        "2025-01-01T00:00:00+00:00",
+        {CODE_A: ["mentalmars: Borderlands 4", "ign"]},
+    )
+    # CODE_B is gone from the pages in the next run, CODE_A is now expired
+    history.record_run(
+        [code_entry(CODE_A, archived="2025-01-01 00:00:00+00:00", expired=True)],
+        "2025-01-02T00:00:00+00:00",
+    )
+
+    reloaded = CodeHistory(str(tmp_path))
+    assert reloaded.archived(CODE_B, BL4) == "2025-01-01 00:00:00+00:00"
+    assert reloaded.last_seen(CODE_B, BL4) == "2025-01-01T00:00:00+00:00"
+    assert reloaded.last_seen(CODE_A, BL4) == "2025-01-02T00:00:00+00:00"
+    assert reloaded.expired(CODE_A, BL4)
+    assert reloaded.sources(CODE_A, BL4) == (
+        "mentalmars: Borderlands 4",
+        "ign",
+        "https://example.com/bl4",
+    )
+    assert reloaded.pending_events == 10
+
+
+def test_compaction_keeps_the_index(tmp_path):
+    history = CodeHistory(str(tmp_path))
+    history.record_run([code_entry(CODE_A, archived="2025-01-01 00:00:00+00:00")], "2025-01-01")
+    history.record_run(
+        [code_entry(CODE_A, archived="2025-01-01 00:00:00+00:00", expired=True)], "2025-01-05"
+    )
+    history.maybe_compact(threshold=100)
+    assert history.pending_events > 0
+    history.maybe_compact(threshold=1)
+    assert history.pending_events == 0
+    assert (tmp_path / "events.jsonl").read_text() == ""
+
+    reloaded = CodeHistory(str(tmp_path))
+    assert reloaded.archived(CODE_A, BL4) == "2025-01-01 00:00:00+00:00"
+    assert reloaded.last_seen(CODE_A, BL4) == "2025-01-05T00:00:00+00:00"
+    assert reloaded.expired(CODE_A, BL4)
+
+    # a torn line at the end of the log is skipped, not fatal
+    with open(tmp_path / "events.jsonl", "a") as f:
+        f.write('{"event": "last_seen", "ti')
+    assert len(CodeHistory(str(tmp_path))) == 1
+
+
+def test_seed_and_seen_index(tmp_path):
+    previous = PreviousCodeIndex.from_codes(
+        [{"codes": [code_entry(CODE_A, archived="2024-12-01 00:00:00+00:00", expired=True)]}]
+    )
+    history = CodeHistory(str(tmp_path))
+    history.seed(previous)
+    assert history.archived(CODE_A, BL4) == "2024-12-01 00:00:00+00:00"
+    assert history.expired(CODE_A, BL4)
+
+    # expired in the previous file (e.g. by mark_expired.py) but not in the history
+    edited = PreviousCodeIndex.from_codes(
+        [{"codes": [code_entry(CODE_B, archived="2025-01-01 00:00:00+00:00", expired=True)]}]
+    )
+    seen = SeenIndex(history, edited)
+    assert seen.archived(CODE_A, BL4) == "2024-12-01 00:00:00+00:00"
+    assert seen.expired(CODE_B, BL4)
+    assert seen.archived("ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE", BL4) is None
+
+
+def test_unchanged_runs_log_one_event(tmp_path):
+    history = CodeHistory(str(tmp_path))
+    entries = [code_entry(CODE_A, archived="2025-01-01 00:00:00+00:00"), code_entry(CODE_B, archived="2025-01-01 00:00:00+00:00")]
+    history.record_run(entries, "2025-01-01")
+    before = history.pending_events
+    assert len(history.record_run(entries, "2025-01-02")) == 1
+    assert len(history.record_run(entries, "2025-01-03")) == 1
+    assert history.pending_events == before + 2
+    assert history.last_seen(CODE_A, BL4) == "2025-01-03T00:00:00+00:00"
+
+    # CODE_B drops off for a run and comes back
+    history.record_run(entries[:1], "2025-01-04")
+    assert history.last_seen(CODE_B, BL4) == "2025-01-03T00:00:00+00:00"
+    history.record_run(entries, "2025-01-05")
+    history.compact()
+    reloaded = CodeHistory(str(tmp_path))
+    assert reloaded.last_seen(CODE_B, BL4) == "2025-01-05T00:00:00+00:00"
+    assert reloaded.archived(CODE_B, BL4) == "2025-01-01 00:00:00+00:00"
+    assert len(reloaded.record_run(entries, "2025-01-06")) == 1
@@ -0,0 +1,72 @@
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import inbox
+import mark_expired
+from query import CodeStore
+from shiftfile import PreviousCodeIndex, load_shiftfile, write_shiftfile
+
+CODE_A = "AAAAA-BBBBB-CCCCC-DDDDD-00001"
+CODE_B = "AAAAA-BBBBB-CCCCC-DDDDD-00002"
+
+
+def _write(fp):
+    entries = [
+        {"code": code, "game": "Borderlands 4", "platform": "universal", "expires": "Unknown", "expired": False}
+        for code in (CODE_A, CODE_B)
+    ]
+    write_shiftfile(fp, [{"meta": {"version": "2"}, "codes": entries}])
+
+
+def test_queued_requests_are_applied_in_one_drain(tmp_path):
+    fp = str(tmp_path / "shiftcodes.json")
+    _write(fp)
+    inbox.enqueue([CODE_A.lower()], "2025-04-01T00:00:00+00:00", filepath=fp)
+    inbox.enqueue([CODE_B, "ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE"], filepath=fp)
+    # queueing never touches the file itself
+    assert not CodeStore.from_file(fp).count(expired=True)
+
+    assert mark_expired.drain(fp) == (2, 2, ["ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE"])
+    store = CodeStore.from_output(load_shiftfile(fp))
+    assert store.count(expired=True) == 2
+    assert store.lookup(CODE_A)[0]["expires"] == "2025-04-01T00:00:00+00:00"
+    # the code that wasn't found stays queued for a later drain
+    assert [r["codes"] for _, r in inbox.pending(fp)] == [["ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE"]]
+    assert mark_expired.drain(fp) == (1, 0, ["ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE"])
+
+
+def test_expiries_written_after_the_file_was_read_are_found(tmp_path):
+    fp = str(tmp_path / "shiftcodes.json")
+    _write(fp)
+    previous = PreviousCodeIndex.from_codes(load_shiftfile(fp))
+    assert inbox.expired_since(fp, previous) == {}
+    mark_expired.mark_expired([CODE_B], "2025-04-01T00:00:00+00:00", filepath=fp)
+    assert inbox.expired_since(fp, previous) == {CODE_B: "2025-04-01T00:00:00+00:00"}
+
+
+def test_writers_wait_for_the_lock(tmp_path):
+    fp = str(tmp_path / "shiftcodes.json")
+    _write(fp)
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with inbox.file_lock(fp):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    with pytest.raises(TimeoutError):
+        with inbox.file_lock(fp, timeout=0.2):
+            pass
+    release.set()
+    thread.join()
+    with inbox.file_lock(fp, timeout=1):
+        pass
@@ -0,0 +1,79 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from autoshift_scraper import parse_xsmash_page
+from jsliteral import Call, Ref, html_text, iter_array_records, parse_literal
+
+PAGE = r"""
+<script>
+const GOLD_KEYS_DATA = [
+    {
+        code: "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+        expires: createDate(2030, 12, 31, 0, 0, 0, 0),
+        title: '<b>Gold</b>: 3 Gold Keys [limited] {x} - Launch',
+    },
+    { "code": 'FFFFF-BBBBB-CCCCC-DDDDD-EEEEE', title: "It\'s \"quoted\" ]};", },
+    /* a comment, with ] inside */
+];
+const OTHER = [{ code: "IGNOR-BBBBB-CCCCC-DDDDD-EEEEE" }];
+var skins_data = [{Code: "GGGGG-BBBBB-CCCCC-DDDDD-EEEEE", expires: createDate(2020, 1, 1), title: 'Skin &amp; Head'}];
+var WEAPONS_DATA = [{code: "HHHHH-BBBBB-CCCCC-DDDDD-EEEEE"}, {code: broken(}];
+</script>
+"""
+
+
+def test_parse_literal_values():
+    text = '{a: [1, -2.5, 0x10,, true], "b": new Date(1, "x"), c, d: X.y}; rest'
+    value, end = parse_literal(text)
+    assert value == {
+        "a": [1, -2.5, 16, True],
+        "b": Call("Date", (1, "x"), '1, "x"'),
+        "c": Ref("c"),
+        "d": Ref("X.y"),
+    }
+    assert end == text.index(";")
+    compact = parse_literal("{a:[1,-2.5,0x10,,true],b:new Date(1,'x'),c,d:X.y}")[0]
+    assert compact["b"].args == (1, "x") and compact["a"] == value["a"]
+    assert parse_literal(r"'aA\n' + `b`")[0] == "aA\nb"
+
+
+def test_iter_array_records_reads_named_arrays_only():
+    records = list(
+        iter_array_records(PAGE, ("GOLD_KEYS_DATA", "SKINS_DATA", "WEAPONS_DATA"))
+    )
+    assert [(name, r.get("code", r.get("Code"))) for name, r in records] == [
+        ("GOLD_KEYS_DATA", "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"),
+        ("GOLD_KEYS_DATA", "FFFFF-BBBBB-CCCCC-DDDDD-EEEEE"),
+        ("SKINS_DATA", "GGGGG-BBBBB-CCCCC-DDDDD-EEEEE"),
+        # the malformed second element only loses the rest of its array
+        ("WEAPONS_DATA", "HHHHH-BBBBB-CCCCC-DDDDD-EEEEE"),
+    ]
+    assert records[1][1]["title"] == "It's \"quoted\" ]};"
+
+
+def test_parse_xsmash_page_with_configured_arrays():
+    rows, hint = parse_xsmash_page(PAGE)
+    assert hint is None
+    assert [row["code"][:5] for row in rows] == ["AAAAA", "FFFFF", "GGGGG"]
+    assert rows[0]["reward"] == "3 Gold Keys [limited] {x}"
+    assert rows[0]["expires"] == "2030-12-31T00:00:00+00:00"
+    assert rows[1]["expires"] == "Unknown"
+    assert rows[2] == {
+        "code": "GGGGG-BBBBB-CCCCC-DDDDD-EEEEE",
+        "reward": "Skin & Head",
+        "expires": "2020-01-01T00:00:00+00:00",
+        "expired": True,
+    }
+    rows, _ = parse_xsmash_page(PAGE, arrays=("WEAPONS_DATA",))
+    assert [row["code"][:5] for row in rows] == ["HHHHH"]
+
+
+def test_html_text_matches_get_text():
+    from bs4 import BeautifulSoup
+
+    for fragment in ["plain", " <b>a</b>&nbsp;b <i> c </i>", "x &lt;y&gt;<br/>z"]:
+        assert html_text(fragment) == BeautifulSoup(fragment, "html.parser").get_text(
+            " ", strip=True
+        )
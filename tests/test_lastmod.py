@@ -0,0 +1,49 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lastmod import LastmodTracker, parse_lastmods, url_key
+
+SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://mentalmars.com/game-news/borderlands-4-shift-codes/</loc><lastmod>2025-10-01T10:00:00+00:00</lastmod></url>
+  <url><loc>https://mentalmars.com/game-news/borderlands-2-golden-keys/</loc><lastmod>2025-09-01T10:00:00+00:00</lastmod></url>
+  <url><loc>https://mentalmars.com/about/</loc></url>
+</urlset>
+"""
+BL4 = "https://www.mentalmars.com/game-news/borderlands-4-shift-codes"
+BL2 = "https://mentalmars.com/game-news/borderlands-2-golden-keys/"
+BL3 = "https://mentalmars.com/game-news/borderlands-3-golden-keys/"
+
+
+def test_parse_lastmods_sitemap_and_atom():
+    assert parse_lastmods(SITEMAP) == {
+        "mentalmars.com/game-news/borderlands-4-shift-codes": "2025-10-01T10:00:00+00:00",
+        "mentalmars.com/game-news/borderlands-2-golden-keys": "2025-09-01T10:00:00+00:00",
+    }
+    atom = b"""<feed xmlns="http://www.w3.org/2005/Atom"><entry>
+      <link href="https://example.com/post/"/><updated>2025-01-01T00:00:00Z</updated>
+    </entry></feed>"""
+    assert parse_lastmods(atom) == {url_key("https://example.com/post"): "2025-01-01T00:00:00Z"}
+
+
+def test_only_pages_parsed_at_the_same_lastmod_are_unchanged(tmp_path):
+    filepath = str(tmp_path / "lastmod.json")
+    first = LastmodTracker(filepath)
+    assert first.check("sitemap", SITEMAP, [BL4, BL2, BL3]) == 0
+    # BL4 parsed fine, BL2 failed; BL3 isn't in the sitemap
+    first.record(BL4)
+    first.record(BL3)
+    first.save()
+
+    second = LastmodTracker(filepath)
+    assert second.check("sitemap", SITEMAP, [BL4, BL2, BL3]) == 1
+    assert second.unchanged(BL4)
+    assert not second.unchanged(BL2)
+    assert not second.unchanged(BL3)
+
+    third = LastmodTracker(filepath)
+    third.check("sitemap", SITEMAP.replace(b"2025-10-01T10", b"2025-10-02T10"), [BL4])
+    assert not third.unchanged(BL4)
+    assert third.check("sitemap", b"<urlset><url>", [BL4]) == 0
@@ -0,0 +1,77 @@
+import json
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import shiftfile
+from autoshift_scraper import run_migrations_on_shiftfile
+from migrations import CURRENT_VERSION, migrate, needs_migration, parse_version
+
+
+def _unversioned():
+    return [
+        {
+            "meta": {},
+            "codes": [
+                {"code": " aaaaa-bbbbb-ccccc-ddddd-eeeee ", "game": "Borderlands 2"},
+                {"code": "not-a-code", "game": "Borderlands 2"},
+            ],
+        }
+    ]
+
+
+def test_parse_version_is_numeric():
+    assert parse_version(None) == 0
+    assert parse_version("0.1") == 0
+    assert parse_version("2") == 2
+    assert parse_version("10") > parse_version("2")
+    assert needs_migration({"version": "1"})
+    assert not needs_migration({"version": "10"})
+    assert not needs_migration(None)
+
+
+def test_unrecognised_version_skips_migration():
+    with pytest.raises(ValueError):
+        parse_version("v2-beta")
+    assert not needs_migration({"version": "v2-beta"})
+
+
+def test_migrate_chains_all_steps_in_memory():
+    data = _unversioned()
+    applied = migrate(data)
+    assert [step[0] for step in applied] == [1, 2]
+    assert data[0]["meta"]["version"] == str(CURRENT_VERSION)
+    assert [c["code"] for c in data[0]["codes"]] == ["AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"]
+    assert migrate(data) == []
+
+
+def test_run_migrations_writes_once(tmp_path, monkeypatch):
+    fn = tmp_path / "shiftcodes.json"
+    fn.write_text(json.dumps(_unversioned()))
+
+    writes = []
+    real_write = shiftfile.write_shiftfile
+
+    def counting_write(filepath, data):
+        writes.append(filepath)
+        real_write(filepath, data)
+
+    import autoshift_scraper
+
+    monkeypatch.setattr(autoshift_scraper, "write_shiftfile", counting_write)
+
+    data, performed = run_migrations_on_shiftfile(str(fn), _unversioned(), dry_run=True)
+    assert not performed
+    assert writes == []
+    assert json.loads(fn.read_text()) == _unversioned()
+
+    data, performed = run_migrations_on_shiftfile(str(fn), _unversioned())
+    assert performed
+    assert writes == [str(fn)]
+    on_disk = json.loads(fn.read_text())
+    assert on_disk[0]["meta"]["version"] == "2"
+    assert len(on_disk[0]["codes"]) == 1
+    assert list(tmp_path.iterdir()) == [fn]
@@ -0,0 +1,90 @@
+import sys
+import os
+import json
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from conftest import code_entry
+from notify import Outbox, code_changes, load_subscribers
+from shiftfile import PreviousCodeIndex
+
+BL4 = "Borderlands 4"
+
+
+def _subscribers(tmp_path, urls):
+    hooks = tmp_path / "subscribers.json"
+    hooks.write_text(json.dumps([{"url": url} for url in urls]))
+    return load_subscribers(str(hooks))
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_changes_are_batched_per_subscriber(tmp_path):
+    hooks = tmp_path / "hooks.json"
+    hooks.write_text(
+        json.dumps(
+            [
+                {"url": "https://a.example/hook", "games": ["borderlands 4"]},
+                {"url": "https://b.example/hook", "platforms": ["Steam"]},
+                {"url": "https://c.example/hook"},
+            ]
+        )
+    )
+    subscribers = load_subscribers(str(hooks))
+    seen = PreviousCodeIndex.from_codes(
+        [{"codes": [{"code": "OLD01", "game": BL4, "archived": "x", "expired": False}]}]
+    )
+    new, expired = code_changes(
+        [code_entry("NEW01"), code_entry("OLD01", expired=True), code_entry("NEW02", "Borderlands 3", "steam")],
+        seen,
+    )
+    assert [e["code"] for e in new] == ["NEW01", "NEW02"]
+    assert [e["code"] for e in expired] == ["OLD01"]
+
+    outbox = Outbox(str(tmp_path / "outbox.json"))
+    assert outbox.queue(subscribers, new, expired, "2025-01-01") == 3
+    bodies = {b["url"]: json.loads(b["body"]) for b in outbox.batches}
+    assert [e["code"] for e in bodies["https://a.example/hook"]["new"]] == ["NEW01"]
+    assert [e["code"] for e in bodies["https://b.example/hook"]["new"]] == ["NEW02"]
+    assert bodies["https://b.example/hook"]["expired"] == []
+    assert len(bodies["https://c.example/hook"]["new"]) == 2
+
+
+def test_delivery_retries_and_keeps_undelivered_batches(tmp_path):
+    filepath = str(tmp_path / "outbox.json")
+    outbox = Outbox(filepath)
+    subscribers = _subscribers(
+        tmp_path, ["https://ok.example", "https://down.example", "https://gone.example"]
+    )
+    outbox.queue(subscribers, [code_entry("NEW01")], [], "run 1")
+    outbox.save()
+
+    calls = []
+    lock = threading.Lock()
+    flaky = {"https://ok.example": [500]}
+
+    def post(url, body, headers):
+        with lock:
+            calls.append(url)
+            if url == "https://down.example":
+                raise ConnectionError("refused")
+            if url == "https://gone.example":
+                return _Response(410)
+            statuses = flaky.get(url)
+            return _Response(statuses.pop(0) if statuses else 204)
+
+    # a restart between queueing and delivery loses nothing
+    outbox = Outbox(filepath)
+    assert outbox.deliver(post=post, sleep=lambda s: None) == (1, 1, 1)
+    assert calls.count("https://ok.example") == 2
+    assert calls.count("https://down.example") == 3
+    assert calls.count("https://gone.example") == 1
+
+    waiting = Outbox(filepath)
+    assert [b["url"] for b in waiting.batches] == ["https://down.example"]
+    assert waiting.batches[0]["attempts"] == 3
+    assert waiting.batches[0]["last_error"] == "refused"
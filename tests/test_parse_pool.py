@@ -0,0 +1,39 @@
+import sys
+import os
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from autoshift_scraper import parse_mentalmars_page
+from parse_pool import ParsePool
+
+PAGE = b"""
+<figure><table>
+  <thead><tr><th>SHiFT Code</th><th>Reward</th><th>Expire Date</th></tr></thead>
+  <tbody><tr><td>AAAAA-BBBBB-CCCCC-DDDDD-EEEEE</td><td>3 Golden Keys</td><td>Expires: Oct 1</td></tr></tbody>
+</table></figure>
+"""
+WEBPAGE = {
+    "game": "Borderlands 4",
+    "sourceURL": "https://example.invalid/bl4",
+    "platform_ordered_tables": ["universal"],
+}
+
+
+def _parse_with(workers):
+    scraped = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with ParsePool(workers) as pool:
+        return pool.submit(parse_mentalmars_page, PAGE, WEBPAGE, scraped).result()
+
+
+def test_parse_pool_in_process_and_worker_results_match():
+    inline = _parse_with(0)
+    assert inline[0]["codes"][0]["code"] == "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"
+    assert inline[0]["codes"][0]["expires"] == "Oct 1"
+    assert _parse_with(1) == inline
+
+
+def test_inline_pool_surfaces_exceptions():
+    with ParsePool(0) as pool:
+        future = pool.submit(int, "not a number")
+    assert isinstance(future.exception(), ValueError)
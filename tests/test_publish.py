@@ -0,0 +1,46 @@
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
+
+pytest.importorskip("github")
+
+from autoshift_scraper import publish_to_github
+from mark_expired import upload_shiftfile
+from standins import GitHubStandIn, blob_sha
+
+
+def test_upload_creates_then_updates_and_publish_replaces(tmp_path):
+    shiftfile = tmp_path / "shiftcodes.json"
+    shiftfile.write_bytes(b"[]\n")
+    with GitHubStandIn() as github:
+        assert upload_shiftfile(str(shiftfile), "u", "codes", "t", "create", api_url=github.url)
+        assert github.files["shiftcodes.json"] == b"[]\n"
+
+        shiftfile.write_bytes(b'[{"codes": []}]\n')
+        assert upload_shiftfile(str(shiftfile), "u", "codes", "t", "update", api_url=github.url)
+        shiftfile.write_bytes(b'[{"codes": [1]}]\n')
+        args = SimpleNamespace(user="u", repo="codes", token="t", github_api=github.url)
+        result = publish_to_github(args, "added new codes", file_path=str(shiftfile))
+
+    assert github.files["shiftcodes.json"] == b'[{"codes": [1]}]\n'
+    assert result["content"].sha == blob_sha(b'[{"codes": [1]}]\n')
+    assert [c["message"] for c in github.commits] == ["create", "update", "added new codes"]
+    assert github.calls["PUT contents"] == 3
+
+
+def test_update_with_a_stale_sha_is_rejected(tmp_path):
+    with GitHubStandIn(files={"shiftcodes.json": b"old"}, root=str(tmp_path)) as github:
+        from github import Github, GithubException
+
+        repo = Github("t", base_url=github.url).get_repo("u/codes")
+        contents = repo.get_contents("shiftcodes.json", ref="main")
+        repo.update_file(contents.path, "first", "new", contents.sha, branch="main")
+        with pytest.raises(GithubException) as e:
+            repo.update_file(contents.path, "second", "newer", contents.sha, branch="main")
+    assert e.value.status == 409
+    assert (tmp_path / "shiftcodes.json").read_bytes() == b"new"
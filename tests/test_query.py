@@ -0,0 +1,104 @@
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from conftest import code_entry
+import mark_expired
+from query import CodeStore, parse_time
+from shiftfile import load_shiftfile, write_shiftfile
+
+
+BL4 = "Borderlands 4"
+DATA = [
+    {
+        "meta": {"version": "2"},
+        "codes": [
+            code_entry("AAAAA-BBBBB-CCCCC-DDDDD-00001", BL4, "steam", "2025-01-01 10:00:00+00:00"),
+            code_entry("AAAAA-BBBBB-CCCCC-DDDDD-00001", BL4, "epic", "2025-01-01 10:00:00+00:00"),
+            code_entry(
+                "AAAAA-BBBBB-CCCCC-DDDDD-00002",
+                BL4,
+                "steam",
+                "2025-02-01T00:00:00+00:00",
+                expires="2025-03-01T00:00:00+00:00",
+            ),
+            code_entry(
+                "AAAAA-BBBBB-CCCCC-DDDDD-00003",
+                BL4,
+                "steam",
+                "2025-03-01T00:00:00+00:00",
+                expired=True,
+            ),
+            code_entry(
+                "AAAAA-BBBBB-CCCCC-DDDDD-00004",
+                "Borderlands 3",
+                "steam",
+                "2025-03-05T00:00:00+00:00",
+            ),
+        ],
+    }
+]
+
+
+def _codes(entries):
+    return [e["code"][-5:] + "/" + e["platform"] for e in entries]
+
+
+def test_filters_and_ranges():
+    store = CodeStore.from_output(DATA)
+    active_since = store.select(
+        game="borderlands 4", platform="Steam", expired=False, archived_from="2025-01-15"
+    )
+    assert _codes(active_since) == ["00002/steam"]
+    assert _codes(store.select(archived_from="2025-02-01", archived_to="2025-03-05")) == [
+        "00002/steam",
+        "00003/steam",
+    ]
+    assert _codes(store.select(expires_to="2025-04-01")) == ["00002/steam"]
+    assert store.count(game="Borderlands 4") == 4
+    assert store.count(archived_from="2025-03-01") == 2
+    assert store.count(platform="steam", expired=False) == 3
+    assert store.count() == 5
+    assert store.games() == ["Borderlands 3", "Borderlands 4"]
+    assert len(store.lookup("aaaaa-bbbbb-ccccc-ddddd-00001")) == 2
+    with pytest.raises(ValueError):
+        store.select(archived_from="not a time")
+
+
+def test_parse_time_needs_a_full_date():
+    assert parse_time("2025-03-01") == "2025-03-01T00:00:00+00:00"
+    assert parse_time("Unknown") is None
+    pytest.importorskip("dateutil")
+    assert parse_time("September 30, 2025") == "2025-09-30T00:00:00+00:00"
+    # a missing year or day isn't filled in from today's date
+    assert parse_time("Sept 30") is None
+    assert parse_time("September 2025") is None
+
+
+def test_mark_expired_keeps_indexes_current():
+    store = CodeStore.from_output(
+        [{"meta": {}, "codes": [dict(e) for e in DATA[0]["codes"]]}]
+    )
+    assert store.mark_expired("AAAAA-BBBBB-CCCCC-DDDDD-00001", "2025-01-10T00:00") == 2
+    assert store.count(expired=True) == 3
+    assert _codes(store.select(expires_to="2025-02-01")) == ["00001/steam", "00001/epic"]
+    assert store.mark_expired("ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE", "2025-01-10") == 0
+
+
+def test_mark_expired_cli_helper(tmp_path):
+    fp = str(tmp_path / "shiftcodes.json")
+    write_shiftfile(fp, DATA)
+    found, not_found = mark_expired.mark_expired(
+        ["aaaaa-bbbbb-ccccc-ddddd-00004", "ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE"],
+        expires_override="2025-04-01T00:00:00+00:00",
+        filepath=fp,
+    )
+    assert found == 1
+    assert not_found == ["ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE"]
+    store = CodeStore.from_output(load_shiftfile(fp))
+    entry = store.lookup("AAAAA-BBBBB-CCCCC-DDDDD-00004")[0]
+    assert entry["expired"] is True
+    assert entry["expires"] == "2025-04-01T00:00:00+00:00"
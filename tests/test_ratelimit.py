@@ -0,0 +1,120 @@
+import sys
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import fetcher
+from ratelimit import ROBOTS_TIMEOUT, HostBlocked, HostRateLimiter, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _limiter(clock, **kwargs):
+    kwargs.setdefault("jitter", 0)
+    return HostRateLimiter(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_requests_are_spaced_per_host():
+    clock = FakeClock()
+    limiter = _limiter(clock, interval=5)
+    limiter.wait("https://a.example/1")
+    limiter.wait("https://b.example/1")
+    assert clock.slept == []
+    limiter.wait("https://a.example/2")
+    assert clock.slept == [5]
+
+
+def test_crawl_delay_and_retry_after():
+    clock = FakeClock()
+    robots = "User-agent: *\nCrawl-delay: 30\n"
+    limiter = _limiter(clock, interval=5, robots_fetcher=lambda url, timeout: robots, user_agent="autoshift-scraper/1.0")
+    limiter.wait("https://a.example/1")
+    limiter.wait("https://a.example/2")
+    assert clock.slept == [30]
+
+    limiter.defer("https://a.example/", 60)
+    assert limiter.blocked_for("https://a.example/") == 60
+    limiter.defer("https://a.example/", 600)
+    with pytest.raises(HostBlocked):
+        limiter.wait("https://a.example/3")
+
+
+def test_retry_after_formats():
+    now = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    assert retry_after_seconds("120") == 120
+    assert retry_after_seconds("Wed, 01 Jan 2025 12:01:30 GMT", now=now) == 90
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
+
+
+def test_fetch_retries_after_429(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetcher, "_rate_limiter", _limiter(clock, interval=0))
+    responses = []
+
+    class Resp:
+        def __init__(self, status, headers=None):
+            self.status_code = status
+            self.headers = headers or {}
+
+    def dummy_get(url, timeout=15, headers=None):
+        responses.append(url)
+        return Resp(429, {"Retry-After": "7"}) if len(responses) == 1 else Resp(200)
+
+    import requests
+
+    monkeypatch.setattr(requests, "get", dummy_get)
+    r = fetcher.fetch("https://a.example/page")
+    assert r.status_code == 200
+    assert len(responses) == 2
+    assert clock.slept == [7]
+
+
+def test_robots_txt_is_fetched_once_per_host_outside_the_lock():
+    clock = FakeClock()
+    fetched = []
+
+    def robots(url, timeout):
+        # another host's request must not be blocked behind this fetch
+        assert not limiter._lock.locked()
+        fetched.append(url)
+        return "User-agent: *\nCrawl-delay: 30\n"
+
+    limiter = _limiter(clock, interval=5, robots_fetcher=robots)
+    limiter.wait("https://a.example/1")
+    limiter.wait("https://a.example/2")
+    limiter.blocked_for("https://a.example/")
+    limiter.wait("https://b.example/1")
+    assert fetched == ["https://a.example/robots.txt", "https://b.example/robots.txt"]
+    assert clock.slept == [30]
+
+
+def test_robots_fetch_is_capped_by_the_callers_budget():
+    clock = FakeClock()
+    timeouts = []
+
+    def robots(url, timeout):
+        timeouts.append(timeout)
+        clock.now += timeout
+        raise TimeoutError("robots.txt timed out")
+
+    limiter = _limiter(clock, interval=5, robots_fetcher=robots)
+    limiter.wait("https://a.example/1", max_wait=3)
+    # cut short by the budget, so it is tried again with the full timeout
+    limiter.wait("https://a.example/2", max_wait=60)
+    limiter.wait("https://a.example/3")
+    assert timeouts == [3, ROBOTS_TIMEOUT]
@@ -0,0 +1,74 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from records import CodeRecord, Summary, expand_records, summarize
+
+
+def _record(platform, game="Borderlands 2"):
+    return CodeRecord.create(
+        code="AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+        game="".join(game),
+        platform=platform,
+        reward="1 Golden Key",
+        archived="2025-01-01T00:00:00+00:00",
+        expires="Unknown",
+        expired=False,
+        link="https://mentalmars.com/game-news/borderlands-2-golden-keys/",
+    )
+
+
+def test_pc_record_expands_to_steam_and_epic_only_on_serialisation():
+    record = _record("pc")
+    assert record.platforms == ("steam", "epic")
+    entries = expand_records([record, _record("xbox")])
+    assert [e["platform"] for e in entries] == ["steam", "epic", "xbox"]
+    assert entries[0] == {
+        "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+        "type": "shift",
+        "game": "Borderlands 2",
+        "platform": "steam",
+        "reward": "1 Golden Key",
+        "archived": "2025-01-01T00:00:00+00:00",
+        "expires": "Unknown",
+        "expired": False,
+        "link": "https://mentalmars.com/game-news/borderlands-2-golden-keys/",
+    }
+
+
+def test_shared_strings_are_interned():
+    a, b = _record("universal"), _record("universal")
+    assert a.game is b.game
+    assert a.platforms[0] is b.platforms[0]
+    assert not hasattr(a, "__dict__")
+
+
+def test_summary_is_gathered_while_expanding():
+    def record(platform, archived, expires="Unknown", expired=False, game="Borderlands 2"):
+        return CodeRecord.create(
+            "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", game, platform, "1 Golden Key",
+            archived, expires, expired, "https://example.invalid",
+        )
+
+    records = [
+        record("pc", "2025-01-01T00:00:00+00:00", expires="2025-06-01T00:00:00+00:00"),
+        record("xbox", "2025-02-01 12:00:00+00:00", expires="2025-03-01T00:00:00+00:00", expired=True),
+        record("universal", "2025-01-15T00:00:00+00:00", expires="2025-05-01", game="Borderlands 4"),
+        record("universal", "2024-12-01T00:00:00+00:00", expires="2024-12-31", game="Borderlands 4"),
+    ]
+    summary = Summary("2025-04-01T00:00:00+00:00")
+    entries = expand_records(records, summary)
+    meta = summary.as_meta()
+    assert meta["total"] == 5
+    assert meta["active"] == 4
+    assert meta["latest_archived"] == "2025-02-01T12:00:00+00:00"
+    assert meta["next_expiry"] == "2025-05-01T00:00:00+00:00"
+    bl2 = meta["games"]["Borderlands 2"]
+    assert bl2["active"] == 2 and bl2["expired"] == 1
+    assert bl2["platforms"] == {"epic": 1, "steam": 1}
+    # the xbox code expiring on 2025-03-01 is its latest change
+    assert bl2["last_changed"] == "2025-03-01T00:00:00+00:00"
+    assert bl2["next_expiry"] == "2025-06-01T00:00:00+00:00"
+    assert meta["games"]["Borderlands 4"]["last_changed"] == "2025-01-15T00:00:00+00:00"
+    assert summarize(entries, "2025-04-01T00:00:00+00:00") == meta
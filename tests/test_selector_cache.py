@@ -0,0 +1,65 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from autoshift_scraper import parse_ign_bl4_page, parse_polygon_bl4_page
+from selector_cache import SelectorCache
+
+POLYGON_HTML = """
+<div id="content">
+  <ul><li>Not a code</li></ul>
+  <h2 id="all-borderlands-4-shift-codes">All Borderlands 4 SHiFT codes</h2>
+  <ul>
+    <li>J9XBB-KK9T3-CRTBW-BBT3T-KTBTW (1 Golden Key)</li>
+    <li>AAAAA-BBBBB-CCCCC-DDDDD-EEEEE (5 Golden Keys)</li>
+  </ul>
+</div>
+"""
+
+
+def test_polygon_learns_and_reuses_selector():
+    rows, hint = parse_polygon_bl4_page(POLYGON_HTML)
+    assert [r["code"] for r in rows] == [
+        "J9XBB-KK9T3-CRTBW-BBT3T-KTBTW",
+        "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+    ]
+    assert hint == {"selectors": ["#content > ul:nth-of-type(2)"], "count": 2}
+
+    # The header is gone but the list is where it was: the fast path finds it
+    page = POLYGON_HTML.replace(' id="all-borderlands-4-shift-codes"', "").replace(
+        "All Borderlands 4 SHiFT codes", "Codes"
+    )
+    page = page.replace(
+        "</ul>\n</div>", "<li>FFFFF-GGGGG-HHHHH-IIIII-JJJJJ (Skin)</li></ul>\n</div>"
+    )
+    rows, new_hint = parse_polygon_bl4_page(page, hint)
+    assert len(rows) == 3
+    assert new_hint["selectors"] == hint["selectors"]
+    assert new_hint["count"] == 3
+
+
+def test_ign_relearns_when_fast_path_comes_back_short():
+    stale_hint = {"selectors": ["#gone > table:nth-of-type(1)"], "count": 10}
+    html = """
+    <table><tbody>
+      <tr><td>AAAAA-BBBBB-CCCCC-DDDDD-EEEEE</td><td>(3 Golden Keys)</td></tr>
+    </tbody></table>
+    """
+    rows, hint = parse_ign_bl4_page(html, stale_hint)
+    assert [r["code"] for r in rows] == ["AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"]
+    assert hint == {"selectors": ["table:nth-of-type(1)"], "count": 1}
+
+
+def test_selector_cache_round_trip(tmp_path):
+    fn = str(tmp_path / "data" / "selector_cache.json")
+    cache = SelectorCache(fn)
+    assert cache.get("polygon") is None
+    cache.update("polygon", {"selectors": ["ul:nth-of-type(1)"], "count": 4})
+    cache.save()
+
+    reloaded = SelectorCache(fn)
+    entry = reloaded.get("polygon")
+    assert entry["selectors"] == ["ul:nth-of-type(1)"]
+    assert entry["count"] == 4
+    assert entry["learned"]
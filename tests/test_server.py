@@ -0,0 +1,135 @@
+import sys
+import os
+import gzip
+import http.client
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from artifacts import write_artifacts
+import server as server_module
+from server import CodeServer, parse_accept_encoding
+from shiftfile import write_shiftfile
+
+DATA = [
+    {
+        "meta": {"version": "2"},
+        "codes": [
+            {
+                "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 4",
+                "platform": "steam",
+                "archived": "2025-01-01T00:00:00+00:00",
+                "expired": False,
+            },
+            {
+                "code": "FFFFF-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 4",
+                "platform": "epic",
+                "archived": "2025-03-01 00:00:00+00:00",
+                "expired": True,
+            },
+            {
+                "code": "GGGGG-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 3",
+                "platform": "steam",
+                "archived": "2025-02-01T00:00:00+00:00",
+                "expired": False,
+            },
+        ],
+    }
+]
+
+
+@pytest.fixture
+def server(tmp_path):
+    fp = str(tmp_path / "shiftcodes.json")
+    write_shiftfile(fp, DATA)
+    write_artifacts(fp)
+    srv = CodeServer(fp, port=0).start()
+    yield srv
+    srv.stop()
+
+
+def _get(server, target, headers=None, method="GET"):
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    conn.request(method, target, headers=headers or {})
+    r = conn.getresponse()
+    body = r.read()
+    conn.close()
+    return r, body
+
+
+def test_full_file_with_etag_and_gzip(server):
+    r, body = _get(server, "/shiftcodes.json")
+    assert r.status == 200
+    with open(server.filepath, "rb") as f:
+        assert body == f.read()
+    etag = r.getheader("ETag")
+
+    r, body = _get(server, "/shiftcodes.json", {"If-None-Match": etag})
+    assert r.status == 304 and body == b""
+
+    r, body = _get(server, "/shiftcodes.json", {"Accept-Encoding": "gzip, br;q=0"})
+    assert r.getheader("Content-Encoding") == "gzip"
+    assert r.getheader("ETag") != etag
+    with open(server.filepath + ".gz", "rb") as f:
+        assert body == f.read()
+
+
+def test_filters(server):
+    r, body = _get(server, "/shiftcodes.json?game=borderlands%204&include_expired=false")
+    assert [c["code"] for c in json.loads(body)[0]["codes"]] == [
+        "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"
+    ]
+    r, body = _get(server, "/shiftcodes.json?since=2025-02-01T00:00:00Z&platform=steam")
+    assert [c["code"] for c in json.loads(body)[0]["codes"]] == [
+        "GGGGG-BBBBB-CCCCC-DDDDD-EEEEE"
+    ]
+    r, body = _get(
+        server, "/shiftcodes.json?since=2025-02-01", {"Accept-Encoding": "gzip"}
+    )
+    codes = json.loads(gzip.decompress(body))[0]["codes"]
+    assert [c["code"] for c in codes] == [
+        "FFFFF-BBBBB-CCCCC-DDDDD-EEEEE",
+        "GGGGG-BBBBB-CCCCC-DDDDD-EEEEE",
+    ]
+    assert _get(server, "/shiftcodes.json?since=yesterday")[0].status == 400
+    assert _get(server, "/shiftcodes.json?colour=red")[0].status == 400
+    assert _get(server, "/other")[0].status == 404
+
+
+def test_since_is_bucketed_and_the_cache_evicts_one_entry(server, monkeypatch):
+    monkeypatch.setattr(server_module, "FILTERED_CACHE_SIZE", 2)
+    snapshot = server._snapshot
+    first = _get(server, "/shiftcodes.json?since=2025-01-15T00:00:00Z")[1]
+    # any time after the first code and up to the second gives the same codes
+    assert _get(server, "/shiftcodes.json?since=2025-02-01T00:00:00%2B00:00")[1] == first
+    assert len(snapshot._filtered) == 1
+    r, body = _get(server, "/shiftcodes.json?since=2030-01-01T00:00:00Z", {"Accept-Encoding": "br, gzip"})
+    assert r.getheader("Content-Encoding") == "gzip"
+    assert json.loads(gzip.decompress(body))[0]["codes"] == []
+
+    _get(server, "/shiftcodes.json?since=2025-01-15T00:00:00Z")
+    _get(server, "/shiftcodes.json?platform=steam")
+    assert list(snapshot._filtered) == [
+        (("since", "2025-02-01T00:00:00+00:00"),),
+        (("platform", "steam"),),
+    ]
+
+
+def test_reload_changes_etag(server):
+    first = _get(server, "/shiftcodes.json", method="HEAD")[0].getheader("ETag")
+    write_shiftfile(server.filepath, [{"meta": {"version": "2"}, "codes": []}])
+    write_artifacts(server.filepath)
+    server.reload()
+    r, body = _get(server, "/shiftcodes.json", {"If-None-Match": first})
+    assert r.status == 200
+    assert json.loads(body)[0]["codes"] == []
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0, zstd;q=0.5") == {"gzip", "zstd"}
+    assert parse_accept_encoding(None) == set()
@@ -0,0 +1,135 @@
+import json
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import datetime, timezone
+
+from shiftfile import (
+    ShiftFileError,
+    ShiftFileReader,
+    canonicalize,
+    load_previous_index,
+    load_shiftfile,
+    write_shiftfile,
+)
+
+DATA = [
+    {
+        "meta": {"version": "2", "newcodecount": 0},
+        "codes": [
+            {
+                "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 2",
+                "platform": "steam",
+                "archived": "2025-01-01 00:00:00+00:00",
+                "expired": True,
+                "reward": "Reward with ] and } in it",
+            },
+            {
+                "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 2",
+                "platform": "epic",
+                "archived": "2025-01-01 00:00:00+00:00",
+                "expired": True,
+            },
+            {
+                "code": "FFFFF-GGGGG-HHHHH-IIIII-JJJJJ",
+                "game": "Borderlands 4",
+                "archived": "2025-02-01 00:00:00+00:00",
+                "expired": False,
+            },
+        ],
+    }
+]
+
+
+def test_reader_streams_entries_in_small_chunks(tmp_path):
+    fn = tmp_path / "shiftcodes.json"
+    fn.write_text(json.dumps(DATA, indent=2))
+    reader = ShiftFileReader(str(fn), chunk_size=7)
+    entries = list(reader)
+    assert entries == DATA[0]["codes"]
+    assert reader.meta == DATA[0]["meta"]
+    assert load_shiftfile(str(fn)) == DATA
+
+    meta, index = load_previous_index(str(fn))
+    assert meta["version"] == "2"
+    assert len(index) == 2
+    assert index.archived("AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "Borderlands 2") == "2025-01-01 00:00:00+00:00"
+    assert index.expired("AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "Borderlands 2") is True
+    assert index.archived("AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "Borderlands 4") is None
+
+
+@pytest.mark.parametrize("content", ["", "  \n", "[] "])
+def test_missing_or_empty_file_has_no_codes(tmp_path, content):
+    fn = tmp_path / "shiftcodes.json"
+    fn.write_text(content)
+    assert load_previous_index(str(fn))[0] is None
+    assert load_shiftfile(str(fn)) == []
+    assert load_shiftfile(str(tmp_path / "missing.json")) == []
+
+
+def test_corrupt_file_reports_offset(tmp_path):
+    fn = tmp_path / "shiftcodes.json"
+    text = json.dumps(DATA)
+    fn.write_text(text[: len(text) // 2])
+    with pytest.raises(ShiftFileError) as excinfo:
+        load_previous_index(str(fn))
+    assert "shiftcodes.json" in str(excinfo.value)
+    assert "offset" in str(excinfo.value)
+
+
+def test_canonical_output_is_stable(tmp_path):
+    def generated(order, when):
+        codes = [
+            {
+                "code": "ZZZZZ-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 4",
+                "platform": "universal",
+                "archived": datetime(2025, 2, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+            },
+            {
+                "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 2",
+                "platform": "steam",
+                "archived": "2025-01-01 00:00:00+00:00",
+            },
+            {
+                "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+                "game": "Borderlands 2",
+                "platform": "epic",
+                "archived": "2025-01-01 00:00:00+00:00",
+            },
+        ]
+        meta = {"version": "2", "generated": {"human": when}, "newcodecount": len(order)}
+        return [{"meta": meta, "codes": [codes[i] for i in order]}]
+
+    first, status = canonicalize(generated([0, 1, 2], datetime.now(timezone.utc)))
+    second, _ = canonicalize(
+        generated([2, 0, 1], datetime(2030, 1, 1, tzinfo=timezone.utc))
+    )
+    assert first[0]["meta"] == {"version": "2"}
+    assert status["newcodecount"] == 3 and "generated" in status
+    assert [(c["game"], c["platform"]) for c in first[0]["codes"]] == [
+        ("Borderlands 2", "epic"),
+        ("Borderlands 2", "steam"),
+        ("Borderlands 4", "universal"),
+    ]
+    assert first[0]["codes"][2]["archived"] == "2025-02-01T12:00:00+00:00"
+
+    write_shiftfile(str(tmp_path / "a.json"), first)
+    write_shiftfile(str(tmp_path / "b.json"), second)
+    assert (tmp_path / "a.json").read_bytes() == (tmp_path / "b.json").read_bytes()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX file modes")
+def test_written_files_get_the_umask_mode(tmp_path):
+    fp = tmp_path / "shiftcodes.json"
+    write_shiftfile(str(fp), DATA)
+    plain = tmp_path / "plain.json"
+    plain.write_bytes(b"[]")
+    assert fp.stat().st_mode & 0o777 == plain.stat().st_mode & 0o777
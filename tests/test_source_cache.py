@@ -0,0 +1,99 @@
+import sys
+import os
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from autoshift_scraper import SourceRun, collect_supplemental, generateAutoshiftJSON
+from budget import CircuitBreakers, RunDeadline
+from source_cache import SourceCache
+
+
+class FakeNow:
+    def __init__(self):
+        self.now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+TABLES = [
+    {
+        "game": "Borderlands 4",
+        "platform": "universal",
+        "sourceURL": "https://example.com/bl4",
+        "archived": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "codes": [
+            {
+                "code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE",
+                "reward": "1 Golden Key",
+                "expires": "Unknown",
+                "expired": False,
+            }
+        ],
+    }
+]
+
+
+def test_cache_ttl_and_freshness(tmp_path):
+    now = FakeNow()
+    fp = str(tmp_path / "source_cache.json")
+    cache = SourceCache(fp, ttl=timedelta(hours=2), now=now)
+    assert cache.get("mentalmars: Borderlands 4") is None
+    cache.put("mentalmars: Borderlands 4", TABLES)
+    cache.save()
+
+    cache = SourceCache(fp, ttl=timedelta(hours=2), now=now)
+    now.now += timedelta(minutes=10)
+    assert cache.fresh("mentalmars: Borderlands 4", timedelta(minutes=30))
+    assert not cache.fresh("mentalmars: Borderlands 4", timedelta(minutes=5))
+    assert not cache.fresh("mentalmars: Borderlands 4", None)
+    entry = cache.get("mentalmars: Borderlands 4")
+    assert entry["rows"][0]["archived"] == "2025-01-01 00:00:00+00:00"
+    now.now += timedelta(hours=2)
+    assert cache.get("mentalmars: Borderlands 4") is None
+
+
+def test_failed_source_falls_back_to_stale_rows(tmp_path):
+    now = FakeNow()
+    cache = SourceCache(str(tmp_path / "source_cache.json"), now=now)
+    run = SourceRun(
+        RunDeadline(60),
+        CircuitBreakers(str(tmp_path / "breakers.json"), now=now),
+        cache,
+        30,
+    )
+    run.succeeded("mentalmars: Borderlands 4", TABLES)
+    assert run.stale == {}
+
+    rows = run.fallback("mentalmars: Borderlands 4")
+    rows[0]["codes"].append({"code": "changed"})
+    assert len(cache.get("mentalmars: Borderlands 4")["rows"][0]["codes"]) == 1
+    assert run.fallback("ign") is None
+    assert list(run.stale) == ["mentalmars: Borderlands 4"]
+
+    out = generateAutoshiftJSON([rows], [], True, run.stale)
+    assert out[0]["meta"]["stale"] == {
+        "mentalmars: Borderlands 4": "2025-01-01T00:00:00+00:00"
+    }
+    assert [c["code"] for c in out[0]["codes"]] == ["AAAAA-BBBBB-CCCCC-DDDDD-EEEEE"]
+
+
+def test_running_out_of_time_is_not_a_breaker_failure(tmp_path):
+    now = FakeNow()
+    t = [0.0]
+    cache = SourceCache(str(tmp_path / "source_cache.json"), now=now)
+    breakers = CircuitBreakers(str(tmp_path / "breakers.json"), now=now)
+    run = SourceRun(RunDeadline(60, clock=lambda: t[0]), breakers, cache, 30)
+    row = {"code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "reward": "1 Golden Key", "expires": "Unknown", "expired": False}
+    run.succeeded("ign", [row])
+
+    t[0] = 60.0
+    source = {"source": "ign", "label": "IGN", "sourceURL": "https://example.com/ign"}
+    # the parse never finishes before the deadline
+    rows = collect_supplemental(source, Future(), set(), run=run)
+    assert [r["code"] for r in rows] == [row["code"]]
+    assert list(run.stale) == ["ign"]
+    assert breakers.report()["ign"]["failures"] == 0
+    assert breakers.skips == {"ign": {"deadline": 1}}
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_cli_modules_import_without_heavy_dependencies():
+    code = (
+        "import sys, autoshift_scraper, mark_expired; "
+        "heavy = ('requests', 'bs4', 'github', 'apscheduler', 'multiprocessing'); "
+        "print(','.join(m for m in heavy if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == ""
+
+
+def test_lazy_module_attributes_resolve():
+    import autoshift_scraper
+
+    assert autoshift_scraper.requests.get
+    assert autoshift_scraper.BeautifulSoup("<p>x</p>", "html.parser").get_text() == "x"
@@ -0,0 +1,92 @@
+import sys
+import os
+import io
+import json
+import tarfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from history import CodeHistory
+from state import HISTORY, SOURCES, StateDir, StateError, export_state, import_state
+
+
+def _state_with_files(root):
+    state = StateDir(str(root))
+    (root / SOURCES).write_text('{"ign": {"scraped": "x", "rows": []}}')
+    history = CodeHistory(state.path(HISTORY))
+    history.record_run(
+        [{"code": "AAAAA-BBBBB-CCCCC-DDDDD-EEEEE", "game": "Borderlands 4", "archived": "2025-01-01"}],
+        "2025-01-01T00:00:00+00:00",
+    )
+    # not state: left out of the bundle
+    (root / "shiftcodes.json").write_text("[]")
+    return state
+
+
+def test_export_import_round_trip(tmp_path):
+    source = _state_with_files(tmp_path / "a")
+    bundle = str(tmp_path / "state.tar.gz")
+    manifest = export_state(source, bundle)
+    assert sorted(manifest["files"]) == ["history/events.jsonl", SOURCES]
+
+    target = StateDir(str(tmp_path / "b"))
+    import_state(target, bundle)
+    assert target.files() == source.files()
+    assert (tmp_path / "b" / SOURCES).read_text() == (tmp_path / "a" / SOURCES).read_text()
+    assert len(CodeHistory(target.path(HISTORY))) == 1
+    assert not (tmp_path / "b" / "shiftcodes.json").exists()
+
+    # the same state exports to the same file contents apart from the timestamp
+    with tarfile.open(bundle) as tar:
+        assert tar.getnames()[0] == "MANIFEST.json"
+        assert {m.mtime for m in tar.getmembers()} == {0}
+
+
+def _bundle(path, manifest, members):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in [("MANIFEST.json", json.dumps(manifest).encode())] + members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def test_bad_bundles_are_refused(tmp_path):
+    state = StateDir(str(tmp_path / "state"))
+    bad = str(tmp_path / "bad.tar.gz")
+
+    _bundle(bad, {"version": 99, "files": {}}, [])
+    with pytest.raises(StateError, match="version 99"):
+        import_state(state, bad)
+
+    _bundle(
+        bad,
+        {"version": 1, "files": {"../escape.json": {"sha256": "", "size": 2}}},
+        [("../escape.json", b"{}")],
+    )
+    with pytest.raises(StateError, match="unexpected file"):
+        import_state(state, bad)
+
+    _bundle(
+        bad,
+        {"version": 1, "files": {SOURCES: {"sha256": "0" * 64, "size": 2}}},
+        [(SOURCES, b"{}")],
+    )
+    with pytest.raises(StateError, match="does not match"):
+        import_state(state, bad)
+    assert state.files() == []
+
+    (tmp_path / "state" / "state.json").write_text('{"version": 0}')
+    with pytest.raises(StateError):
+        StateDir(str(tmp_path / "state"))
+
+
+def test_export_creates_missing_directories(tmp_path):
+    source = _state_with_files(tmp_path / "a")
+    bundle = tmp_path / ".state" / "nested" / "state.tar.gz"
+    export_state(source, str(bundle))
+    assert bundle.exists()
+    target = StateDir(str(tmp_path / "b"))
+    import_state(target, str(bundle))
+    assert (tmp_path / "b" / SOURCES).exists()